@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module is a stand-in for the VeraCrypt executable, used to benchmark the wrapper without real volumes.
+
+It accepts both the Windows switches (`/volume`, `/letter`, `/dismount`) and the Linux text-mode syntax
+(`--text --mount`, `--dismount`, `--list`, `--volume-properties`, `--create`). Windows mounts honour the
+password cache: `/cache y` with a password caches the volume, a mount without a password only opens cached
+volumes, and `/wipecache` empties the cache. A dismount without a volume dismounts every volume. Each call waits
+for a configurable latency, either sleeping or burning CPU like a key derivation would, fails at a configurable
+rate, and "mounts" a volume by creating the mount directory and a state file. It is configured through these
+environment variables:
+
+- `FAKE_VERACRYPT_STATE_DIRECTORY`: Directory holding the mount state. Required.
+- `FAKE_VERACRYPT_LATENCY`: Seconds each mount or dismount takes. Defaults to 0.
+- `FAKE_VERACRYPT_BURN_CPU`: Burns CPU instead of sleeping when set to 1. Defaults to 0.
+- `FAKE_VERACRYPT_FAILURE_RATE`: Probability in [0, 1] that a mount or dismount fails. Defaults to 0.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from simple_veracrypt_container_interface.utilities.mount_table import MountEntry, normalize_mount_point
+
+# **********
+#: Environment variable naming the directory holding the mount state.
+STATE_DIRECTORY_VARIABLE = "FAKE_VERACRYPT_STATE_DIRECTORY"
+
+# **********
+def _state_path(state_directory: Path, mount_point: str) -> Path:
+    return state_directory / (hashlib.sha1(mount_point.encode()).hexdigest() + ".json")
+
+
+def _password_cache_path(state_directory: Path) -> Path:
+    return state_directory / "password_cache.txt"
+
+
+def _read_states(state_directory: Path) -> List[Dict[str, str]]:
+    states = []
+    for path in state_directory.glob("*.json"):
+        try:
+            states.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # Removed or being written concurrently
+    return states
+
+
+def scan_fake_mounts(state_directory: Path) -> Dict[str, MountEntry]:
+    """Scans the volumes mounted by the fake executable, in the format of `scan_mount_table`.
+
+    Args:
+        state_directory (Path): Directory holding the mount state.
+
+    Returns:
+        Dict[str, MountEntry]: Mounted volumes keyed by normalized mount point.
+    """
+    return {state["mount_point"]: MountEntry(state["mount_point"], state["volume"], "fake") for state in _read_states(state_directory)}
+
+
+def install_fake_veracrypt(directory: Path) -> Path:
+    """Writes an executable launcher for the fake VeraCrypt into a directory.
+
+    Args:
+        directory (Path): Directory to write the launcher into.
+
+    Returns:
+        Path: Path to the launcher.
+    """
+    package_root = Path(__file__).resolve().parent.parent
+    launcher = directory / "veracrypt"
+    launcher.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        f"sys.path.insert(0, {str(package_root)!r})\n"
+        "from benchmarks.fake_veracrypt import main\n"
+        "sys.exit(main(sys.argv[1:]))\n"
+    )
+    launcher.chmod(0o755)
+    return launcher
+
+
+# **********
+def _simulate_work() -> None:
+    """Spends the configured latency, sleeping or burning CPU."""
+    latency = float(os.environ.get("FAKE_VERACRYPT_LATENCY", "0"))
+    if os.environ.get("FAKE_VERACRYPT_BURN_CPU") == "1":
+        deadline = time.process_time() + latency
+        digest = b""
+        while time.process_time() < deadline:
+            digest = hashlib.sha512(digest).digest()
+    elif latency > 0:
+        time.sleep(latency)
+
+
+def _should_fail() -> bool:
+    return random.random() < float(os.environ.get("FAKE_VERACRYPT_FAILURE_RATE", "0"))
+
+
+def _option(arguments: List[str], name: str) -> Optional[str]:
+    """Fetches the value following a switch, or of a `--name=value` option."""
+    for index, argument in enumerate(arguments):
+        if argument == name and index + 1 < len(arguments):
+            return arguments[index + 1]
+        if argument.startswith(name + "="):
+            return argument.split("=", 1)[1]
+    return None
+
+
+def _mount(state_directory: Path, volume: str, mount_point: str, prf: Optional[str] = None) -> int:
+    mount_point = normalize_mount_point(mount_point)
+    state_path = _state_path(state_directory, mount_point)
+    if state_path.exists():
+        print(f"Error: {mount_point} is already in use.", file=sys.stderr)
+        return 1
+    if len(mount_point) > 3:  # Not a drive letter
+        Path(mount_point).mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps({"mount_point": mount_point, "volume": volume, "prf": prf or "SHA-512"}))
+    return 0
+
+
+def _dismount(state_directory: Path, volume: Optional[str], mount_point: Optional[str]) -> int:
+    states = _read_states(state_directory)
+    if volume is None and mount_point is None:  # Dismount all
+        for state in states:
+            _state_path(state_directory, state["mount_point"]).unlink(missing_ok=True)
+        return 0
+    if mount_point is not None:
+        mount_point = normalize_mount_point(mount_point)
+    matching = [state for state in states if state["mount_point"] == mount_point or (mount_point is None and state["volume"] == volume)]
+    if not matching:
+        print("Error: No such volume is mounted.", file=sys.stderr)
+        return 1
+    for state in matching:
+        _state_path(state_directory, state["mount_point"]).unlink(missing_ok=True)
+    return 0
+
+
+def _create(volume: str, size: int, force: bool) -> int:
+    path = Path(volume)
+    if path.exists() and not force:
+        print(f"Error: {volume} already exists.", file=sys.stderr)
+        return 1
+    with open(path, "r+b" if path.exists() else "wb") as file:
+        file.write(os.urandom(512))  # Stands in for the volume header
+        if os.fstat(file.fileno()).st_size < size:
+            file.truncate(size)
+    return 0
+
+
+def main(arguments: List[str]) -> int:
+    """Runs the fake VeraCrypt with the given command-line arguments.
+
+    Args:
+        arguments (List[str]): Arguments, excluding the program name.
+
+    Returns:
+        int: Exit code.
+    """
+    state_directory = Path(os.environ[STATE_DIRECTORY_VARIABLE])
+    state_directory.mkdir(parents=True, exist_ok=True)
+
+    if "--stdin" in arguments:
+        sys.stdin.readline()  # Consumes the password like the real executable
+
+    if "--list" in arguments or "-l" in arguments:
+        states = _read_states(state_directory)
+        if not states:
+            print("Error: No volumes mounted.", file=sys.stderr)
+            return 1
+        for slot, state in enumerate(states, start=1):
+            print(f"{slot}: {state['volume']} /dev/mapper/veracrypt{slot} {state['mount_point']}")
+        return 0
+
+    properties_volume = _option(arguments, "--volume-properties")
+    if properties_volume is not None:
+        for state in _read_states(state_directory):
+            if state["volume"] == properties_volume:
+                print(f"Volume: {state['volume']}\nMount Directory: {state['mount_point']}\nPKCS-5 PRF: HMAC-{state['prf']}")
+                return 0
+        print("Error: No such volume is mounted.", file=sys.stderr)
+        return 1
+
+    if "/wipecache" in arguments:
+        _password_cache_path(state_directory).unlink(missing_ok=True)
+        return 0
+
+    _simulate_work()
+    if _should_fail():
+        print("Error: Operation failed due to one or more of the following:\n - Incorrect password.", file=sys.stderr)
+        return 1
+
+    # Linux text-mode syntax
+    if "--text" in arguments:
+        if "--create" in arguments or "-c" in arguments:
+            return _create(_option(arguments, "--create"), int(_option(arguments, "--size")), "--force" in arguments)
+        if "--dismount" in arguments or "-d" in arguments:
+            return _dismount(state_directory, _option(arguments, "--dismount"), None)
+        positional = [argument for argument in arguments if not argument.startswith("-")]
+        volume, mount_point = _option(arguments, "--mount"), positional[-1]
+        return _mount(state_directory, volume, mount_point, _option(arguments, "--hash"))
+
+    # Windows switch syntax
+    if "/dismount" in arguments:
+        letter = _option(arguments, "/dismount")
+        return _dismount(state_directory, None, None if letter is None or letter.startswith("/") else f"{letter}:\\")
+    volume = _option(arguments, "/volume")
+    cache_path = _password_cache_path(state_directory)
+    cached = cache_path.read_text().splitlines() if cache_path.exists() else []
+    password = _option(arguments, "/password")
+    if password is None and "/tryemptypass" not in arguments and volume not in cached:
+        print("Error: Incorrect password or not a VeraCrypt volume.", file=sys.stderr)
+        return 1
+    if password is not None and _option(arguments, "/cache") == "y" and volume not in cached:
+        with open(cache_path, "a") as file:
+            file.write(volume + "\n")
+    return _mount(state_directory, volume, f"{_option(arguments, '/letter')}:\\")
+
+
+# **********
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
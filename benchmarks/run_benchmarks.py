@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This script benchmarks bulk mounting and dismounting against the fake VeraCrypt executable.
+
+For every combination of container count and concurrency level it reports throughput, p50 and p99 latency,
+and memory use, for example:
+
+    python -m benchmarks.run_benchmarks --containers 10 50 --concurrency 1 4 16 --latency 0.05
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+import resource
+import tempfile
+import tracemalloc
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import List, Sequence
+
+# Adds package to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt, scan_fake_mounts
+from simple_veracrypt_container_interface.backends import LinuxTextBackend, WindowsBackend
+from simple_veracrypt_container_interface.bulk_operations import BulkOperationReport, mount_many, dismount_many
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# **********
+@dataclass
+class BenchmarkResult:
+    """Measurements of one bulk operation at one container count and concurrency level."""
+
+    operation: str
+    containers: int
+    concurrency: int
+    failures: int
+    wall_clock_seconds: float
+    throughput_per_second: float
+    p50_seconds: float
+    p99_seconds: float
+    python_peak_bytes: int
+    max_rss_bytes: int
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Computes a nearest-rank percentile.
+
+    Args:
+        values (Sequence[float]): Values to compute the percentile of.
+        fraction (float): Percentile as a fraction in [0, 1].
+
+    Returns:
+        float: The percentile, or 0 for no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def max_rss_bytes() -> int:
+    """Fetches the peak resident set size of this process and its reaped children."""
+    scale = 1 if sys.platform == "darwin" else 1024  # Linux reports kilobytes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale
+
+
+def summarize(operation: str, concurrency: int, report: BulkOperationReport, peak_bytes: int) -> BenchmarkResult:
+    """Summarizes a bulk operation report.
+
+    Args:
+        operation (str): Name of the operation.
+        concurrency (int): Concurrency level of the run.
+        report (BulkOperationReport): Report of the run.
+        peak_bytes (int): Peak Python heap use during the run.
+
+    Returns:
+        BenchmarkResult: The summary.
+    """
+    latencies = [result.duration_seconds for result in report.results]
+    return BenchmarkResult(
+        operation=operation,
+        containers=len(report.results),
+        concurrency=concurrency,
+        failures=len(report.failed),
+        wall_clock_seconds=report.wall_clock_seconds,
+        throughput_per_second=len(report.results) / report.wall_clock_seconds if report.wall_clock_seconds else 0.0,
+        p50_seconds=percentile(latencies, 0.5),
+        p99_seconds=percentile(latencies, 0.99),
+        python_peak_bytes=peak_bytes,
+        max_rss_bytes=max_rss_bytes(),
+    )
+
+
+# **********
+async def benchmark(container_count: int, concurrency: int, working_directory: Path, backend_name: str) -> List[BenchmarkResult]:
+    """Mounts and then dismounts a set of containers through the fake executable.
+
+    Args:
+        container_count (int): Number of containers.
+        concurrency (int): Concurrency limit of the bulk operations.
+        working_directory (Path): Empty directory to create the containers and mount state in.
+        backend_name (str): `linux` or `windows`.
+
+    Returns:
+        List[BenchmarkResult]: Results of the mount and the dismount runs.
+    """
+    state_directory = working_directory / "state"
+    os.environ[STATE_DIRECTORY_VARIABLE] = str(state_directory)
+    executable_path = install_fake_veracrypt(working_directory)
+    mount_table = MountTable(scanner=lambda: scan_fake_mounts(state_directory))
+
+    containers = []
+    for index in range(container_count):
+        container_path = working_directory / f"container{index}.hc"
+        container_path.touch()
+        if backend_name == "linux":
+            backend, target = LinuxTextBackend(), str(working_directory / "mnt" / f"container{index}")
+        else:
+            backend, target = WindowsBackend(), chr(ord("A") + index)
+        containers.append(VeracryptContainer(executable_path, container_path, target, password="Password", mount_table=mount_table, backend=backend))
+
+    results = []
+    for operation, run in (("mount", mount_many), ("dismount", dismount_many)):
+        tracemalloc.start()
+        report = await run(containers, concurrency=concurrency)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append(summarize(operation, concurrency, report, peak_bytes))
+    return results
+
+
+def format_table(results: List[BenchmarkResult]) -> str:
+    """Formats results as an aligned text table."""
+    header = f"{'operation':<10}{'containers':>11}{'concurrency':>12}{'failures':>9}{'wall (s)':>10}{'ops/s':>9}{'p50 (ms)':>10}{'p99 (ms)':>10}{'py peak (KiB)':>15}{'max rss (MiB)':>15}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result.operation:<10}{result.containers:>11}{result.concurrency:>12}{result.failures:>9}"
+            f"{result.wall_clock_seconds:>10.3f}{result.throughput_per_second:>9.1f}"
+            f"{result.p50_seconds * 1000:>10.1f}{result.p99_seconds * 1000:>10.1f}"
+            f"{result.python_peak_bytes / 1024:>15.1f}{result.max_rss_bytes / 2 ** 20:>15.1f}"
+        )
+    return "\n".join(lines)
+
+
+def parse_arguments(arguments: List[str]) -> argparse.Namespace:
+    """Parses the command-line arguments of the benchmark runner.
+
+    Args:
+        arguments (List[str]): Arguments, excluding the program name.
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--containers", type=int, nargs="+", default=[1, 10, 50], help="Container counts to benchmark.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels to benchmark.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds each fake mount or dismount takes.")
+    parser.add_argument("--burn-cpu", action="store_true", help="Burn CPU for the latency instead of sleeping.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that a fake mount or dismount fails.")
+    parser.add_argument("--backend", choices=["linux", "windows"], default="linux", help="Command-line syntax to benchmark.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON instead of a table.")
+    return parser.parse_args(arguments)
+
+
+def main(arguments: List[str]) -> int:
+    """Runs every benchmark scenario against the fake VeraCrypt and prints the results.
+
+    Args:
+        arguments (List[str]): Arguments, excluding the program name.
+
+    Returns:
+        int: Exit code: 0 on success and 2 if the options are invalid.
+    """
+    options = parse_arguments(arguments)
+    if options.backend == "windows" and max(options.containers) > 26:
+        print("The windows backend is limited to 26 containers by the drive letters.", file=sys.stderr)
+        return 2
+
+    os.environ["FAKE_VERACRYPT_LATENCY"] = str(options.latency)
+    os.environ["FAKE_VERACRYPT_BURN_CPU"] = "1" if options.burn_cpu else "0"
+    os.environ["FAKE_VERACRYPT_FAILURE_RATE"] = str(options.failure_rate)
+
+    results = []
+    for container_count in options.containers:
+        for concurrency in options.concurrency:
+            with tempfile.TemporaryDirectory() as working_directory:
+                results.extend(asyncio.run(benchmark(container_count, concurrency, Path(working_directory), options.backend)))
+
+    print(json.dumps([asdict(result) for result in results], indent=2) if options.json else format_table(results))
+    return 0
+
+
+# **********
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
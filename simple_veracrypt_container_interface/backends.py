@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the command backends that translate container operations into VeraCrypt command lines.
+"""
+
+import re
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from simple_veracrypt_container_interface.creation import HASH_ALGORITHMS
+from simple_veracrypt_container_interface.utilities import utilities
+from simple_veracrypt_container_interface.utilities.mount_point_allocator import MountPointAllocator
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+
+if TYPE_CHECKING:
+    from simple_veracrypt_container_interface.creation import CreateOptions
+    from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Default number of mount directories handed out below a Linux mount root, as many slots as VeraCrypt has.
+DEFAULT_MOUNT_SLOTS = 64
+
+#: Header key derivation hashes accepted when mounting, keyed by their Windows switch name. RIPEMD-160 only opens TrueCrypt volumes.
+MOUNT_HASH_ALGORITHMS = {**HASH_ALGORITHMS, "ripemd160": "RIPEMD-160"}
+
+# **********
+class CommandBackend:
+    """Builds the VeraCrypt commands for one command-line syntax."""
+
+    #: Whether VeraCrypt formats a backing file preallocated by the caller in place during a quick format.
+    supports_preallocation = False
+
+    #: Whether VeraCrypt can keep passwords in a driver cache and mount from it.
+    supports_password_cache = False
+
+    def mount_path(self, mount_letter: str) -> Path:
+        """Converts a container's mount letter or directory into the path it is mounted at.
+
+        Args:
+            mount_letter (str): Mount letter or mount directory.
+
+        Returns:
+            Path: Path at which the container is mounted.
+        """
+        raise NotImplementedError
+
+
+    def default_allocator(self, mount_table: MountTable) -> MountPointAllocator:
+        """Creates the allocator used by containers that auto-assign their mount target without being given one.
+
+        Args:
+            mount_table (MountTable): Mount table the allocator checks targets against.
+
+        Raises:
+            ValueError: If the syntax has no default mount targets and an allocator must be given explicitly.
+
+        Returns:
+            MountPointAllocator: The new allocator.
+        """
+        raise ValueError(f"{type(self).__name__} has no default mount targets; give the container an allocator.")
+
+
+    def build_mount_command(self, container: "VeracryptContainer") -> List[str]:
+        """Builds the command that mounts a container.
+
+        Args:
+            container (VeracryptContainer): Container to mount.
+
+        Returns:
+            List[str]: Command represented as a list of arguments.
+        """
+        raise NotImplementedError
+
+
+    def mount_input(self, container: "VeracryptContainer") -> Optional[bytes]:
+        """Builds the data written to the standard input of the mount command.
+
+        Args:
+            container (VeracryptContainer): Container to mount.
+
+        Returns:
+            Optional[bytes]: Data for standard input, or None if the command reads nothing.
+        """
+        return None
+
+
+    def build_dismount_command(self, container: "VeracryptContainer") -> List[str]:
+        """Builds the command that dismounts a container.
+
+        Args:
+            container (VeracryptContainer): Container to dismount.
+
+        Returns:
+            List[str]: Command represented as a list of arguments.
+        """
+        raise NotImplementedError
+
+
+    def build_dismount_all_command(self, executable_path: Path, force: bool = False) -> List[str]:
+        """Builds the command that dismounts every volume VeraCrypt has mounted in one invocation.
+
+        Args:
+            executable_path (Path): Path to the Veracrypt executable.
+            force (bool, optional): Whether volumes with open files are dismounted too. Defaults to False.
+
+        Returns:
+            List[str]: Command represented as a list of arguments.
+        """
+        raise NotImplementedError
+
+
+    def build_create_command(self, container: "VeracryptContainer", options: "CreateOptions", preallocated: bool) -> List[str]:
+        """Builds the command that creates and formats a container.
+
+        Args:
+            container (VeracryptContainer): Container to create.
+            options (CreateOptions): Parameters of the new container.
+            preallocated (bool): Whether the backing file was already preallocated and must be formatted in place.
+
+        Returns:
+            List[str]: Command represented as a list of arguments.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot create containers.")
+
+
+    def build_wipe_cache_command(self, executable_path: Path) -> List[str]:
+        """Builds the command that wipes the driver password cache.
+
+        Args:
+            executable_path (Path): Path to the Veracrypt executable.
+
+        Returns:
+            List[str]: Command represented as a list of arguments.
+        """
+        raise NotImplementedError(f"{type(self).__name__} has no driver password cache.")
+
+
+    async def list_mounted_volumes(self, executable_path: Path) -> Dict[Path, Path]:
+        """Asks VeraCrypt which volumes it has mounted.
+
+        Args:
+            executable_path (Path): Path to the Veracrypt executable.
+
+        Raises:
+            NotImplementedError: If the command-line syntax has no way to list volumes.
+
+        Returns:
+            Dict[Path, Path]: Container paths keyed by the path they are mounted at.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot list mounted volumes.")
+
+
+    async def query_prf(self, executable_path: Path, container_path: Path) -> Optional[str]:
+        """Asks VeraCrypt which PRF derived the header key of a mounted volume.
+
+        Args:
+            executable_path (Path): Path to the Veracrypt executable.
+            container_path (Path): Path to the mounted container.
+
+        Raises:
+            NotImplementedError: If the command-line syntax has no way to show volume properties.
+
+        Returns:
+            Optional[str]: The PRF, one of `MOUNT_HASH_ALGORITHMS`, or None if VeraCrypt did not report a known one.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot query volume properties.")
+
+
+class WindowsBackend(CommandBackend):
+    """Builds commands for the Windows `VeraCrypt.exe` switch syntax.
+
+    Containers are created by `VeraCrypt Format.exe`, expected next to the main executable.
+    """
+
+    #: File name of the format executable.
+    FORMAT_EXECUTABLE_NAME = "VeraCrypt Format.exe"
+
+    #: Passwords sent with `/cache y` stay in the driver cache until `/wipecache`.
+    supports_password_cache = True
+
+    def mount_path(self, mount_letter: str) -> Path:
+        return Path(f"{mount_letter}:\\") if len(mount_letter) == 1 else Path(mount_letter)
+
+
+    def default_allocator(self, mount_table: MountTable) -> MountPointAllocator:
+        return MountPointAllocator.for_drive_letters(mount_table=mount_table)
+
+
+    def build_mount_command(self, container: "VeracryptContainer") -> List[str]:
+        command = [
+            container.executable_path,
+            "/volume", container.container_path.absolute(),
+            "/letter", container.mount_letter,
+            "/silent",
+            "/auto",
+            "/quit",
+        ]
+
+        if container.keyfile_path:
+            command.extend(["/keyfile", container.keyfile_path.absolute()])
+
+        if container.effective_hash is not None:
+            command.extend(["/hash", container.effective_hash])
+        if container.pim is not None:
+            command.extend(["/pim", str(container.pim)])
+        if container.truecrypt:
+            command.append("/truecrypt")
+
+        if container.password_cache is not None:
+            command.extend(["/cache", "y"])
+
+        if container.mount_from_cache:
+            pass  # VeraCrypt tries the cached passwords when none is given
+        elif container.password:
+            command.extend(["/password", container.password])
+        else:
+            command.append("/tryemptypass")
+
+        return command
+
+
+    def build_dismount_command(self, container: "VeracryptContainer") -> List[str]:
+        return [
+            container.executable_path,
+            "/volume", container.container_path.absolute(),
+            "/dismount", container.mount_letter,
+            "/force",
+            "/silent",
+            "/quit",
+        ]
+
+
+    def build_dismount_all_command(self, executable_path: Path, force: bool = False) -> List[str]:
+        return [executable_path, "/dismount"] + (["/force"] if force else []) + ["/silent", "/quit"]
+
+
+    def build_wipe_cache_command(self, executable_path: Path) -> List[str]:
+        return [executable_path, "/wipecache", "/silent", "/quit"]
+
+
+    def build_create_command(self, container: "VeracryptContainer", options: "CreateOptions", preallocated: bool) -> List[str]:
+        command = [
+            Path(container.executable_path).with_name(self.FORMAT_EXECUTABLE_NAME),
+            "/create", container.container_path.absolute(),
+            "/size", str(options.size),
+            "/encryption", options.encryption,
+            "/hash", options.hash,
+            "/filesystem", options.filesystem,
+            "/password", container.password or "",
+            "/silent",
+        ]
+        if container.keyfile_path:
+            command.extend(["/keyfile", container.keyfile_path.absolute()])
+        if options.pim is not None:
+            command.extend(["/pim", str(options.pim)])
+        if options.dynamic:
+            command.append("/dynamic")
+        if options.quick_format:
+            command.append("/quick")
+        if options.overwrite:
+            command.append("/force")
+        return command
+
+
+class LinuxTextBackend(CommandBackend):
+    """Builds commands for the Linux `veracrypt --text --non-interactive` syntax.
+
+    Containers are mounted on directories and the password is passed over standard input, never on the command line.
+    """
+
+    #: Quick formats write only the headers and file system into an existing file.
+    supports_preallocation = True
+
+    #: Matches a `--list` line: `<slot>: <volume> <virtual device> <mount point>`.
+    LIST_LINE_PATTERN = re.compile(r"^\d+: (?P<volume>.+?) (?P<device>/dev/\S+|-) (?P<mount_point>.+)$")
+
+    #: Matches the PRF line of `--volume-properties`, e.g. `PKCS-5 PRF: HMAC-SHA-512`.
+    PRF_LINE_PATTERN = re.compile(r"^PKCS-5 PRF:\s*(?:HMAC-)?(?P<prf>.+?)\s*$")
+
+    def __init__(self, mount_root: Optional[Path] = None, mount_slots: int = DEFAULT_MOUNT_SLOTS):
+        """Instantiates a new LinuxTextBackend object.
+
+        Args:
+            mount_root (Optional[Path], optional): Directory under which auto-assigned containers get their mount directories. Defaults to None, which requires an explicit allocator.
+            mount_slots (int, optional): Number of mount directories handed out below the mount root. Defaults to DEFAULT_MOUNT_SLOTS.
+        """
+        self.mount_root = Path(mount_root) if mount_root is not None else None
+        self.mount_slots = mount_slots
+
+
+    def mount_path(self, mount_letter: str) -> Path:
+        return Path(mount_letter)
+
+
+    def default_allocator(self, mount_table: MountTable) -> MountPointAllocator:
+        if self.mount_root is None:
+            raise ValueError("LinuxTextBackend needs a mount root to auto-assign mount directories; give it one or give the container an allocator.")
+        return MountPointAllocator.for_directories(self.mount_root, self.mount_slots, mount_table=mount_table)
+
+
+    def _base_command(self, executable_path: Path) -> List[str]:
+        return [executable_path, "--text", "--non-interactive"]
+
+
+    def build_mount_command(self, container: "VeracryptContainer") -> List[str]:
+        keyfiles = container.keyfile_path.absolute() if container.keyfile_path else ""
+        command = self._base_command(container.executable_path) + [
+            "--stdin",
+            f"--keyfiles={keyfiles}",
+            "--protect-hidden=no",
+        ]
+        if container.effective_hash is not None:
+            command.append(f"--hash={MOUNT_HASH_ALGORITHMS[container.effective_hash]}")
+        if container.pim is not None:
+            command.append(f"--pim={container.pim}")
+        if container.truecrypt:
+            command.append("--truecrypt")
+        return command + [
+            "--mount", container.container_path.absolute(),
+            self.mount_path(container.mount_letter),
+        ]
+
+
+    def mount_input(self, container: "VeracryptContainer") -> Optional[bytes]:
+        return f"{container.password or ''}\n".encode()
+
+
+    def build_dismount_command(self, container: "VeracryptContainer") -> List[str]:
+        return self._base_command(container.executable_path) + [
+            "--force",
+            "--dismount", container.container_path.absolute(),
+        ]
+
+
+    def build_dismount_all_command(self, executable_path: Path, force: bool = False) -> List[str]:
+        return self._base_command(executable_path) + (["--force"] if force else []) + ["--dismount"]
+
+
+    def build_create_command(self, container: "VeracryptContainer", options: "CreateOptions", preallocated: bool) -> List[str]:
+        keyfiles = container.keyfile_path.absolute() if container.keyfile_path else ""
+        command = self._base_command(container.executable_path) + [
+            "--stdin",
+            "--create", container.container_path.absolute(),
+            f"--size={options.size}",
+            "--volume-type=normal",
+            f"--encryption={options.encryption}",
+            f"--hash={HASH_ALGORITHMS[options.hash]}",
+            f"--filesystem={options.filesystem}",
+            f"--pim={options.pim or 0}",
+            f"--keyfiles={keyfiles}",
+            "--random-source=/dev/urandom",
+        ]
+        if options.quick_format:
+            command.append("--quick")
+        if preallocated or options.overwrite:
+            command.append("--force")
+        return command
+
+
+    @classmethod
+    def parse_list_output(cls, output: str) -> Dict[Path, Path]:
+        """Parses the output of `veracrypt --text --list`.
+
+        Args:
+            output (str): Standard output of the command.
+
+        Returns:
+            Dict[Path, Path]: Container paths keyed by the path they are mounted at.
+        """
+        volumes = {}
+        for line in output.splitlines():
+            match = cls.LIST_LINE_PATTERN.match(line.strip())
+            if match:
+                volumes[Path(match.group("mount_point"))] = Path(match.group("volume"))
+        return volumes
+
+
+    async def list_mounted_volumes(self, executable_path: Path) -> Dict[Path, Path]:
+        command = self._base_command(executable_path) + ["--list"]
+        try:
+            result = await utilities.run_command(command, print_output=False)
+        except RuntimeError:
+            # VeraCrypt exits with an error when no volume is mounted
+            logger.info("No mounted VeraCrypt volumes listed.")
+            return {}
+        return self.parse_list_output(result.stdout)
+
+
+    @classmethod
+    def parse_prf(cls, output: str) -> Optional[str]:
+        """Parses the PRF out of the output of `veracrypt --text --volume-properties`.
+
+        Args:
+            output (str): Standard output of the command.
+
+        Returns:
+            Optional[str]: The PRF, one of `MOUNT_HASH_ALGORITHMS`, or None if no known PRF is listed.
+        """
+        names = {name.lower(): prf for prf, name in MOUNT_HASH_ALGORITHMS.items()}
+        for line in output.splitlines():
+            match = cls.PRF_LINE_PATTERN.match(line.strip())
+            if match:
+                return names.get(match.group("prf").lower())
+        return None
+
+
+    async def query_prf(self, executable_path: Path, container_path: Path) -> Optional[str]:
+        command = self._base_command(executable_path) + ["--volume-properties", container_path.absolute()]
+        result = await utilities.run_command(command, print_output=False)
+        return self.parse_prf(result.stdout)
+
+
+# **********
+if __name__ == "__main__":
+    pass
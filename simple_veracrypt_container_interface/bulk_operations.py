@@ -0,0 +1,549 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains helpers to mount and dismount many Veracrypt containers with bounded concurrency.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextlib
+from graphlib import TopologicalSorter
+from dataclasses import dataclass, field
+from typing import Optional, List, Iterable, Callable, Awaitable, Dict, Hashable, Set, Tuple, Type, TYPE_CHECKING
+
+from simple_veracrypt_container_interface.creation import CreateOptions
+from simple_veracrypt_container_interface.utilities import exceptions, instrumentation, utilities
+from simple_veracrypt_container_interface.veracrypt_container import AUTO_ASSIGN, VeracryptContainer
+
+if TYPE_CHECKING:
+    from simple_veracrypt_container_interface.preflight import HeaderVerifier
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+# **********
+@dataclass
+class BulkOperationResult:
+    """Outcome of a single container operation within a bulk run."""
+
+    #: Container the operation ran against.
+    container: VeracryptContainer
+
+    #: Exception raised by the operation, if any.
+    error: Optional[BaseException] = None
+
+    #: Seconds spent waiting for a concurrency slot.
+    queued_seconds: float = 0.0
+
+    #: Seconds spent running the operation itself.
+    duration_seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether the operation completed without raising."""
+        return self.error is None
+
+
+@dataclass
+class BulkOperationReport:
+    """Aggregated outcome of a bulk mount or dismount run."""
+
+    #: Per-container results, in the order the containers were given.
+    results: List[BulkOperationResult] = field(default_factory=list)
+
+    #: Wall-clock seconds for the whole run.
+    wall_clock_seconds: float = 0.0
+
+    #: Concurrency limit in effect when the run finished.
+    final_concurrency: int = 0
+
+    @property
+    def succeeded(self) -> List[BulkOperationResult]:
+        """Results of the operations that completed without raising."""
+        return [result for result in self.results if result.succeeded]
+
+    @property
+    def failed(self) -> List[BulkOperationResult]:
+        """Results of the operations that raised."""
+        return [result for result in self.results if not result.succeeded]
+
+    @property
+    def total_operation_seconds(self) -> float:
+        """Sum of the individual operation durations (i.e. the serial cost)."""
+        return sum(result.duration_seconds for result in self.results)
+
+
+# **********
+class AdaptiveConcurrencyLimiter:
+    """Async semaphore whose limit adapts to the observed operation latency.
+
+    The limit grows by one slot after every operation that finishes within `target_latency` and is halved
+    after one that exceeds it (additive increase, multiplicative decrease). Without a target latency it
+    behaves like a plain semaphore.
+    """
+
+    def __init__(self, limit: int, min_limit: int = 1, max_limit: Optional[int] = None, target_latency: Optional[float] = None):
+        """Instantiates a new AdaptiveConcurrencyLimiter object.
+
+        Args:
+            limit (int): Initial number of concurrent operations.
+            min_limit (int, optional): Lower bound for the limit. Defaults to 1.
+            max_limit (Optional[int], optional): Upper bound for the limit. Defaults to the initial limit.
+            target_latency (Optional[float], optional): Latency in seconds above which the limit shrinks. Defaults to None.
+
+        Raises:
+            ValueError: If the limits are not positive or are inconsistent.
+        """
+        max_limit = limit if max_limit is None else max_limit
+        if min_limit < 1 or not min_limit <= limit <= max_limit:
+            raise ValueError(f"Invalid concurrency limits: min={min_limit}, initial={limit}, max={max_limit}.")
+
+        self.limit = limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+
+        #: Number of operations currently holding a slot.
+        self.in_flight = 0
+
+        self._condition = asyncio.Condition()
+
+
+    async def acquire(self) -> None:
+        """Waits until a slot is free under the current limit and takes it."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+
+    async def release(self, latency: Optional[float] = None) -> None:
+        """Releases a slot and feeds the operation latency back into the limit.
+
+        Args:
+            latency (Optional[float], optional): Seconds the released operation took. Defaults to None.
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if latency is not None and self.target_latency is not None:
+                if latency > self.target_latency:
+                    self.limit = max(self.min_limit, self.limit // 2)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1)
+            self._condition.notify_all()
+
+
+# **********
+async def _run_bulk(
+    containers: Iterable[VeracryptContainer],
+    operation: Callable[[VeracryptContainer], Awaitable[None]],
+    concurrency: Optional[int],
+    max_concurrency: Optional[int],
+    target_latency: Optional[float],
+    rejected: Optional[Dict[VeracryptContainer, BaseException]] = None,
+) -> BulkOperationReport:
+    """Runs an operation over containers through an adaptive concurrency limiter.
+
+    Args:
+        containers (Iterable[VeracryptContainer]): Containers to run the operation against.
+        operation (Callable[[VeracryptContainer], Awaitable[None]]): Coroutine function to run per container.
+        concurrency (Optional[int]): Initial concurrency limit. Defaults to the CPU count when None.
+        max_concurrency (Optional[int]): Upper bound the limit may grow to. Defaults to twice the initial limit when adaptive.
+        target_latency (Optional[float]): Latency in seconds above which the limit shrinks. Disables adaptation when None.
+        rejected (Optional[Dict[VeracryptContainer, BaseException]], optional): Containers reported as failed with the given errors without running the operation. Defaults to None.
+
+    Returns:
+        BulkOperationReport: Per-container results and aggregate timings.
+    """
+    containers = list(containers)
+    rejected = rejected or {}
+    concurrency = concurrency or os.cpu_count() or 1
+    if max_concurrency is None:
+        max_concurrency = concurrency * 2 if target_latency is not None else concurrency
+    limiter = AdaptiveConcurrencyLimiter(concurrency, max_limit=max_concurrency, target_latency=target_latency)
+
+    async def run_one(container: VeracryptContainer) -> BulkOperationResult:
+        result = BulkOperationResult(container)
+        if container in rejected:
+            result.error = rejected[container]
+            return result
+        queued_at = time.monotonic()
+        await limiter.acquire()
+        started_at = time.monotonic()
+        result.queued_seconds = started_at - queued_at
+        try:
+            await operation(container)
+        except Exception as e:
+            result.error = e
+        finally:
+            result.duration_seconds = time.monotonic() - started_at
+            await limiter.release(result.duration_seconds)
+        return result
+
+    logger.info(f"Running bulk operation over {len(containers)} containers with concurrency {concurrency}.")
+    started_at = time.monotonic()
+    results = await asyncio.gather(*(run_one(container) for container in containers))
+    report = BulkOperationReport(list(results), time.monotonic() - started_at, limiter.limit)
+
+    if report.failed:
+        logger.error(f"Bulk operation failed for {len(report.failed)} of {len(containers)} containers.")
+    return report
+
+
+async def mount_many(
+    containers: Iterable[VeracryptContainer],
+    concurrency: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    target_latency: Optional[float] = None,
+    print_output: bool = False,
+    timeout: Optional[float] = None,
+    verifier: Optional["HeaderVerifier"] = None,
+) -> BulkOperationReport:
+    """Mounts many Veracrypt containers with bounded concurrency.
+
+    With a verifier, the credentials of every container are checked at once before any mount takes a concurrency
+    slot; containers whose credentials are known to be wrong are reported as failed without running VeraCrypt.
+
+    Args:
+        containers (Iterable[VeracryptContainer]): Containers to mount.
+        concurrency (Optional[int], optional): Initial concurrency limit. Defaults to the CPU count.
+        max_concurrency (Optional[int], optional): Upper bound the adaptive limit may grow to. Defaults to None.
+        target_latency (Optional[float], optional): Mount latency in seconds above which the limit shrinks. Defaults to None.
+        print_output (bool, optional): Whether to print the output of each command. Defaults to False.
+        timeout (Optional[float], optional): Seconds after which each command is killed and reported as failed. Defaults to None.
+        verifier (Optional[HeaderVerifier], optional): Checks the credentials of the containers before mounting them. Defaults to None.
+
+    Returns:
+        BulkOperationReport: Per-container results and aggregate timings.
+    """
+    containers = list(containers)
+    rejected = await _preflight(verifier, containers) if verifier is not None else None
+    return await _run_bulk(
+        containers,
+        lambda container: container.mount(print_output, raise_on_error=True, timeout=timeout),
+        concurrency, max_concurrency, target_latency, rejected,
+    )
+
+
+async def _preflight(verifier: "HeaderVerifier", containers: List[VeracryptContainer]) -> Dict[VeracryptContainer, BaseException]:
+    """Checks the credentials of containers off the event loop and collects the ones to reject.
+
+    A check that fails, for example on an unreadable header, leaves the container to VeraCrypt.
+    """
+    rejected: Dict[VeracryptContainer, BaseException] = {}
+    results = await verifier.verify_many(containers, return_exceptions=True)
+    for container, result in zip(containers, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Could not check the credentials of container at `{container.container_path}`: {result}")
+            continue
+        try:
+            verifier.apply(container, result)
+        except exceptions.InvalidCredentialsError as e:
+            rejected[container] = e
+    return rejected
+
+
+async def dismount_many(
+    containers: Iterable[VeracryptContainer],
+    concurrency: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    target_latency: Optional[float] = None,
+    print_output: bool = False,
+    timeout: Optional[float] = None,
+) -> BulkOperationReport:
+    """Dismounts many Veracrypt containers with bounded concurrency.
+
+    Args:
+        containers (Iterable[VeracryptContainer]): Containers to dismount.
+        concurrency (Optional[int], optional): Initial concurrency limit. Defaults to the CPU count.
+        max_concurrency (Optional[int], optional): Upper bound the adaptive limit may grow to. Defaults to None.
+        target_latency (Optional[float], optional): Dismount latency in seconds above which the limit shrinks. Defaults to None.
+        print_output (bool, optional): Whether to print the output of each command. Defaults to False.
+        timeout (Optional[float], optional): Seconds after which each command is killed and reported as failed. Defaults to None.
+
+    Returns:
+        BulkOperationReport: Per-container results and aggregate timings.
+    """
+    return await _run_bulk(
+        containers,
+        lambda container: container.dismount(print_output, raise_on_error=True, timeout=timeout),
+        concurrency, max_concurrency, target_latency,
+    )
+
+
+async def dismount_all(containers: Iterable[VeracryptContainer], print_output: bool = False, timeout: Optional[float] = None, force: bool = False) -> BulkOperationReport:
+    """Dismounts every volume VeraCrypt has mounted with a single invocation, then reconciles each container.
+
+    One process replaces a dismount per container, so the containers must share their executable and backend.
+    Operations of the containers still in flight are cancelled first, and the containers stay locked until they
+    are reconciled. The mount table is scanned once before the command to tell which containers are mounted, and
+    once after it: containers that were not mounted are reported as already dismounted, and containers still
+    mounted as failed. Volumes mounted outside of the given containers are dismounted too, unless none of the
+    containers is mounted, in which case the command is not run.
+
+    Args:
+        containers (Iterable[VeracryptContainer]): Containers to dismount.
+        print_output (bool, optional): Whether to print the output of the command. Defaults to False.
+        timeout (Optional[float], optional): Seconds after which the command is killed. Defaults to None.
+        force (bool, optional): Whether volumes with open files are dismounted too. Defaults to False.
+
+    Raises:
+        ValueError: If the containers use different executables or backends.
+
+    Returns:
+        BulkOperationReport: Per-container results, each carrying the duration of the shared command.
+    """
+    containers = list(containers)
+    if not containers:
+        return BulkOperationReport()
+    first = containers[0]
+    if any(container.executable_path != first.executable_path or type(container.backend) is not type(first.backend) for container in containers):
+        raise ValueError("Containers dismounted in one invocation must share their executable and backend.")
+
+    started_at = time.monotonic()
+    results = {id(container): BulkOperationResult(container) for container in containers}
+    with first.instrumentation.operation("dismount_all", containers=str(len(containers))):
+        for container in containers:
+            await container.cancel_operations()
+            await container.cancel_warmup()
+
+        async with contextlib.AsyncExitStack() as stack:
+            lock_managers = {id(container.lock_manager): container.lock_manager for container in containers if container.lock_manager is not None}
+            for lock_manager in lock_managers.values():
+                await stack.enter_async_context(lock_manager.lock_containers([container for container in containers if container.lock_manager is lock_manager]))
+
+            with instrumentation.phase("probe"):
+                _invalidate_mount_tables(containers)
+                mounted = []
+                for container in containers:
+                    if container.mount_letter == AUTO_ASSIGN or not utilities.is_mounted(container.mount_path, container.mount_table):
+                        results[id(container)].error = exceptions.AlreadyDismountedError(f"Container at {container.container_path} is not mounted.")
+                    else:
+                        mounted.append(container)
+            if not mounted:
+                return BulkOperationReport(list(results.values()), time.monotonic() - started_at, 1)
+
+            logger.info(f"Dismounting all VeraCrypt volumes in one invocation for {len(mounted)} mounted containers.")
+            command_error: Optional[BaseException] = None
+            try:
+                await utilities.run_command(first.backend.build_dismount_all_command(first.executable_path, force), print_output, timeout=timeout)
+            except RuntimeError as e:
+                logger.error(f"Error running dismount-all command: {str(e)}")
+                command_error = e
+            duration = time.monotonic() - started_at
+
+            with instrumentation.phase("reconcile"):
+                _invalidate_mount_tables(mounted)
+                for container in mounted:
+                    result = results[id(container)]
+                    result.duration_seconds = duration
+                    if utilities.is_mounted(container.mount_path, container.mount_table):
+                        result.error = command_error or RuntimeError(f"Container at {container.container_path} is still mounted at {container.mount_path}.")
+                        continue
+                    try:
+                        await container.reconcile_dismount()
+                    except Exception as e:
+                        result.error = e
+
+    report = BulkOperationReport(list(results.values()), time.monotonic() - started_at, 1)
+    if report.failed:
+        logger.error(f"Dismount-all left {len(report.failed)} of {len(containers)} containers failed.")
+    return report
+
+
+def _invalidate_mount_tables(containers: List[VeracryptContainer]) -> None:
+    """Drops the snapshots of the mount tables of the containers, so that the next probe rescans each once."""
+    for mount_table in {id(container.mount_table): container.mount_table for container in containers}.values():
+        mount_table.invalidate()
+
+
+async def create_many(
+    containers: Iterable[VeracryptContainer],
+    options: CreateOptions,
+    concurrency: Optional[int] = None,
+    print_output: bool = False,
+    timeout: Optional[float] = None,
+) -> BulkOperationReport:
+    """Creates many Veracrypt containers with bounded concurrency.
+
+    Creation is dominated by the header key derivation, which is CPU-bound, so the default limit is the CPU count.
+
+    Args:
+        containers (Iterable[VeracryptContainer]): Containers to create.
+        options (CreateOptions): Parameters of every new container.
+        concurrency (Optional[int], optional): Concurrency limit. Defaults to the CPU count.
+        print_output (bool, optional): Whether to print the output of each command. Defaults to False.
+        timeout (Optional[float], optional): Seconds after which each command is killed and reported as failed. Defaults to None.
+
+    Returns:
+        BulkOperationReport: Per-container results and aggregate timings.
+    """
+    return await _run_bulk(
+        containers,
+        lambda container: container.create(options, print_output, raise_on_error=True, timeout=timeout),
+        concurrency, None, None,
+    )
+
+
+# **********
+async def _run_graph(
+    containers: Dict[Hashable, VeracryptContainer],
+    dependencies: Dict[Hashable, Set[Hashable]],
+    operation: Callable[[VeracryptContainer], Awaitable[None]],
+    concurrency: Optional[int],
+    satisfied: Tuple[Type[BaseException], ...] = (),
+) -> BulkOperationReport:
+    """Runs an operation over containers in dependency order, running every container whose dependencies are done.
+
+    A container whose dependency failed is not run and reported with a `DependencyFailedError`.
+
+    Args:
+        containers (Dict[Hashable, VeracryptContainer]): Containers by name.
+        dependencies (Dict[Hashable, Set[Hashable]]): Names of the containers each container must wait for.
+        operation (Callable[[VeracryptContainer], Awaitable[None]]): Coroutine function to run per container.
+        concurrency (Optional[int]): Most operations run at once. Defaults to the CPU count when None.
+        satisfied (Tuple[Type[BaseException], ...], optional): Errors that are still reported but leave a dependency in the state its dependents need, such as `AlreadyMountedError`. Defaults to none.
+
+    Raises:
+        ValueError: If a dependency names an unknown container.
+        graphlib.CycleError: If the dependencies form a cycle.
+
+    Returns:
+        BulkOperationReport: Per-container results, in the order the containers were given, and aggregate timings.
+    """
+    _check_dependencies(containers, dependencies)
+    concurrency = concurrency or os.cpu_count() or 1
+    limiter = AdaptiveConcurrencyLimiter(concurrency)
+    sorter = TopologicalSorter({name: dependencies.get(name, set()) for name in containers})
+    sorter.prepare()
+
+    async def run_one(name: Hashable) -> BulkOperationResult:
+        result = BulkOperationResult(containers[name])
+        queued_at = time.monotonic()
+        await limiter.acquire()
+        started_at = time.monotonic()
+        result.queued_seconds = started_at - queued_at
+        try:
+            await operation(containers[name])
+        except Exception as e:
+            result.error = e
+        finally:
+            result.duration_seconds = time.monotonic() - started_at
+            await limiter.release()
+        return result
+
+    logger.info(f"Running dependency-ordered operation over {len(containers)} containers with concurrency {concurrency}.")
+    started_at = time.monotonic()
+    results: Dict[Hashable, BulkOperationResult] = {}
+    tasks: Dict[asyncio.Task, Hashable] = {}
+    try:
+        while sorter.is_active():
+            while ready := sorter.get_ready():
+                for name in ready:
+                    failed_dependencies = sorted(str(dependency) for dependency in dependencies.get(name, ()) if not (results[dependency].succeeded or isinstance(results[dependency].error, satisfied)))
+                    if failed_dependencies:
+                        results[name] = BulkOperationResult(containers[name], exceptions.DependencyFailedError(f"Skipped because `{', '.join(failed_dependencies)}` failed."))
+                        sorter.done(name)
+                    else:
+                        tasks[asyncio.create_task(run_one(name))] = name
+            if not tasks:
+                continue
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks.pop(task)
+                results[name] = task.result()
+                sorter.done(name)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    report = BulkOperationReport([results[name] for name in containers], time.monotonic() - started_at, limiter.limit)
+    if report.failed:
+        logger.error(f"Dependency-ordered operation failed for {len(report.failed)} of {len(containers)} containers.")
+    return report
+
+
+def _check_dependencies(containers: Dict[Hashable, VeracryptContainer], dependencies: Dict[Hashable, Set[Hashable]]) -> None:
+    """Raises a ValueError if a dependency names an unknown container."""
+    unknown = {dependency for names in dependencies.values() for dependency in names} - containers.keys()
+    if unknown:
+        raise ValueError(f"Dependencies on unknown containers: {', '.join(sorted(map(str, unknown)))}.")
+
+
+async def mount_graph(
+    containers: Dict[Hashable, VeracryptContainer],
+    dependencies: Dict[Hashable, Set[Hashable]],
+    concurrency: Optional[int] = None,
+    print_output: bool = False,
+    timeout: Optional[float] = None,
+) -> BulkOperationReport:
+    """Mounts containers after the containers they depend on, such as nested containers after their outer container.
+
+    Independent branches are mounted in parallel, so the run takes the time of the longest dependency chain. A
+    container that was already mounted is reported with an `AlreadyMountedError`, but its dependents are mounted.
+
+    Args:
+        containers (Dict[Hashable, VeracryptContainer]): Containers by name.
+        dependencies (Dict[Hashable, Set[Hashable]]): Names of the containers each container needs mounted first.
+        concurrency (Optional[int], optional): Most mounts run at once. Defaults to the CPU count.
+        print_output (bool, optional): Whether to print the output of each command. Defaults to False.
+        timeout (Optional[float], optional): Seconds after which each command is killed and reported as failed. Defaults to None.
+
+    Raises:
+        ValueError: If a dependency names an unknown container.
+        graphlib.CycleError: If the dependencies form a cycle.
+
+    Returns:
+        BulkOperationReport: Per-container results and aggregate timings.
+    """
+    return await _run_graph(
+        containers, dependencies,
+        lambda container: container.mount(print_output, raise_on_error=True, timeout=timeout),
+        concurrency, satisfied=(exceptions.AlreadyMountedError,),
+    )
+
+
+async def dismount_graph(
+    containers: Dict[Hashable, VeracryptContainer],
+    dependencies: Dict[Hashable, Set[Hashable]],
+    concurrency: Optional[int] = None,
+    print_output: bool = False,
+    timeout: Optional[float] = None,
+) -> BulkOperationReport:
+    """Dismounts containers in reverse dependency order, each after every container that depends on it.
+
+    A container that was already dismounted is reported with an `AlreadyDismountedError`, but the containers it
+    depends on are dismounted.
+
+    Args:
+        containers (Dict[Hashable, VeracryptContainer]): Containers by name.
+        dependencies (Dict[Hashable, Set[Hashable]]): Names of the containers each container needed mounted first.
+        concurrency (Optional[int], optional): Most dismounts run at once. Defaults to the CPU count.
+        print_output (bool, optional): Whether to print the output of each command. Defaults to False.
+        timeout (Optional[float], optional): Seconds after which each command is killed and reported as failed. Defaults to None.
+
+    Raises:
+        ValueError: If a dependency names an unknown container.
+        graphlib.CycleError: If the dependencies form a cycle.
+
+    Returns:
+        BulkOperationReport: Per-container results and aggregate timings.
+    """
+    _check_dependencies(containers, dependencies)
+    dependents: Dict[Hashable, Set[Hashable]] = {name: set() for name in containers}
+    for name, names in dependencies.items():
+        for dependency in names:
+            dependents[dependency].add(name)
+    return await _run_graph(
+        containers, dependents,
+        lambda container: container.dismount(print_output, raise_on_error=True, timeout=timeout),
+        concurrency, satisfied=(exceptions.AlreadyDismountedError,),
+    )
+
+
+# **********
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains a persistent SQLite catalog of Veracrypt containers.
+
+The catalog indexes containers by path and tag and remembers their absolute paths, the stat fingerprint
+(size, mtime, inode) seen at the last validation, their preferred mount point, their last mount duration and
+the PRF their volume header was found to use. Every row is loaded into memory when the catalog is opened, so
+lookups never touch the database.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer, AUTO_ASSIGN
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS containers (
+    container_path TEXT PRIMARY KEY,
+    keyfile_path TEXT,
+    preferred_mount_point TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    inode INTEGER,
+    last_mount_seconds REAL,
+    prf TEXT
+);
+CREATE TABLE IF NOT EXISTS container_tags (
+    container_path TEXT NOT NULL REFERENCES containers (container_path) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (container_path, tag)
+);
+CREATE INDEX IF NOT EXISTS container_tags_by_tag ON container_tags (tag);
+"""
+
+# Columns added after the first release, with their definitions, for upgrading existing databases
+_ADDED_COLUMNS = {"prf": "TEXT"}
+
+#: Stat fingerprint of a container file: size, modification time in nanoseconds and inode.
+Fingerprint = Tuple[int, int, int]
+
+# **********
+@dataclass(frozen=True)
+class CatalogEntry:
+    """A container known to the catalog."""
+
+    #: Absolute path of the container.
+    container_path: Path
+
+    #: Absolute path of the keyfile, if there is one.
+    keyfile_path: Optional[Path] = None
+
+    #: Mount letter or directory the container is preferably mounted at.
+    preferred_mount_point: Optional[str] = None
+
+    #: Tags the container is indexed by.
+    tags: frozenset = field(default_factory=frozenset)
+
+    #: Stat fingerprint seen at the last successful validation.
+    fingerprint: Optional[Fingerprint] = None
+
+    #: Seconds the last successful mount took.
+    last_mount_seconds: Optional[float] = None
+
+    #: PRF of the volume header learned from a successful mount, passed to VeraCrypt on later mounts.
+    prf: Optional[str] = None
+
+
+def fingerprint_of(path: Path) -> Fingerprint:
+    """Stats a file into a fingerprint.
+
+    Args:
+        path (Path): File to stat.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+
+    Returns:
+        Fingerprint: Size, modification time in nanoseconds and inode of the file.
+    """
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+# **********
+class ContainerCatalog:
+    """Persistent index of Veracrypt containers with cached validation."""
+
+    def __init__(self, database_path: Path):
+        """Instantiates a new ContainerCatalog object, loading every entry into memory.
+
+        Args:
+            database_path (Path): Path to the SQLite database, created if missing. `:memory:` keeps the catalog in memory.
+        """
+        self.database_path = database_path
+        self._connection = sqlite3.connect(str(database_path), isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(_SCHEMA)
+        self._upgrade_schema()
+        self._lock = threading.Lock()
+
+        self._entries: Dict[Path, CatalogEntry] = {}
+        self._paths_by_tag: Dict[str, Set[Path]] = {}
+        self._load()
+
+
+    def _upgrade_schema(self) -> None:
+        """Adds the columns a database created by an earlier version lacks."""
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(containers)")}
+        for column, definition in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._connection.execute(f"ALTER TABLE containers ADD COLUMN {column} {definition}")
+
+
+    def _load(self) -> None:
+        """Loads every entry from the database."""
+        tags: Dict[str, Set[str]] = {}
+        for container_path, tag in self._connection.execute("SELECT container_path, tag FROM container_tags"):
+            tags.setdefault(container_path, set()).add(tag)
+
+        for row in self._connection.execute("SELECT * FROM containers"):
+            container_path, keyfile_path, preferred_mount_point, size, mtime_ns, inode, last_mount_seconds, prf = row
+            entry = CatalogEntry(
+                Path(container_path),
+                Path(keyfile_path) if keyfile_path else None,
+                preferred_mount_point,
+                frozenset(tags.get(container_path, ())),
+                (size, mtime_ns, inode) if size is not None else None,
+                last_mount_seconds,
+                prf,
+            )
+            self._index(entry)
+        logger.info(f"Loaded {len(self._entries)} containers from catalog `{self.database_path}`.")
+
+
+    def _index(self, entry: CatalogEntry) -> None:
+        """Adds an entry to the in-memory indexes, replacing any previous version."""
+        previous = self._entries.get(entry.container_path)
+        if previous is not None:
+            for tag in previous.tags:
+                self._paths_by_tag[tag].discard(entry.container_path)
+        self._entries[entry.container_path] = entry
+        for tag in entry.tags:
+            self._paths_by_tag.setdefault(tag, set()).add(entry.container_path)
+
+
+    def _write(self, entries: Iterable[CatalogEntry]) -> None:
+        """Persists entries in one transaction and indexes them."""
+        entries = list(entries)
+        rows = []
+        tag_rows = []
+        for entry in entries:
+            size, mtime_ns, inode = entry.fingerprint or (None, None, None)
+            rows.append((
+                str(entry.container_path), str(entry.keyfile_path) if entry.keyfile_path else None,
+                entry.preferred_mount_point, size, mtime_ns, inode, entry.last_mount_seconds, entry.prf,
+            ))
+            tag_rows.extend((str(entry.container_path), tag) for tag in entry.tags)
+
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany("INSERT OR REPLACE INTO containers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._connection.executemany("DELETE FROM container_tags WHERE container_path = ?", [row[:1] for row in rows])
+                self._connection.executemany("INSERT INTO container_tags VALUES (?, ?)", tag_rows)
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            for entry in entries:
+                self._index(entry)
+
+
+    @staticmethod
+    def _key(container_path: Path) -> Path:
+        """Converts a container path into the absolute path it is indexed by."""
+        return Path(os.path.abspath(container_path))
+
+
+    # **********
+    def add(self, container_path: Path, keyfile_path: Optional[Path] = None, preferred_mount_point: Optional[str] = None, tags: Iterable[str] = ()) -> CatalogEntry:
+        """Adds or replaces a container.
+
+        Args:
+            container_path (Path): Path to the container.
+            keyfile_path (Optional[Path], optional): Path to the keyfile of the container. Defaults to None.
+            preferred_mount_point (Optional[str], optional): Mount letter or directory to mount the container at. Defaults to None.
+            tags (Iterable[str], optional): Tags to index the container by. Defaults to no tags.
+
+        Returns:
+            CatalogEntry: The stored entry.
+        """
+        return self.add_many([(container_path, keyfile_path, preferred_mount_point, tags)])[0]
+
+
+    def add_many(self, containers: Iterable[Tuple[Path, Optional[Path], Optional[str], Iterable[str]]]) -> List[CatalogEntry]:
+        """Adds or replaces many containers in one transaction.
+
+        Args:
+            containers (Iterable[Tuple[Path, Optional[Path], Optional[str], Iterable[str]]]): Container path, keyfile path, preferred mount point and tags of each container.
+
+        Returns:
+            List[CatalogEntry]: The stored entries.
+        """
+        entries = []
+        for container_path, keyfile_path, preferred_mount_point, tags in containers:
+            key = self._key(container_path)
+            previous = self._entries.get(key)
+            entries.append(CatalogEntry(
+                key,
+                self._key(keyfile_path) if keyfile_path else None,
+                preferred_mount_point,
+                frozenset(tags),
+                last_mount_seconds=previous.last_mount_seconds if previous else None,
+                prf=previous.prf if previous else None,
+            ))
+        self._write(entries)
+        return entries
+
+
+    def remove(self, container_path: Path) -> None:
+        """Removes a container from the catalog.
+
+        Args:
+            container_path (Path): Path to the container.
+        """
+        key = self._key(container_path)
+        with self._lock:
+            self._connection.execute("DELETE FROM containers WHERE container_path = ?", (str(key),))
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                for tag in entry.tags:
+                    self._paths_by_tag[tag].discard(key)
+
+
+    def get(self, container_path: Path) -> Optional[CatalogEntry]:
+        """Fetches a container by path.
+
+        Args:
+            container_path (Path): Path to the container.
+
+        Returns:
+            Optional[CatalogEntry]: The entry, or None if the container is not in the catalog.
+        """
+        return self._entries.get(self._key(container_path))
+
+
+    def find_by_tag(self, tag: str) -> List[CatalogEntry]:
+        """Fetches every container with a tag.
+
+        Args:
+            tag (str): Tag to look up.
+
+        Returns:
+            List[CatalogEntry]: The entries, sorted by container path.
+        """
+        return [self._entries[path] for path in sorted(self._paths_by_tag.get(tag, ()))]
+
+
+    def entries(self) -> List[CatalogEntry]:
+        """Fetches every container in the catalog.
+
+        Returns:
+            List[CatalogEntry]: The entries, sorted by container path.
+        """
+        return [self._entries[path] for path in sorted(self._entries)]
+
+
+    # **********
+    def validate(self, container_path: Path, keyfile_path: Optional[Path] = None) -> None:
+        """Checks that a container and its keyfile exist, storing the fingerprint of the container if it changed.
+
+        The container and the keyfile are each stat'ed once. The database is only written when the fingerprint of
+        the container differs from the one stored at the last validation.
+
+        Args:
+            container_path (Path): Path to the container.
+            keyfile_path (Optional[Path], optional): Path to the keyfile of the container. Defaults to None.
+
+        Raises:
+            FileNotFoundError: If the container or the keyfile is not found.
+        """
+        try:
+            fingerprint = fingerprint_of(container_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Container at {container_path} not found.") from None
+
+        if keyfile_path and not keyfile_path.exists():
+            raise FileNotFoundError(f"Keyfile at {keyfile_path} not found.")
+
+        entry = self.get(container_path)
+        if entry is not None and entry.fingerprint != fingerprint:
+            self._write([replace(entry, fingerprint=fingerprint)])
+
+
+    def record_mount(self, container_path: Path, seconds: float) -> None:
+        """Stores how long a successful mount of a container took.
+
+        Args:
+            container_path (Path): Path to the container.
+            seconds (float): Duration of the mount.
+        """
+        entry = self.get(container_path)
+        if entry is not None:
+            self._write([replace(entry, last_mount_seconds=seconds)])
+
+
+    def record_prf(self, container_path: Path, prf: Optional[str]) -> None:
+        """Stores the PRF a container's volume header uses.
+
+        Args:
+            container_path (Path): Path to the container.
+            prf (Optional[str]): The PRF, or None to forget it.
+        """
+        entry = self.get(container_path)
+        if entry is not None and entry.prf != prf:
+            self._write([replace(entry, prf=prf)])
+
+
+    def build_container(self, container_path: Path, executable_path: Path, password: Optional[str] = None, **kwargs) -> VeracryptContainer:
+        """Builds a VeracryptContainer from a catalog entry.
+
+        Args:
+            container_path (Path): Path to the container.
+            executable_path (Path): Path to the Veracrypt executable.
+            password (Optional[str], optional): Password for the container if there is one. Defaults to None.
+            **kwargs: Further `VeracryptContainer` arguments, overriding the catalog's.
+
+        Raises:
+            KeyError: If the container is not in the catalog.
+
+        Returns:
+            VeracryptContainer: Container that validates and records its mounts through the catalog.
+        """
+        entry = self.get(container_path)
+        if entry is None:
+            raise KeyError(f"Container at {container_path} is not in the catalog.")
+        kwargs.setdefault("mount_letter", entry.preferred_mount_point or AUTO_ASSIGN)
+        kwargs.setdefault("keyfile_path", entry.keyfile_path)
+        return VeracryptContainer(executable_path, entry.container_path, password=password, catalog=self, **kwargs)
+
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        self._connection.close()
+
+
+# **********
+if __name__ == "__main__":
+    pass
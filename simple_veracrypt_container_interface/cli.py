@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the `simple-veracrypt` console script, which mounts and dismounts the containers of a manifest.
+
+    simple-veracrypt plan environment.toml
+    simple-veracrypt mount environment.toml --concurrency 4
+    simple-veracrypt dismount environment.toml
+
+Containers are mounted as soon as the containers they depend on are mounted and dismounted as soon as the
+containers depending on them are dismounted, so independent branches run in parallel. See `manifest` for the
+manifest format.
+"""
+
+import sys
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from graphlib import CycleError
+from typing import List, Optional
+
+from simple_veracrypt_container_interface.bulk_operations import BulkOperationReport, mount_graph, dismount_graph
+from simple_veracrypt_container_interface.manifest import load_manifest, dependency_levels
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+# **********
+def format_report(names: List[str], report: BulkOperationReport) -> str:
+    """Formats the outcome of a run, one line per container.
+
+    Args:
+        names (List[str]): Container names, in the order of the report results.
+        report (BulkOperationReport): Report of the run.
+
+    Returns:
+        str: The formatted outcome.
+    """
+    lines = []
+    for name, result in zip(names, report.results):
+        outcome = "ok" if result.succeeded else f"failed: {result.error}"
+        lines.append(f"{name:<24} {result.duration_seconds * 1000:>9.1f} ms  {outcome}")
+    lines.append(
+        f"{len(report.succeeded)}/{len(report.results)} succeeded in {report.wall_clock_seconds:.3f} s "
+        f"(serial cost {report.total_operation_seconds:.3f} s)"
+    )
+    return "\n".join(lines)
+
+
+def parse_arguments(arguments: List[str]) -> argparse.Namespace:
+    """Parses the command-line arguments of the console script.
+
+    Args:
+        arguments (List[str]): Arguments, excluding the program name.
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(prog="simple-veracrypt", description="Mounts and dismounts the Veracrypt containers of a manifest.")
+    parser.add_argument("command", choices=["plan", "mount", "dismount"], help="Prints the mount order, or mounts or dismounts every container.")
+    parser.add_argument("manifest", type=Path, help="TOML or JSON manifest of the containers.")
+    parser.add_argument("--concurrency", type=int, default=None, help="Most Veracrypt processes run at once. Overrides the manifest.")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds after which each Veracrypt command is killed.")
+    parser.add_argument("--verbose", action="store_true", help="Logs progress and prints the output of each command.")
+    return parser.parse_args(arguments)
+
+
+def main(arguments: List[str]) -> int:
+    """Runs the console script with the given command-line arguments.
+
+    Args:
+        arguments (List[str]): Arguments, excluding the program name.
+
+    Returns:
+        int: Exit code: 0 on success, 1 if an operation failed and 2 if the manifest is invalid.
+    """
+    options = parse_arguments(arguments)
+    logging.basicConfig(level=logging.INFO if options.verbose else logging.WARNING)
+
+    try:
+        manifest = load_manifest(options.manifest)
+        dependencies = manifest.dependencies()
+        levels = dependency_levels(dependencies)
+    except (OSError, ValueError, CycleError) as e:
+        print(f"Invalid manifest: {e}", file=sys.stderr)
+        return 2
+
+    if options.command == "plan":
+        for index, level in enumerate(levels, start=1):
+            print(f"{index}: {', '.join(level)}")
+        return 0
+
+    try:
+        containers = manifest.build_containers()
+    except (EnvironmentError, KeyError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    operation = mount_graph if options.command == "mount" else dismount_graph
+    report = asyncio.run(operation(containers, dependencies, options.concurrency or manifest.concurrency, options.verbose, options.timeout))
+    print(format_report(list(containers), report))
+    return 1 if report.failed else 0
+
+
+def run(arguments: Optional[List[str]] = None) -> None:
+    """Entry point of the console script."""
+    sys.exit(main(sys.argv[1:] if arguments is None else arguments))
+
+
+# **********
+if __name__ == "__main__":
+    run()
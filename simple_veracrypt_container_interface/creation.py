@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the options for creating Veracrypt containers and the preallocation of their backing files.
+
+A full format writes random data over the whole container, so its time is bound by disk writes. A quick format
+only writes the headers and the file system, which lets the backing file be preallocated beforehand: with
+`posix_fallocate` the blocks are reserved without writing them, and a dynamic container is backed by a sparse file.
+"""
+
+import os
+import errno
+import logging
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Hash algorithms accepted by `CreateOptions.hash`, keyed by their Windows switch name.
+HASH_ALGORITHMS = {"sha512": "SHA-512", "sha256": "SHA-256", "whirlpool": "Whirlpool", "blake2s": "BLAKE2s-256", "streebog": "Streebog"}
+
+# **********
+@dataclass(frozen=True)
+class CreateOptions:
+    """Parameters of a new Veracrypt container."""
+
+    #: Size of the container in bytes.
+    size: int
+
+    #: Encryption algorithm, e.g. `AES` or `AES(Twofish)`.
+    encryption: str = "AES"
+
+    #: Header key derivation hash, one of `HASH_ALGORITHMS`.
+    hash: str = "sha512"
+
+    #: File system to format the volume with, e.g. `FAT`, `NTFS` or `ext4`.
+    filesystem: str = "FAT"
+
+    #: Personal iterations multiplier, if not the default.
+    pim: Optional[int] = None
+
+    #: Whether to skip overwriting the volume with random data.
+    quick: bool = False
+
+    #: Whether the container grows on demand instead of occupying its full size. Implies a quick format.
+    dynamic: bool = False
+
+    #: Whether to preallocate the backing file before a quick format, where the backend allows.
+    preallocate: bool = True
+
+    #: Whether to replace an existing file at the container path.
+    overwrite: bool = False
+
+    def __post_init__(self):
+        if self.size <= 0:
+            raise ValueError(f"Container size must be positive, got {self.size}.")
+        if self.hash not in HASH_ALGORITHMS:
+            raise ValueError(f"Unknown hash algorithm `{self.hash}`, expected one of {', '.join(HASH_ALGORITHMS)}.")
+
+    @property
+    def quick_format(self) -> bool:
+        """Whether the volume is formatted without overwriting it with random data."""
+        return self.quick or self.dynamic
+
+
+def preallocate_file(path: Path, size: int, sparse: bool = False, overwrite: bool = False) -> None:
+    """Creates a backing file of a given size without writing its content.
+
+    Blocks are reserved with `posix_fallocate` where the platform and file system support it; otherwise, or if
+    `sparse` is set, the file is extended with `ftruncate` and allocated on first write.
+
+    Args:
+        path (Path): Path of the file to create.
+        size (int): Size of the file in bytes.
+        sparse (bool, optional): Whether to leave the file sparse. Defaults to False.
+        overwrite (bool, optional): Whether to replace an existing file. Defaults to False.
+
+    Raises:
+        FileExistsError: If the file exists and `overwrite` is not set.
+        OSError: If the file cannot be created or the disk is full.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | (os.O_TRUNC if overwrite else os.O_EXCL)
+    descriptor = os.open(path, flags, 0o600)
+    try:
+        if not sparse and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(descriptor, 0, size)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                    raise
+                logger.info(f"File system of `{path}` cannot preallocate, creating a sparse file instead.")
+        os.ftruncate(descriptor, size)
+    except BaseException:
+        os.close(descriptor)
+        descriptor = None
+        path.unlink(missing_ok=True)
+        raise
+    finally:
+        if descriptor is not None:
+            os.close(descriptor)
+
+
+# **********
+if __name__ == "__main__":
+    pass
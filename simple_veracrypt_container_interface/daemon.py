@@ -0,0 +1,583 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains an optional long-running service that owns every mount and dismount on a host, and its client.
+
+The daemon keeps one `VeracryptContainer` per container path and the mount state in memory, and serves requests
+over a Unix domain socket. Requests and responses are newline-delimited JSON objects:
+
+    {"id": 1, "action": "mount", "container": "/data/a.hc", "mount_point": "/mnt/a", "password": "..."}
+    {"id": 1, "ok": true, "result": {"container": "/data/a.hc", "mounted": true, "mount_point": "/mnt/a", "leases": 0}}
+
+Supported actions are `ping`, `status`, `mount`, `dismount`, `acquire_lease` and `release_lease`. Leases are
+tied to the connection that took them and are released when it closes. Failed requests answer with
+`{"ok": false, "error": {"type": ..., "message": ...}}` and `DaemonClient` re-raises them as the matching
+exception from `utilities.exceptions`.
+
+Given a `--journal`, every mount and dismount is journaled and a restarted daemon adopts the containers a
+previous instance left mounted instead of remounting them. The daemon can be started with:
+
+    python -m simple_veracrypt_container_interface.daemon --executable /usr/bin/veracrypt --backend linux --mount-root /media
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from simple_veracrypt_container_interface.backends import CommandBackend, LinuxTextBackend, WindowsBackend
+from simple_veracrypt_container_interface.journal import MountJournal, RecoveryReport
+from simple_veracrypt_container_interface.utilities import exceptions
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer, AUTO_ASSIGN, DEFAULT_LEASE_LINGER
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Default path of the daemon socket.
+DEFAULT_SOCKET_PATH = Path(tempfile.gettempdir()) / "simple_veracrypt_container_interface" / "daemon.sock"
+
+#: Largest request or response line accepted, in bytes.
+MAX_MESSAGE_SIZE = 2 ** 20
+
+# **********
+class MountDaemon:
+    """Service that serializes every mount and dismount on a host behind a Unix domain socket."""
+
+    def __init__(self, executable_path: Path, socket_path: Path = DEFAULT_SOCKET_PATH, backend: Optional[CommandBackend] = None, mount_table: Optional[MountTable] = None, max_concurrency: Optional[int] = None, linger: float = DEFAULT_LEASE_LINGER, journal: Optional[MountJournal] = None):
+        """Instantiates a new MountDaemon object.
+
+        Args:
+            executable_path (Path): Path to the Veracrypt executable.
+            socket_path (Path, optional): Path of the Unix domain socket to listen on. Defaults to DEFAULT_SOCKET_PATH.
+            backend (Optional[CommandBackend], optional): Command-line syntax of the executable. Defaults to the container default.
+            mount_table (Optional[MountTable], optional): Mount state shared by every container. Defaults to a private table.
+            max_concurrency (Optional[int], optional): Most Veracrypt processes run at once. Defaults to no limit.
+            linger (float, optional): Seconds a leased container stays mounted after its last lease. Defaults to DEFAULT_LEASE_LINGER.
+            journal (Optional[MountJournal], optional): Journal of every mount and dismount, recovered from on start. Defaults to None.
+        """
+        self.executable_path = executable_path
+        self.socket_path = Path(socket_path)
+        self.backend = backend
+        self.mount_table = mount_table if mount_table is not None else MountTable()
+        self.linger = linger
+        self.journal = journal
+        self.containers: Dict[Path, VeracryptContainer] = {}
+
+        self._process_slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self._container_locks: Dict[Path, asyncio.Lock] = {}
+        self._lingering: Dict[Path, asyncio.Task] = {}
+        self._expiries: Set[asyncio.Task] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+
+    # **********
+    def recover(self) -> RecoveryReport:
+        """Adopts the containers the journal records as still mounted, so that they are not remounted.
+
+        Raises:
+            ValueError: If the daemon has no journal.
+
+        Returns:
+            RecoveryReport: Adopted and discarded containers.
+        """
+        if self.journal is None:
+            raise ValueError("The daemon has no mount journal to recover from.")
+        report = self.journal.recover(self.mount_table)
+        for entry in report.adopted:
+            container = self._container_for({
+                "container": str(entry.container_path),
+                "mount_point": None if entry.auto_assigned else entry.target,
+                "keyfile": str(entry.keyfile_path) if entry.keyfile_path else None,
+            })
+            entry.restore(container)
+        return report
+
+
+    async def start(self) -> None:
+        """Recovers from the journal if there is one and starts listening on the socket, replacing a stale socket file.
+
+        Raises:
+            RuntimeError: If another daemon is already listening on the socket.
+        """
+        await self._remove_stale_socket()
+        if self.journal is not None:
+            self.recover()
+        self.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # Requests carry passwords, so the socket is created owner-only rather than restricted after it is bound
+        previous_umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=str(self.socket_path), limit=MAX_MESSAGE_SIZE)
+        finally:
+            os.umask(previous_umask)
+        logger.info(f"Mount daemon listening on `{self.socket_path}`.")
+
+
+    async def _remove_stale_socket(self) -> None:
+        """Removes a socket file left behind by a daemon that is gone, leaving the socket of a live daemon alone."""
+        try:
+            _, writer = await asyncio.open_unix_connection(str(self.socket_path))
+        except FileNotFoundError:
+            return
+        except ConnectionRefusedError:
+            logger.info(f"Removing stale mount daemon socket `{self.socket_path}`.")
+            self.socket_path.unlink(missing_ok=True)
+            return
+        writer.close()
+        with contextlib.suppress(ConnectionError):
+            await writer.wait_closed()
+        raise RuntimeError(f"Another mount daemon is already listening on `{self.socket_path}`.")
+
+
+    async def serve_forever(self) -> None:
+        """Starts the daemon if needed and serves until cancelled."""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+
+    async def close(self) -> None:
+        """Stops listening and dismounts the containers still held by lingering leases."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            self.socket_path.unlink(missing_ok=True)
+        for timer in self._lingering.values():
+            timer.cancel()
+        self._lingering.clear()
+        if self._expiries:
+            await asyncio.gather(*self._expiries, return_exceptions=True)
+        for container in self.containers.values():
+            await self._expire_lease(container)
+
+
+    # **********
+    def _container_for(self, request: Dict[str, Any]) -> VeracryptContainer:
+        """Fetches the container a request refers to, creating it on first use."""
+        container_path = request.get("container")
+        if not container_path:
+            raise ValueError("The request does not name a container.")
+        key = Path(os.path.abspath(container_path))
+
+        container = self.containers.get(key)
+        if container is not None:
+            self._check_matches(container, request)
+        if container is None:
+            container = VeracryptContainer(
+                self.executable_path,
+                key,
+                request.get("mount_point") or AUTO_ASSIGN,
+                password=request.get("password"),
+                keyfile_path=Path(request["keyfile"]) if request.get("keyfile") else None,
+                mount_table=self.mount_table,
+                backend=self.backend,
+                journal=self.journal,
+            )
+            self.containers[key] = container
+            self._container_locks[key] = asyncio.Lock()
+        elif request.get("password") is not None:
+            container.password = request["password"]
+        return container
+
+
+    @staticmethod
+    def _check_matches(container: VeracryptContainer, request: Dict[str, Any]) -> None:
+        """Raises a ValueError if a request names a known container with a different mount point or keyfile."""
+        if request.get("mount_point") is not None:
+            configured = AUTO_ASSIGN if container.auto_assign else container.mount_letter
+            if request["mount_point"] != configured:
+                raise ValueError(f"Container `{container.container_path}` is configured with mount point `{configured}`, not `{request['mount_point']}`.")
+        if request.get("keyfile") is not None and Path(request["keyfile"]) != container.keyfile_path:
+            raise ValueError(f"Container `{container.container_path}` is configured with keyfile `{container.keyfile_path}`, not `{request['keyfile']}`.")
+
+
+    def _describe(self, container: VeracryptContainer) -> Dict[str, Any]:
+        """Summarizes the state of a container from the in-memory mount table."""
+        mounted = container.mount_letter != AUTO_ASSIGN and self.mount_table.is_mounted(container.mount_path)
+        return {
+            "container": str(container.container_path),
+            "mounted": mounted,
+            "mount_point": str(container.mount_path) if mounted else None,
+            "leases": container.lease_count,
+        }
+
+
+    @contextlib.asynccontextmanager
+    async def _exclusive(self, container: VeracryptContainer) -> AsyncIterator[None]:
+        """Serializes operations on a container and bounds the Veracrypt processes run at once."""
+        async with self._container_locks[container.container_path]:
+            if self._process_slots is None:
+                yield
+            else:
+                async with self._process_slots:
+                    yield
+
+
+    async def _release_lease(self, container: VeracryptContainer, linger: float) -> None:
+        """Releases a lease, leaving the dismount after the linger period to a timer that takes the same exclusive section."""
+        async with self._exclusive(container):
+            await container.release_lease(linger if linger <= 0 else None)
+        if linger > 0 and container.lease_count == 0:
+            self._cancel_linger(container)
+            self._lingering[container.container_path] = asyncio.create_task(self._expire_after(container, linger))
+
+
+    def _cancel_linger(self, container: VeracryptContainer) -> None:
+        """Cancels the linger timer of a container, if it is still waiting."""
+        timer = self._lingering.pop(container.container_path, None)
+        if timer is not None:
+            timer.cancel()
+
+
+    async def _expire_after(self, container: VeracryptContainer, linger: float) -> None:
+        """Dismounts a container left unleased once the linger period is over."""
+        await asyncio.sleep(linger)
+        del self._lingering[container.container_path]  # Past this point the timer is no longer cancelled
+        expiry = asyncio.current_task()
+        self._expiries.add(expiry)
+        try:
+            await self._expire_lease(container)
+        finally:
+            self._expiries.discard(expiry)
+
+
+    async def _expire_lease(self, container: VeracryptContainer) -> None:
+        """Dismounts a container that is no longer leased, if its leases mounted it."""
+        try:
+            async with self._exclusive(container):
+                await container.expire_lease()
+        except RuntimeError:
+            pass  # Already logged by `dismount`, nobody is left to report it to
+
+
+    async def handle_request(self, request: Dict[str, Any], leases: Counter) -> Any:
+        """Executes one request.
+
+        Args:
+            request (Dict[str, Any]): The decoded request.
+            leases (Counter): Leases held by the connection the request arrived on, by container path.
+
+        Raises:
+            ValueError: If the request is malformed or its action is unknown.
+
+        Returns:
+            Any: JSON-serializable result of the request.
+        """
+        action = request.get("action")
+        if action == "ping":
+            return "pong"
+
+        if action == "status":
+            if request.get("container"):
+                return self._describe(self._container_for(request))
+            return [
+                {"mount_point": entry.mount_point, "source": entry.source, "fstype": entry.fstype,
+                 "container": str(backing) if (backing := self.mount_table.backing_container(entry.mount_point)) else None}
+                for entry in self.mount_table.entries().values()
+            ]
+
+        container = self._container_for(request)
+        timeout = request.get("timeout")
+        if action == "mount":
+            async with self._exclusive(container):
+                await container.mount(print_output=False, raise_on_error=True, timeout=timeout)
+        elif action == "dismount":
+            async with self._exclusive(container):
+                await container.dismount(print_output=False, raise_on_error=True, timeout=timeout)
+        elif action == "acquire_lease":
+            self._cancel_linger(container)
+            async with self._exclusive(container):
+                await container.acquire_lease()
+            leases[container.container_path] += 1
+        elif action == "release_lease":
+            if leases[container.container_path] <= 0:
+                raise ValueError(f"The connection holds no lease on `{container.container_path}`.")
+            leases[container.container_path] -= 1
+            await self._release_lease(container, request.get("linger", self.linger))
+        else:
+            raise ValueError(f"Unknown action `{action}`.")
+        return self._describe(container)
+
+
+    async def _respond(self, writer: asyncio.StreamWriter, request: Dict[str, Any], leases: Counter, write_lock: asyncio.Lock) -> None:
+        """Executes a request and writes its response."""
+        response: Dict[str, Any] = {"id": request.get("id")}
+        try:
+            response.update(ok=True, result=await self.handle_request(request, leases))
+        except Exception as e:
+            response.update(ok=False, error={"type": type(e).__name__, "message": str(e)})
+        async with write_lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves the requests of one client connection concurrently and releases its leases when it closes."""
+        leases: Counter = Counter()
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = {"action": None}
+                task = asyncio.create_task(self._respond(writer, request, leases, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logger.warning(f"Dropping daemon client connection: {e}")
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for container_path, count in leases.items():
+                container = self.containers[container_path]
+                for _ in range(count):
+                    try:
+                        await self._release_lease(container, self.linger)
+                    except RuntimeError:
+                        pass  # Already logged by `dismount`, the client is gone
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+
+# **********
+class DaemonRequestError(RuntimeError):
+    """Raised by `DaemonClient` when the daemon reports an error without a matching package exception."""
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+
+
+class DaemonClient:
+    """Asynchronous client of a `MountDaemon`. Requests may be issued concurrently over one connection."""
+
+    def __init__(self, socket_path: Path = DEFAULT_SOCKET_PATH):
+        """Instantiates a new DaemonClient object. Call `connect` or use it as an async context manager.
+
+        Args:
+            socket_path (Path, optional): Path of the daemon socket. Defaults to DEFAULT_SOCKET_PATH.
+        """
+        self.socket_path = Path(socket_path)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._receive_task: Optional[asyncio.Task] = None
+
+
+    async def connect(self) -> None:
+        """Connects to the daemon."""
+        self._reader, self._writer = await asyncio.open_unix_connection(str(self.socket_path), limit=MAX_MESSAGE_SIZE)
+        self._receive_task = asyncio.create_task(self._receive())
+
+
+    async def close(self) -> None:
+        """Closes the connection, releasing the leases it holds."""
+        if self._writer is not None:
+            self._writer.close()
+            with contextlib.suppress(ConnectionError):
+                await self._writer.wait_closed()
+            self._writer = None
+        if self._receive_task is not None:
+            await self._receive_task
+            self._receive_task = None
+
+
+    async def __aenter__(self) -> "DaemonClient":
+        await self.connect()
+        return self
+
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+    async def _receive(self) -> None:
+        """Resolves pending requests as their responses arrive."""
+        try:
+            while line := await self._reader.readline():
+                response = json.loads(line)
+                future = self._pending.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Lost connection to the mount daemon: {e}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("The connection to the mount daemon closed."))
+            self._pending.clear()
+
+
+    async def request(self, action: str, **fields) -> Any:
+        """Sends a request and waits for its result.
+
+        Args:
+            action (str): Action to perform.
+            **fields: Further request fields. Fields set to None are omitted.
+
+        Raises:
+            ConnectionError: If the client is not connected or the connection closes.
+            DaemonRequestError: If the daemon reports an error without a matching package exception.
+
+        Returns:
+            Any: The result of the request.
+        """
+        if self._writer is None:
+            raise ConnectionError("The client is not connected to the mount daemon.")
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        message = {"id": request_id, "action": action, **{key: value for key, value in fields.items() if value is not None}}
+        self._writer.write(json.dumps(message).encode() + b"\n")
+        await self._writer.drain()
+        response = await future
+
+        if response["ok"]:
+            return response["result"]
+        error = response["error"]
+        error_class = getattr(exceptions, error["type"], None)
+        if isinstance(error_class, type) and issubclass(error_class, Exception):
+            raise error_class(error["message"])
+        raise DaemonRequestError(error["type"], error["message"])
+
+
+    # **********
+    async def ping(self) -> None:
+        """Checks that the daemon answers."""
+        await self.request("ping")
+
+
+    async def status(self, container_path: Optional[Path] = None) -> Any:
+        """Fetches the state of one container, or every mounted volume if no container is given.
+
+        Args:
+            container_path (Optional[Path], optional): Path to the container. Defaults to None.
+
+        Returns:
+            Any: State of the container, or a list of the mounted volumes.
+        """
+        return await self.request("status", container=str(container_path) if container_path else None)
+
+
+    async def mount(self, container_path: Path, mount_point: Optional[str] = None, password: Optional[str] = None, keyfile_path: Optional[Path] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Mounts a container through the daemon.
+
+        Args:
+            container_path (Path): Path to the container.
+            mount_point (Optional[str], optional): Mount letter or directory. Defaults to one assigned by the daemon.
+            password (Optional[str], optional): Password of the container. Defaults to None.
+            keyfile_path (Optional[Path], optional): Path to the keyfile of the container. Defaults to None.
+            timeout (Optional[float], optional): Seconds the Veracrypt command may run. Defaults to None.
+
+        Raises:
+            AlreadyMountedError: If the container's mount point is already in use.
+
+        Returns:
+            Dict[str, Any]: State of the container after the mount.
+        """
+        return await self.request("mount", container=str(container_path), mount_point=mount_point, password=password,
+                                  keyfile=str(keyfile_path) if keyfile_path else None, timeout=timeout)
+
+
+    async def dismount(self, container_path: Path, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Dismounts a container through the daemon.
+
+        Args:
+            container_path (Path): Path to the container.
+            timeout (Optional[float], optional): Seconds the Veracrypt command may run. Defaults to None.
+
+        Raises:
+            AlreadyDismountedError: If the container is not mounted.
+
+        Returns:
+            Dict[str, Any]: State of the container after the dismount.
+        """
+        return await self.request("dismount", container=str(container_path), timeout=timeout)
+
+
+    @contextlib.asynccontextmanager
+    async def lease(self, container_path: Path, mount_point: Optional[str] = None, password: Optional[str] = None, keyfile_path: Optional[Path] = None, linger: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Holds a container mounted through the daemon for the duration of the context.
+
+        Args:
+            container_path (Path): Path to the container.
+            mount_point (Optional[str], optional): Mount letter or directory. Defaults to one assigned by the daemon.
+            password (Optional[str], optional): Password of the container. Defaults to None.
+            keyfile_path (Optional[Path], optional): Path to the keyfile of the container. Defaults to None.
+            linger (Optional[float], optional): Seconds to keep the container mounted after the last lease. Defaults to the daemon's.
+
+        Yields:
+            Dict[str, Any]: State of the mounted container.
+        """
+        state = await self.request("acquire_lease", container=str(container_path), mount_point=mount_point, password=password,
+                                   keyfile=str(keyfile_path) if keyfile_path else None)
+        try:
+            yield state
+        finally:
+            await self.request("release_lease", container=str(container_path), linger=linger)
+
+
+# **********
+def parse_arguments(arguments: List[str]) -> argparse.Namespace:
+    """Parses the command-line arguments of the daemon.
+
+    Args:
+        arguments (List[str]): Arguments, excluding the program name.
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Runs the mount daemon.")
+    parser.add_argument("--executable", type=Path, required=True, help="Path to the Veracrypt executable.")
+    parser.add_argument("--socket", type=Path, default=DEFAULT_SOCKET_PATH, help="Path of the Unix domain socket.")
+    parser.add_argument("--backend", choices=["linux", "windows"], default="linux", help="Command-line syntax of the executable.")
+    parser.add_argument("--mount-root", type=Path, default=None, help="Directory under which containers requested without a mount point are mounted on Linux.")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Most Veracrypt processes run at once.")
+    parser.add_argument("--linger", type=float, default=DEFAULT_LEASE_LINGER, help="Seconds a leased container stays mounted after its last lease.")
+    parser.add_argument("--journal", type=Path, default=None, help="Path of the mount journal used to adopt existing mounts on restart.")
+    return parser.parse_args(arguments)
+
+
+def main(arguments: List[str]) -> int:
+    """Runs the daemon with the given command-line arguments until interrupted.
+
+    Args:
+        arguments (List[str]): Arguments, excluding the program name.
+
+    Returns:
+        int: Exit code.
+    """
+    options = parse_arguments(arguments)
+    logging.basicConfig(level=logging.INFO)
+    backend = LinuxTextBackend(options.mount_root) if options.backend == "linux" else WindowsBackend()
+    journal = MountJournal(options.journal) if options.journal else None
+    daemon = MountDaemon(options.executable, options.socket, backend=backend, max_concurrency=options.max_concurrency, linger=options.linger, journal=journal)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(daemon.serve_forever())
+    if journal is not None:
+        journal.close()
+    return 0
+
+
+# **********
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module checks that container files have not been corrupted or tampered with between sessions.
+
+Container files are hashed in fixed-size chunks, each chunk memory-mapped and hashed in a process pool, and the
+per-chunk hashes are stored as a manifest next to the catalog together with the stat fingerprint of the file.
+A later check against an unchanged fingerprint is a single `stat`; a changed fingerprint, or a scrub, rehashes
+every chunk in parallel and reports the chunks that differ. Since a modification time gives no hint of which
+region was written, a changed file is always rehashed in full.
+
+Hooked into a container, the checker verifies the file before each mount and seals the state a session left it
+in after each dismount, so only changes made outside of a session are reported. The hooks run their work in a
+thread, so they do not block the event loop. Sealing stores the fingerprint of the file, a single `stat`, and
+keeps the chunk hashes only if the session left the fingerprint unchanged; a file whose fingerprint later changes
+is reported as changed without knowing which chunks differ, and a scrub of a file without chunk hashes is
+reported as unverifiable rather than passed. Pass `rehash_on_dismount=True` to rehash every chunk after each
+dismount instead, which keeps the changed chunks known and lets a scrub find corruption, at the cost of reading
+the whole file:
+
+    checker = IntegrityChecker.beside_catalog(catalog)
+    container.pre_mount_hooks.append(checker.pre_mount_hook)
+    container.post_dismount_hooks.append(checker.post_dismount_hook)
+"""
+
+import os
+import json
+import mmap
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import concurrent.futures
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+from simple_veracrypt_container_interface.catalog import Fingerprint, fingerprint_of
+from simple_veracrypt_container_interface.utilities import exceptions
+
+if TYPE_CHECKING:
+    from simple_veracrypt_container_interface.catalog import ContainerCatalog
+    from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Default size of a hashed chunk in bytes.
+DEFAULT_CHUNK_SIZE = 64 * 2 ** 20
+
+#: Default hash algorithm.
+DEFAULT_ALGORITHM = "blake2b"
+
+# Hashing pools are started from worker threads, which a forked child would inherit in an arbitrary state
+_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# **********
+@dataclass
+class ChunkManifest:
+    """Per-chunk hashes of a container file."""
+
+    #: Absolute path of the container.
+    container_path: str
+
+    #: Size of each chunk in bytes; the last chunk may be shorter.
+    chunk_size: int
+
+    #: Hash algorithm of the chunks.
+    algorithm: str
+
+    #: Stat fingerprint of the file when it was hashed.
+    fingerprint: Fingerprint
+
+    #: Hex digests of the chunks, in file order, or None if the file was sealed without hashing it.
+    chunks: Optional[List[str]]
+
+
+def _hash_chunk(path: str, offset: int, length: int, algorithm: str) -> str:
+    """Hashes one memory-mapped region of a file. Runs in a worker process."""
+    digest = hashlib.new(algorithm)
+    if length:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), length, access=mmap.ACCESS_READ, offset=offset) as region:
+            digest.update(region)
+    return digest.hexdigest()
+
+
+# **********
+class IntegrityChecker:
+    """Hashes container files in parallel chunks and compares them to stored manifests."""
+
+    def __init__(self, manifest_directory: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, algorithm: str = DEFAULT_ALGORITHM, workers: Optional[int] = None, rehash_on_dismount: bool = False):
+        """Instantiates a new IntegrityChecker object.
+
+        Args:
+            manifest_directory (Path): Directory holding the chunk manifests, created if missing.
+            chunk_size (int, optional): Size of each hashed chunk in bytes, a multiple of the mmap allocation granularity. Defaults to DEFAULT_CHUNK_SIZE.
+            algorithm (str, optional): Hash algorithm known to `hashlib`. Defaults to DEFAULT_ALGORITHM.
+            workers (Optional[int], optional): Number of hashing processes. Defaults to the CPU count.
+            rehash_on_dismount (bool, optional): Whether the post-dismount hook rehashes every chunk rather than only sealing the fingerprint. Defaults to False.
+
+        Raises:
+            ValueError: If the chunk size is not a positive multiple of the mmap allocation granularity.
+        """
+        if chunk_size <= 0 or chunk_size % mmap.ALLOCATIONGRANULARITY:
+            raise ValueError(f"Chunk size must be a positive multiple of {mmap.ALLOCATIONGRANULARITY}, got {chunk_size}.")
+        hashlib.new(algorithm)  # Fails early for unknown algorithms
+
+        self.manifest_directory = manifest_directory
+        self.chunk_size = chunk_size
+        self.algorithm = algorithm
+        self.workers = workers
+        self.rehash_on_dismount = rehash_on_dismount
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self.manifest_directory.mkdir(parents=True, exist_ok=True)
+
+
+    @classmethod
+    def beside_catalog(cls, catalog: "ContainerCatalog", **kwargs) -> "IntegrityChecker":
+        """Creates a checker storing its manifests in an `integrity` directory next to a catalog database.
+
+        Args:
+            catalog (ContainerCatalog): Catalog to store the manifests next to.
+            **kwargs: Further `IntegrityChecker` arguments.
+
+        Returns:
+            IntegrityChecker: The checker.
+        """
+        return cls(Path(catalog.database_path).resolve().parent / "integrity", **kwargs)
+
+
+    def close(self) -> None:
+        """Shuts down the hashing processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+    # **********
+    def _manifest_path(self, container_path: Path) -> Path:
+        return self.manifest_directory / (hashlib.sha1(str(container_path).encode()).hexdigest() + ".json")
+
+
+    def load_manifest(self, container_path: Path) -> Optional[ChunkManifest]:
+        """Loads the stored manifest of a container.
+
+        Args:
+            container_path (Path): Path to the container.
+
+        Returns:
+            Optional[ChunkManifest]: The manifest, or None if the container was never recorded.
+        """
+        key = Path(os.path.abspath(container_path))
+        try:
+            raw = json.loads(self._manifest_path(key).read_text())
+        except FileNotFoundError:
+            return None
+        return ChunkManifest(raw["container_path"], raw["chunk_size"], raw["algorithm"], tuple(raw["fingerprint"]), raw["chunks"])
+
+
+    def _store_manifest(self, manifest: ChunkManifest) -> None:
+        path = self._manifest_path(Path(manifest.container_path))
+        temporary_path = path.with_suffix(".tmp")
+        temporary_path.write_text(json.dumps(asdict(manifest)))
+        os.replace(temporary_path, path)
+
+
+    def hash_file(self, container_path: Path) -> Tuple[Fingerprint, List[str]]:
+        """Hashes every chunk of a file in the process pool.
+
+        Args:
+            container_path (Path): Path to the file.
+
+        Returns:
+            Tuple[Fingerprint, List[str]]: Fingerprint of the file before hashing and the chunk digests.
+        """
+        fingerprint = fingerprint_of(container_path)
+        size = fingerprint[0]
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(_POOL_START_METHOD))
+        offsets = range(0, size, self.chunk_size) if size else [0]
+        futures = [
+            self._executor.submit(_hash_chunk, str(container_path), offset, min(self.chunk_size, size - offset), self.algorithm)
+            for offset in offsets
+        ]
+        return fingerprint, [future.result() for future in futures]
+
+
+    def record(self, container_path: Path) -> ChunkManifest:
+        """Hashes a container file and stores its manifest as the trusted state.
+
+        Args:
+            container_path (Path): Path to the container.
+
+        Returns:
+            ChunkManifest: The stored manifest.
+        """
+        key = Path(os.path.abspath(container_path))
+        fingerprint, chunks = self.hash_file(key)
+        manifest = ChunkManifest(str(key), self.chunk_size, self.algorithm, fingerprint, chunks)
+        self._store_manifest(manifest)
+        logger.info(f"Recorded {len(chunks)} chunk hashes of `{key}`.")
+        return manifest
+
+
+    def seal(self, container_path: Path) -> ChunkManifest:
+        """Stores the current fingerprint of a container file as the trusted state, without hashing it.
+
+        The chunk hashes of the stored manifest are kept if the fingerprint is unchanged, since the file then is too.
+
+        Args:
+            container_path (Path): Path to the container.
+
+        Returns:
+            ChunkManifest: The stored manifest, without chunk hashes if the file changed.
+        """
+        key = Path(os.path.abspath(container_path))
+        fingerprint = fingerprint_of(key)
+        previous = self.load_manifest(key)
+        unchanged = previous is not None and previous.fingerprint == fingerprint and previous.chunk_size == self.chunk_size and previous.algorithm == self.algorithm
+        manifest = ChunkManifest(str(key), self.chunk_size, self.algorithm, fingerprint, previous.chunks if unchanged else None)
+        self._store_manifest(manifest)
+        logger.info(f"Sealed the fingerprint of `{key}`" + (", keeping its chunk hashes." if manifest.chunks is not None else "."))
+        return manifest
+
+
+    def verify(self, container_path: Path, scrub: bool = False) -> ChunkManifest:
+        """Checks a container file against its stored manifest, recording one if there is none yet.
+
+        Args:
+            container_path (Path): Path to the container.
+            scrub (bool, optional): Whether to rehash the file even if its fingerprint is unchanged. Defaults to False.
+
+        Raises:
+            IntegrityError: If any chunk differs from the manifest, or a sealed file changed, in which case the changed chunks are unknown and left empty.
+            IntegrityUnverifiableError: If the file is scrubbed but was sealed without chunk hashes. Call `record` to hash it.
+
+        Returns:
+            ChunkManifest: The manifest the file matches.
+        """
+        key = Path(os.path.abspath(container_path))
+        manifest = self.load_manifest(key)
+        if manifest is None or manifest.chunk_size != self.chunk_size or manifest.algorithm != self.algorithm:
+            logger.info(f"No matching integrity manifest for `{key}`, recording the current state.")
+            return self.record(key)
+        if not scrub and fingerprint_of(key) == manifest.fingerprint:
+            return manifest
+        if manifest.chunks is None:
+            if fingerprint_of(key) != manifest.fingerprint:
+                raise exceptions.IntegrityError(f"Container at {key} changed since it was sealed.", [])
+            raise exceptions.IntegrityUnverifiableError(f"Container at {key} was sealed without chunk hashes to scrub against.")
+
+        fingerprint, chunks = self.hash_file(key)
+        changed = [index for index in range(max(len(chunks), len(manifest.chunks)))
+                   if index >= len(chunks) or index >= len(manifest.chunks) or chunks[index] != manifest.chunks[index]]
+        if changed:
+            raise exceptions.IntegrityError(f"{len(changed)} chunks of container at {key} changed since they were recorded.", changed)
+        if fingerprint != manifest.fingerprint:
+            manifest.fingerprint = fingerprint  # Content is unchanged, so the next check can trust the new fingerprint
+            self._store_manifest(manifest)
+        return manifest
+
+
+    # **********
+    async def pre_mount_hook(self, container: "VeracryptContainer") -> None:
+        """Verifies a container in a thread before it is mounted. Append to `VeracryptContainer.pre_mount_hooks`."""
+        await asyncio.to_thread(self.verify, container.container_path)
+
+
+    async def post_dismount_hook(self, container: "VeracryptContainer") -> None:
+        """Seals, or with `rehash_on_dismount` records, the state a session left a container in, in a thread. Append to `VeracryptContainer.post_dismount_hooks`."""
+        await asyncio.to_thread(self.record if self.rehash_on_dismount else self.seal, container.container_path)
+
+
+# **********
+if __name__ == "__main__":
+    pass
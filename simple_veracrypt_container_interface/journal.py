@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains a crash-safe journal of mounts, used to adopt the mounts of a previous process on restart.
+
+Each mount and dismount appends an intent before running VeraCrypt and a completion after it, one JSON object per
+line, and fsyncs the file before the operation goes on. The records carry the container, its mount target and the
+options it was mounted with, never its password. On restart, `MountJournal.recover` replays the journal into the
+last known state of each container and reconciles it against a single scan of the mount table: containers whose
+mount target is still mounted are adopted, the rest are discarded, and an intent whose completion was never
+written is settled by whether its target is mounted. The journal is then compacted to the adopted mounts.
+
+    journal = MountJournal(Path("/var/lib/veracrypt/mounts.journal"))
+    report = journal.recover(mount_table)
+    for entry in report.adopted:
+        container = VeracryptContainer(executable_path, entry.container_path, entry.target, journal=journal)
+        entry.restore(container)
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable, normalize_mount_point
+
+if TYPE_CHECKING:
+    from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Event written before a mount command runs.
+MOUNT_INTENT = "mount_intent"
+
+#: Event written after a mount command succeeded.
+MOUNTED = "mounted"
+
+#: Event written after a mount command failed.
+MOUNT_FAILED = "mount_failed"
+
+#: Event written before a dismount command runs.
+DISMOUNT_INTENT = "dismount_intent"
+
+#: Event written after a dismount command succeeded.
+DISMOUNTED = "dismounted"
+
+#: Event written after a dismount command failed.
+DISMOUNT_FAILED = "dismount_failed"
+
+# Pending operation each intent leaves behind until its completion is written
+_PENDING_OPERATIONS = {MOUNT_INTENT: "mount", DISMOUNT_INTENT: "dismount"}
+
+# **********
+@dataclass(frozen=True)
+class JournalEntry:
+    """Last known state of a container replayed from the journal."""
+
+    #: Absolute path of the container.
+    container_path: Path
+
+    #: Mount letter or directory the container was mounted at.
+    target: str
+
+    #: Path the container was mounted at.
+    mount_path: Path
+
+    #: Whether the target was reserved from an allocator rather than configured.
+    auto_assigned: bool = False
+
+    #: Path to the keyfile, if there is one.
+    keyfile_path: Optional[Path] = None
+
+    #: PRF the container was mounted with, if known.
+    hash: Optional[str] = None
+
+    #: Personal iterations multiplier the container was mounted with, if not the default.
+    pim: Optional[int] = None
+
+    #: Whether the container was mounted as a TrueCrypt volume.
+    truecrypt: bool = False
+
+    #: Operation whose intent was written without a completion, `mount` or `dismount`, if any.
+    pending: Optional[str] = None
+
+
+    def restore(self, container: "VeracryptContainer") -> None:
+        """Hands an adopted mount to a container, so that it can be dismounted without remounting it.
+
+        Args:
+            container (VeracryptContainer): Container at the journaled path.
+        """
+        container.mount_letter = self.target
+        container.keyfile_path = container.keyfile_path or self.keyfile_path
+        if container.pim is None:
+            container.pim = self.pim
+        container.truecrypt = container.truecrypt or self.truecrypt
+        if container.effective_hash is None:
+            container.learned_prf = self.hash
+        container.mount_table.record_mount(container.mount_path, container.container_path)
+
+
+@dataclass
+class RecoveryReport:
+    """Outcome of reconciling the journal with the mount table."""
+
+    #: Containers still mounted, whose mounts were adopted.
+    adopted: List[JournalEntry] = field(default_factory=list)
+
+    #: Containers journaled as mounted or mounting whose targets are no longer mounted.
+    discarded: List[JournalEntry] = field(default_factory=list)
+
+    #: Records replayed from the journal.
+    records: int = 0
+
+    #: Trailing records cut short by a crash and skipped.
+    torn_records: int = 0
+
+    #: Seconds the replay and reconciliation took.
+    seconds: float = 0.0
+
+
+# **********
+class MountJournal:
+    """Append-only, fsync'd journal of mount and dismount intents and completions."""
+
+    def __init__(self, path: Path, fsync: bool = True):
+        """Instantiates a new MountJournal object, creating the journal file if missing.
+
+        Args:
+            path (Path): Path of the journal file.
+            fsync (bool, optional): Whether each record is flushed to disk before the operation goes on. Defaults to True.
+        """
+        self.path = Path(path)
+        self.fsync = fsync
+
+        #: Records appended by this journal so far.
+        self.record_count = 0
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+
+    def close(self) -> None:
+        """Closes the journal file."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+    def __enter__(self) -> "MountJournal":
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+    # **********
+    def append(self, event: str, container: "VeracryptContainer") -> None:
+        """Appends a record of a container and flushes it to disk.
+
+        Args:
+            event (str): Event to record, such as `MOUNT_INTENT` or `MOUNTED`.
+            container (VeracryptContainer): Container the event happened to.
+        """
+        entry = JournalEntry(
+            container.container_path.absolute(),
+            container.mount_letter,
+            container.mount_path,
+            container.auto_assign,
+            container.keyfile_path,
+            container.effective_hash,
+            container.pim,
+            container.truecrypt,
+        )
+        self._write(self._format(event, entry))
+
+
+    @staticmethod
+    def _format(event: str, entry: JournalEntry) -> bytes:
+        record = {
+            "time": time.time(),
+            "event": event,
+            "container": str(entry.container_path),
+            "target": entry.target,
+            "mount_path": str(entry.mount_path),
+            "auto_assigned": entry.auto_assigned,
+            "keyfile": str(entry.keyfile_path) if entry.keyfile_path else None,
+            "hash": entry.hash,
+            "pim": entry.pim,
+            "truecrypt": entry.truecrypt,
+        }
+        return json.dumps(record).encode() + b"\n"
+
+
+    def _write(self, data: bytes) -> None:
+        with self._lock:
+            if self._fd is None:
+                raise ValueError(f"Mount journal at `{self.path}` is closed.")
+            os.write(self._fd, data)
+            if self.fsync:
+                os.fsync(self._fd)
+            self.record_count += 1
+
+
+    # **********
+    def replay(self) -> Dict[Path, JournalEntry]:
+        """Replays the journal into the last known state of each container.
+
+        Returns:
+            Dict[Path, JournalEntry]: Containers journaled as mounted or with an operation in flight, by path.
+        """
+        return self._replay(RecoveryReport())
+
+
+    def _replay(self, report: RecoveryReport) -> Dict[Path, JournalEntry]:
+        entries: Dict[Path, JournalEntry] = {}
+        try:
+            content = self.path.read_bytes()
+        except FileNotFoundError:
+            return entries
+
+        for line in content.splitlines():
+            try:
+                record = json.loads(line)
+                container_path = Path(record["container"])
+                event = record["event"]
+            except (ValueError, KeyError, TypeError):
+                report.torn_records += 1
+                continue
+            report.records += 1
+
+            if event in (DISMOUNTED, MOUNT_FAILED):
+                entries.pop(container_path, None)
+                continue
+            entries[container_path] = self._entry(record, _PENDING_OPERATIONS.get(event))
+        return entries
+
+
+    @staticmethod
+    def _entry(record: dict, pending: Optional[str]) -> JournalEntry:
+        return JournalEntry(
+            Path(record["container"]),
+            record["target"],
+            Path(record["mount_path"]),
+            record.get("auto_assigned", False),
+            Path(record["keyfile"]) if record.get("keyfile") else None,
+            record.get("hash"),
+            record.get("pim"),
+            record.get("truecrypt", False),
+            pending,
+        )
+
+
+    def recover(self, mount_table: MountTable) -> RecoveryReport:
+        """Reconciles the journal with one scan of the mount table and compacts it to the mounts still present.
+
+        The scan only tells which targets are mounted, not by which volume, so a target is trusted to hold the
+        container last journaled at it.
+
+        Args:
+            mount_table (MountTable): Mount table to scan, which is also told which containers back the adopted mounts.
+
+        Returns:
+            RecoveryReport: Adopted and discarded containers.
+        """
+        started_at = time.monotonic()
+        report = RecoveryReport()
+        entries = self._replay(report)
+
+        mount_table.invalidate()
+        mounted = mount_table.entries()
+        for entry in entries.values():
+            if normalize_mount_point(entry.mount_path) in mounted:
+                report.adopted.append(replace(entry, pending=None))
+                mount_table.record_mount(entry.mount_path, entry.container_path)
+            else:
+                report.discarded.append(entry)
+
+        self._compact(report.adopted)
+        report.seconds = time.monotonic() - started_at
+        logger.info(f"Recovered {len(report.adopted)} mounts from {report.records} journal records in {report.seconds:.3f}s, discarding {len(report.discarded)}.")
+        if report.torn_records:
+            logger.warning(f"Skipped {report.torn_records} torn records in the mount journal at `{self.path}`.")
+        return report
+
+
+    def _compact(self, entries: List[JournalEntry]) -> None:
+        """Atomically replaces the journal with one `MOUNTED` record per entry, readable only by its owner."""
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with self._lock:
+            temporary_path.unlink(missing_ok=True)  # A leftover file would keep its own mode
+            descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(descriptor, "wb") as file:
+                file.writelines(self._format(MOUNTED, entry) for entry in entries)
+                file.flush()
+                if self.fsync:
+                    os.fsync(file.fileno())
+            os.replace(temporary_path, self.path)
+            if self.fsync and hasattr(os, "O_DIRECTORY"):
+                directory_fd = os.open(self.path.parent, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(directory_fd)
+                finally:
+                    os.close(directory_fd)
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+
+# **********
+if __name__ == "__main__":
+    pass
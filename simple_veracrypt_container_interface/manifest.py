@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module loads manifests describing a set of Veracrypt containers and the order they must be mounted in.
+
+A manifest is a TOML or JSON document:
+
+    executable = "/usr/bin/veracrypt"
+    backend = "linux"
+    mount_root = "/mnt/auto"
+
+    [[containers]]
+    name = "outer"
+    path = "/data/outer.hc"
+    mount_point = "/mnt/outer"
+    password_env = "OUTER_PASSWORD"
+    hash = "sha512"
+    pim = 485
+
+    [[containers]]
+    name = "inner"
+    path = "/mnt/outer/inner.hc"
+    mount_point = "/mnt/inner"
+    keyfile = "/mnt/outer/inner.key"
+
+A container depends on the containers named in its `depends_on` list and on every container whose mount point
+holds its container file or keyfile, so nested containers are mounted after the containers they live in.
+Relative paths, including relative mount directories, are resolved against the manifest's directory. On Linux,
+containers without a mount point are mounted in directories below `mount_root`, which is then required.
+"""
+
+import os
+import re
+import json
+import tomllib
+import logging
+from graphlib import TopologicalSorter
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from simple_veracrypt_container_interface.backends import CommandBackend, LinuxTextBackend, WindowsBackend
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer, AUTO_ASSIGN
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Backends selectable by name in a manifest.
+BACKENDS = {"windows": WindowsBackend, "linux": LinuxTextBackend}
+
+_DRIVE_LETTER_PATTERN = re.compile(r"^[A-Za-z](:[\\/]?)?$")
+
+# **********
+@dataclass
+class ManifestEntry:
+    """A container described by a manifest."""
+
+    #: Name the container is referred to by.
+    name: str
+
+    #: Path to the container.
+    container_path: Path
+
+    #: Mount letter or directory of the container.
+    mount_point: str = AUTO_ASSIGN
+
+    #: Path to the keyfile of the container, if there is one.
+    keyfile_path: Optional[Path] = None
+
+    #: Password of the container, if given inline.
+    password: Optional[str] = None
+
+    #: Environment variable holding the password of the container, if any.
+    password_env: Optional[str] = None
+
+    #: Names of the containers that must be mounted first.
+    depends_on: Set[str] = field(default_factory=set)
+
+    #: PRF of the volume header, if known.
+    hash: Optional[str] = None
+
+    #: Personal iterations multiplier of the volume, if not the default.
+    pim: Optional[int] = None
+
+    #: Whether the container is a TrueCrypt volume.
+    truecrypt: bool = False
+
+
+@dataclass
+class Manifest:
+    """A set of containers and the executable and backend to mount them with."""
+
+    #: Path to the Veracrypt executable.
+    executable_path: Path
+
+    #: Command-line syntax of the executable.
+    backend: CommandBackend
+
+    #: Containers by name, in manifest order.
+    entries: Dict[str, ManifestEntry]
+
+    #: Most operations run at once, if limited.
+    concurrency: Optional[int] = None
+
+
+    def build_containers(self, mount_table: Optional[MountTable] = None) -> Dict[str, VeracryptContainer]:
+        """Builds the containers of the manifest.
+
+        Args:
+            mount_table (Optional[MountTable], optional): Mount state shared by the containers. Defaults to the shared table.
+
+        Raises:
+            KeyError: If the environment variable holding a password is not set.
+
+        Returns:
+            Dict[str, VeracryptContainer]: Containers by name, in manifest order.
+        """
+        containers = {}
+        for name, entry in self.entries.items():
+            password = entry.password
+            if entry.password_env is not None:
+                if entry.password_env not in os.environ:
+                    raise KeyError(f"Environment variable `{entry.password_env}` holding the password of `{name}` is not set.")
+                password = os.environ[entry.password_env]
+            containers[name] = VeracryptContainer(
+                self.executable_path, entry.container_path, entry.mount_point,
+                password=password, keyfile_path=entry.keyfile_path, mount_table=mount_table, backend=self.backend,
+                hash=entry.hash, pim=entry.pim, truecrypt=entry.truecrypt,
+            )
+        return containers
+
+
+    def dependencies(self) -> Dict[str, Set[str]]:
+        """Computes the containers each container must wait for, explicit and inferred from nesting.
+
+        Returns:
+            Dict[str, Set[str]]: Names of the dependencies of each container.
+        """
+        mount_paths = {
+            name: self.backend.mount_path(entry.mount_point)
+            for name, entry in self.entries.items() if entry.mount_point != AUTO_ASSIGN
+        }
+        graph = {}
+        for name, entry in self.entries.items():
+            dependencies = set(entry.depends_on)
+            for path in filter(None, (entry.container_path, entry.keyfile_path)):
+                dependencies.update(other for other, mount_path in mount_paths.items() if other != name and path.is_relative_to(mount_path))
+            graph[name] = dependencies
+        return graph
+
+
+# **********
+def _resolve_mount_point(mount_point: str, base_directory: Path) -> str:
+    """Resolves a relative mount directory against the manifest's directory, leaving drive letters as they are."""
+    if mount_point == AUTO_ASSIGN or _DRIVE_LETTER_PATTERN.match(mount_point):
+        return mount_point
+    return str(base_directory / mount_point)
+
+
+def _parse_entry(raw: Dict[str, Any], base_directory: Path) -> ManifestEntry:
+    """Parses one container table of a manifest."""
+    try:
+        name, path = raw["name"], raw["path"]
+    except KeyError as e:
+        raise ValueError(f"Manifest container {raw!r} is missing `{e.args[0]}`.") from None
+    depends_on = raw.get("depends_on", [])
+    if not isinstance(depends_on, list):
+        raise ValueError(f"`depends_on` of manifest container `{name}` must be a list of names, got {depends_on!r}.")
+    return ManifestEntry(
+        name=name,
+        container_path=base_directory / path,
+        mount_point=_resolve_mount_point(raw.get("mount_point", AUTO_ASSIGN), base_directory),
+        keyfile_path=base_directory / raw["keyfile"] if raw.get("keyfile") else None,
+        password=raw.get("password"),
+        password_env=raw.get("password_env"),
+        depends_on=set(depends_on),
+        hash=raw.get("hash"),
+        pim=raw.get("pim"),
+        truecrypt=raw.get("truecrypt", False),
+    )
+
+
+def load_manifest(path: Path) -> Manifest:
+    """Loads a TOML or JSON manifest, chosen by the file suffix.
+
+    Args:
+        path (Path): Path to the manifest.
+
+    Raises:
+        ValueError: If the manifest is malformed, names a container twice or depends on an unknown container.
+
+    Returns:
+        Manifest: The loaded manifest.
+    """
+    with open(path, "rb") as file:
+        raw = json.load(file) if path.suffix == ".json" else tomllib.load(file)
+
+    base_directory = path.resolve().parent
+    if "executable" not in raw:
+        raise ValueError(f"Manifest `{path}` does not name the Veracrypt executable.")
+    backend_name = raw.get("backend", "windows" if os.name == "nt" else "linux")
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown backend `{backend_name}` in manifest `{path}`.")
+
+    entries: Dict[str, ManifestEntry] = {}
+    for raw_entry in raw.get("containers", []):
+        entry = _parse_entry(raw_entry, base_directory)
+        if entry.name in entries:
+            raise ValueError(f"Container `{entry.name}` is listed twice in manifest `{path}`.")
+        entries[entry.name] = entry
+
+    for entry in entries.values():
+        unknown = entry.depends_on - entries.keys()
+        if unknown:
+            raise ValueError(f"Container `{entry.name}` depends on unknown containers: {', '.join(sorted(unknown))}.")
+
+    logger.info(f"Loaded {len(entries)} containers from manifest `{path}`.")
+    backend = BACKENDS[backend_name]()
+    if raw.get("mount_root") is not None:
+        if not isinstance(backend, LinuxTextBackend):
+            raise ValueError(f"`mount_root` in manifest `{path}` only applies to the linux backend.")
+        backend = LinuxTextBackend(base_directory / raw["mount_root"])
+    return Manifest(base_directory / raw["executable"], backend, entries, raw.get("concurrency"))
+
+
+def dependency_levels(dependencies: Dict[str, Set[str]]) -> List[List[str]]:
+    """Groups containers into levels that can be mounted in parallel, each after the levels before it.
+
+    Args:
+        dependencies (Dict[str, Set[str]]): Names of the dependencies of each container.
+
+    Raises:
+        graphlib.CycleError: If the dependencies form a cycle.
+
+    Returns:
+        List[List[str]]: Sorted container names per level.
+    """
+    sorter = TopologicalSorter(dependencies)
+    sorter.prepare()
+    levels = []
+    while sorter.is_active():
+        level = sorted(sorter.get_ready())
+        levels.append(level)
+        sorter.done(*level)
+    return levels
+
+
+# **********
+if __name__ == "__main__":
+    pass
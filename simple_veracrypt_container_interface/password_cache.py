@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module manages VeraCrypt's driver password cache, letting repeated mounts skip sending the password.
+
+Mounting with `/cache y` leaves the password in the driver cache, and a later mount without a password is opened
+from it. The driver only holds passwords, not the containers they belong to, so `PasswordCache` tracks which
+containers it has cached credentials for and asks the backend to wipe the driver cache when its policy says so:
+after a number of mounts served from the cache, once the cached credentials reach an age, or when the last
+container mounted through the cache is dismounted.
+
+    cache = PasswordCache(executable_path, WindowsBackend(), PasswordCachePolicy(ttl=3600, wipe_on_last_dismount=True))
+    container = VeracryptContainer(executable_path, container_path, "T", password="...", password_cache=cache)
+"""
+
+import time
+import asyncio
+import logging
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional, Set, TYPE_CHECKING
+
+from simple_veracrypt_container_interface.backends import CommandBackend
+from simple_veracrypt_container_interface.utilities import utilities
+
+if TYPE_CHECKING:
+    from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+# **********
+@dataclass(frozen=True)
+class PasswordCachePolicy:
+    """When the driver password cache is wiped."""
+
+    #: Wipe after this many mounts were served from the cache. Defaults to never.
+    max_mounts: Optional[int] = None
+
+    #: Wipe once the oldest cached credentials are this many seconds old. Defaults to never.
+    ttl: Optional[float] = None
+
+    #: Wipe when the last container mounted through the cache is dismounted.
+    wipe_on_last_dismount: bool = False
+
+    def __post_init__(self):
+        if self.max_mounts is not None and self.max_mounts <= 0:
+            raise ValueError(f"Maximum cached mounts must be positive, got {self.max_mounts}.")
+        if self.ttl is not None and self.ttl <= 0:
+            raise ValueError(f"Cache time to live must be positive, got {self.ttl}.")
+
+
+@dataclass
+class PasswordCacheStatistics:
+    """Counts of the mounts made through a password cache."""
+
+    #: Mounts opened from the cache without sending a password.
+    hits: int = 0
+
+    #: Mounts that sent the password, including those retried after the cache did not open them.
+    misses: int = 0
+
+    #: Times the driver cache was wiped.
+    wipes: int = 0
+
+
+class PasswordCache:
+    """Tracks the credentials held in VeraCrypt's driver cache and wipes them by policy."""
+
+    def __init__(self, executable_path: Path, backend: CommandBackend, policy: PasswordCachePolicy = PasswordCachePolicy()):
+        """Instantiates a new PasswordCache object.
+
+        Args:
+            executable_path (Path): Path to the Veracrypt executable that owns the driver cache.
+            backend (CommandBackend): Command-line syntax used to wipe the cache.
+            policy (PasswordCachePolicy, optional): When to wipe the cache. Defaults to never wiping it.
+
+        Raises:
+            ValueError: If the backend has no driver password cache.
+        """
+        if not backend.supports_password_cache:
+            raise ValueError(f"{type(backend).__name__} has no driver password cache.")
+        self.executable_path = executable_path
+        self.backend = backend
+        self.policy = policy
+        self.statistics = PasswordCacheStatistics()
+
+        self._cached: Set[Path] = set()
+        self._mounted: Set[Path] = set()
+        self._cached_at: Optional[float] = None
+        self._mounts_served = 0
+        self._lock = asyncio.Lock()
+
+
+    @staticmethod
+    def _key(container: "VeracryptContainer") -> Path:
+        return container.container_path.absolute()
+
+
+    def is_cached(self, container: "VeracryptContainer") -> bool:
+        """Checks whether the cache is believed to hold the credentials of a container.
+
+        Args:
+            container (VeracryptContainer): Container to check.
+
+        Returns:
+            bool: Whether a mount can be attempted without the password.
+        """
+        return self._key(container) in self._cached
+
+
+    def _expired(self) -> bool:
+        return self.policy.ttl is not None and self._cached_at is not None and time.monotonic() - self._cached_at >= self.policy.ttl
+
+
+    async def wipe(self) -> None:
+        """Wipes the driver cache and forgets every cached container.
+
+        Raises:
+            RuntimeError: If the wipe command fails.
+        """
+        async with self._lock:
+            logger.info(f"Wiping the VeraCrypt password cache, which held credentials of {len(self._cached)} containers.")
+            await utilities.run_command(self.backend.build_wipe_cache_command(self.executable_path), print_output=False)
+            self._cached.clear()
+            self._cached_at = None
+            self._mounts_served = 0
+            self.statistics.wipes += 1
+
+
+    # **********
+    async def before_mount(self, container: "VeracryptContainer") -> bool:
+        """Applies the age limit and decides whether a mount is attempted from the cache.
+
+        Args:
+            container (VeracryptContainer): Container about to be mounted.
+
+        Returns:
+            bool: Whether to leave the password out of the mount command.
+        """
+        if self._expired():
+            await self.wipe()
+        return self.is_cached(container)
+
+
+    def forget(self, container: "VeracryptContainer") -> None:
+        """Forgets the credentials of a container after the cache failed to open it.
+
+        Args:
+            container (VeracryptContainer): Container the cache did not open.
+        """
+        self._cached.discard(self._key(container))
+
+
+    async def record_mount(self, container: "VeracryptContainer", hit: bool) -> None:
+        """Records a successful mount and wipes the cache if it has served its allowed number of mounts.
+
+        Args:
+            container (VeracryptContainer): Mounted container.
+            hit (bool): Whether the mount was opened from the cache.
+        """
+        key = self._key(container)
+        self._mounted.add(key)
+        if hit:
+            self.statistics.hits += 1
+            self._mounts_served += 1
+        else:
+            self.statistics.misses += 1
+            self._cached.add(key)
+            if self._cached_at is None:
+                self._cached_at = time.monotonic()
+        if self.policy.max_mounts is not None and self._mounts_served >= self.policy.max_mounts:
+            await self.wipe()
+
+
+    async def record_dismount(self, container: "VeracryptContainer") -> None:
+        """Records a dismount and wipes the cache if it was the last container mounted through it.
+
+        Args:
+            container (VeracryptContainer): Dismounted container.
+        """
+        self._mounted.discard(self._key(container))
+        if self.policy.wipe_on_last_dismount and not self._mounted and self._cached:
+            await self.wipe()
+
+
+# **********
+if __name__ == "__main__":
+    pass
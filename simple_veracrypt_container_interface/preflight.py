@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module checks the credentials of containers against their volume headers without starting VeraCrypt.
+
+A VeraCrypt header starts with a 64-byte salt followed by 448 bytes encrypted with the header key, which is
+derived from the password (mixed with the keyfiles) by PBKDF2 with one of several PRFs. The header opens if the
+decrypted bytes start with the `VERA` magic and both header checksums match. Every PRF is tried against the
+normal and the hidden volume header at once in a process pool, so a batch of containers with stale credentials
+is rejected in roughly one key derivation instead of one VeraCrypt run per container.
+
+Decrypting the header needs the optional `cryptography` package. Only volumes encrypted with AES, the default,
+can be checked; a volume encrypted with another cipher never opens here, whatever its credentials. A header that
+does not open is therefore reported as unknown and left to VeraCrypt, unless the verifier is told that every
+volume uses AES, in which case the credentials are rejected. PRFs missing from this Python build's `hashlib`, such
+as Whirlpool or Streebog, are skipped, and a volume checked without all of its candidate PRFs stays unknown.
+
+The check is best run for a whole batch before the mounts start, so that no mount holds a concurrency slot while
+keys are derived:
+
+    verifier = HeaderVerifier()
+    report = await mount_many(containers, verifier=verifier)
+"""
+
+import time
+import zlib
+import struct
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import concurrent.futures
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union, TYPE_CHECKING
+
+from simple_veracrypt_container_interface.utilities import exceptions
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:  # Optional dependency
+    Cipher = None
+
+if TYPE_CHECKING:
+    from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Size of a volume header in bytes.
+HEADER_SIZE = 512
+
+#: Size of the salt at the start of a volume header.
+SALT_SIZE = 64
+
+#: Offset of the hidden volume header.
+HIDDEN_HEADER_OFFSET = 65536
+
+#: PBKDF2 iterations of a VeraCrypt volume without a PIM.
+DEFAULT_ITERATIONS = 500000
+
+#: hashlib names of the VeraCrypt PRFs, in the order VeraCrypt tries them.
+PRFS = {"sha512": "sha512", "whirlpool": "whirlpool", "sha256": "sha256", "blake2s": "blake2s256", "streebog": "streebog256"}
+
+#: hashlib names and PBKDF2 iterations of the TrueCrypt PRFs.
+TRUECRYPT_PRFS = {"sha512": ("sha512", 1000), "ripemd160": ("ripemd160", 2000), "whirlpool": ("whirlpool", 1000)}
+
+#: Keyfile pool size for passwords up to `MAX_LEGACY_PASSWORD_LENGTH` bytes.
+KEYFILE_POOL_LEGACY_SIZE = 64
+
+#: Keyfile pool size for longer passwords.
+KEYFILE_POOL_SIZE = 128
+
+#: Longest password mixed with the legacy keyfile pool.
+MAX_LEGACY_PASSWORD_LENGTH = 64
+
+#: Bytes of each keyfile mixed into the pool.
+KEYFILE_MAX_READ_LENGTH = 2 ** 20
+
+_KEY_SIZE = 64  # AES-256 in XTS mode takes a primary and a secondary 32-byte key
+
+# Key derivation pools are started from worker threads, which a forked child would inherit in an arbitrary state
+_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# **********
+@dataclass
+class PreflightResult:
+    """Outcome of checking the credentials of a container."""
+
+    #: Path to the container.
+    container_path: Path
+
+    #: Whether the credentials open a header of the volume, or None if no header opened and the volume may use a cipher other than AES.
+    opened: Optional[bool]
+
+    #: PRF that derived the header key, one of `PRFS` or `TRUECRYPT_PRFS`, if the header opened.
+    prf: Optional[str] = None
+
+    #: Whether the hidden volume header opened rather than the normal one.
+    hidden: bool = False
+
+    #: Wall-clock seconds for the check.
+    seconds: float = 0.0
+
+
+def iteration_count(pim: Optional[int] = None) -> int:
+    """Computes the PBKDF2 iterations of a VeraCrypt volume header.
+
+    Args:
+        pim (Optional[int], optional): Personal iterations multiplier, if not the default. Defaults to None.
+
+    Returns:
+        int: Number of iterations.
+    """
+    return DEFAULT_ITERATIONS if not pim else 15000 + pim * 1000
+
+
+def apply_keyfiles(password: bytes, keyfile_paths: Iterable[Path]) -> bytes:
+    """Mixes keyfiles into a password the way VeraCrypt does.
+
+    Each keyfile byte advances a CRC-32 whose four bytes are added into a pool, which is then added onto the password.
+
+    Args:
+        password (bytes): Encoded password, possibly empty.
+        keyfile_paths (Iterable[Path]): Keyfiles, in any order since the pool is a sum.
+
+    Raises:
+        ValueError: If a keyfile is empty.
+
+    Returns:
+        bytes: Password to derive the header key from.
+    """
+    keyfile_paths = list(keyfile_paths)
+    if not keyfile_paths:
+        return password
+    pool_size = KEYFILE_POOL_LEGACY_SIZE if len(password) <= MAX_LEGACY_PASSWORD_LENGTH else KEYFILE_POOL_SIZE
+    pool = bytearray(pool_size)
+    for keyfile_path in keyfile_paths:
+        with open(keyfile_path, "rb") as file:
+            data = file.read(KEYFILE_MAX_READ_LENGTH)
+        if not data:
+            raise ValueError(f"Keyfile `{keyfile_path}` is empty.")
+        crc = 0
+        position = 0
+        for index in range(len(data)):
+            crc = zlib.crc32(data[index:index + 1], crc)
+            for byte in struct.pack(">I", crc ^ 0xFFFFFFFF):  # The running CRC register, before zlib's final inversion
+                pool[position] = (pool[position] + byte) & 0xFF
+                position += 1
+            position %= pool_size
+
+    mixed = bytearray(pool)
+    for index, byte in enumerate(password[:pool_size]):
+        mixed[index] = (byte + pool[index]) & 0xFF
+    return bytes(mixed) + password[pool_size:]
+
+
+def open_header(header: bytes, password: bytes, hash_name: str, iterations: int, magic: bytes = b"VERA") -> bool:
+    """Derives the header key and checks whether it decrypts a volume header. Runs in a worker process.
+
+    Args:
+        header (bytes): The 512 header bytes.
+        password (bytes): Password with the keyfiles applied.
+        hash_name (str): hashlib name of the PRF.
+        iterations (int): PBKDF2 iterations.
+        magic (bytes, optional): Expected magic, `VERA` or `TRUE`. Defaults to b"VERA".
+
+    Returns:
+        bool: Whether the header decrypted to a valid header.
+    """
+    key = hashlib.pbkdf2_hmac(hash_name, password, header[:SALT_SIZE], iterations, _KEY_SIZE)
+    decryptor = Cipher(algorithms.AES(key), modes.XTS(bytes(16))).decryptor()
+    plain = decryptor.update(header[SALT_SIZE:HEADER_SIZE]) + decryptor.finalize()
+    if plain[:4] != magic:
+        return False
+    keys_crc, = struct.unpack_from(">I", plain, 8)
+    header_crc, = struct.unpack_from(">I", plain, 188)
+    return header_crc == zlib.crc32(plain[:188]) and keys_crc == zlib.crc32(plain[192:])
+
+
+def _read_headers(container_path: Path) -> List[Tuple[bool, bytes]]:
+    """Reads the normal and, if the file is large enough, the hidden volume header."""
+    with open(container_path, "rb") as file:
+        headers = [(False, file.read(HEADER_SIZE))]
+        file.seek(HIDDEN_HEADER_OFFSET)
+        headers.append((True, file.read(HEADER_SIZE)))
+    if len(headers[0][1]) < HEADER_SIZE:
+        raise ValueError(f"Container at {container_path} is too small to hold a volume header.")
+    return [(hidden, header) for hidden, header in headers if len(header) == HEADER_SIZE]
+
+
+def _hash_available(hash_name: str) -> bool:
+    try:
+        hashlib.pbkdf2_hmac(hash_name, b"", b"", 1)
+    except ValueError:
+        return False
+    return True
+
+
+# **********
+class HeaderVerifier:
+    """Checks container credentials against their volume headers in a process pool."""
+
+    def __init__(self, workers: Optional[int] = None, assume_aes: bool = False):
+        """Instantiates a new HeaderVerifier object.
+
+        Args:
+            workers (Optional[int], optional): Number of key derivation processes. Defaults to the CPU count.
+            assume_aes (bool, optional): Whether every checked volume is known to use AES, so that a header that does not open means wrong credentials. Defaults to False.
+
+        Raises:
+            ImportError: If the optional `cryptography` package is not installed.
+        """
+        if Cipher is None:
+            raise ImportError("Header pre-flight requires the optional `cryptography` package.")
+        self.workers = workers
+        self.assume_aes = assume_aes
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+
+    def close(self) -> None:
+        """Shuts down the key derivation processes."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+    def _candidates(self, pim: Optional[int], hash: Optional[str], truecrypt: bool) -> Tuple[Dict[str, Tuple[str, int]], bool]:
+        """Lists the PRFs to try with their hashlib names and iterations, and whether any were skipped as unavailable."""
+        if truecrypt:
+            candidates = dict(TRUECRYPT_PRFS)
+        else:
+            candidates = {prf: (hash_name, iteration_count(pim)) for prf, hash_name in PRFS.items()}
+        if hash is not None:
+            if hash not in candidates:
+                raise ValueError(f"Unknown hash algorithm `{hash}`, expected one of {', '.join(candidates)}.")
+            candidates = {hash: candidates[hash]}
+        available = {prf: candidate for prf, candidate in candidates.items() if _hash_available(candidate[0])}
+        for prf in candidates.keys() - available.keys():
+            logger.debug(f"Skipping hash algorithm `{prf}`, which is not available in this Python build.")
+        return available, len(available) < len(candidates)
+
+
+    def verify(self, container_path: Path, password: Optional[str] = None, keyfile_path: Optional[Path] = None, pim: Optional[int] = None, hash: Optional[str] = None, truecrypt: bool = False) -> PreflightResult:
+        """Checks whether credentials open a container, trying every PRF and header at once.
+
+        Args:
+            container_path (Path): Path to the container.
+            password (Optional[str], optional): Password of the container if there is one. Defaults to None.
+            keyfile_path (Optional[Path], optional): Keyfile of the container if there is one. Defaults to None.
+            pim (Optional[int], optional): Personal iterations multiplier, if not the default. Defaults to None.
+            hash (Optional[str], optional): PRF to try, if known. Defaults to trying all of them.
+            truecrypt (bool, optional): Whether the container is a TrueCrypt volume. Defaults to False.
+
+        Raises:
+            ValueError: If the container is too small or the hash algorithm is unknown.
+
+        Returns:
+            PreflightResult: Whether a header opened and with which PRF, or unknown if none opened and either `assume_aes` is not set or a PRF is not available in this Python build.
+        """
+        started_at = time.monotonic()
+        candidates, skipped = self._candidates(pim, hash, truecrypt)
+        headers = _read_headers(container_path)
+        secret = apply_keyfiles((password or "").encode(), [keyfile_path] if keyfile_path is not None else [])
+        magic = b"TRUE" if truecrypt else b"VERA"
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(_POOL_START_METHOD))
+        trials = {
+            self._executor.submit(open_header, header, secret, hash_name, iterations, magic): (prf, hidden)
+            for prf, (hash_name, iterations) in candidates.items()
+            for hidden, header in headers
+        }
+        result = PreflightResult(container_path, opened=False if self.assume_aes and not skipped else None)
+        try:
+            for future in concurrent.futures.as_completed(trials):
+                if future.result():
+                    result.opened = True
+                    result.prf, result.hidden = trials[future]
+                    break
+        finally:
+            for future in trials:
+                future.cancel()
+        result.seconds = time.monotonic() - started_at
+        logger.info(
+            f"Credentials of `{container_path}` "
+            + (f"open its {'hidden' if result.hidden else 'normal'} header with {result.prf}" if result.opened else "open no AES header")
+            + f" ({result.seconds:.2f}s)."
+        )
+        return result
+
+
+    def verify_container(self, container: "VeracryptContainer", pim: Optional[int] = None, hash: Optional[str] = None, truecrypt: Optional[bool] = None) -> PreflightResult:
+        """Checks the credentials a container is configured with, defaulting to its hash, PIM and TrueCrypt mode. See `verify`."""
+        return self.verify(
+            container.container_path, container.password, container.keyfile_path,
+            pim if pim is not None else container.pim,
+            hash if hash is not None else container.effective_hash,
+            truecrypt if truecrypt is not None else container.truecrypt,
+        )
+
+
+    async def verify_many(self, containers: Iterable["VeracryptContainer"], pim: Optional[int] = None, hash: Optional[str] = None, truecrypt: Optional[bool] = None, return_exceptions: bool = False) -> List[Union[PreflightResult, BaseException]]:
+        """Checks the credentials of many containers at once in threads, sharing the process pool.
+
+        Args:
+            containers (Iterable[VeracryptContainer]): Containers to check.
+            pim (Optional[int], optional): Personal iterations multiplier. Defaults to each container's.
+            hash (Optional[str], optional): PRF to try. Defaults to each container's, or to trying all of them.
+            truecrypt (Optional[bool], optional): Whether the containers are TrueCrypt volumes. Defaults to each container's mode.
+            return_exceptions (bool, optional): Whether a failed check is returned in place of its result rather than raised. Defaults to False.
+
+        Returns:
+            List[Union[PreflightResult, BaseException]]: Results in the order of the containers.
+        """
+        return list(await asyncio.gather(*(
+            asyncio.to_thread(self.verify_container, container, pim, hash, truecrypt) for container in containers
+        ), return_exceptions=return_exceptions))
+
+
+    def apply(self, container: "VeracryptContainer", result: PreflightResult) -> None:
+        """Acts on the result of checking a container: rejects wrong credentials and hands a matching PRF to the mount.
+
+        Args:
+            container (VeracryptContainer): Container that was checked.
+            result (PreflightResult): Result of checking it.
+
+        Raises:
+            InvalidCredentialsError: If the credentials are known not to open the volume.
+        """
+        if result.opened is False:
+            raise exceptions.InvalidCredentialsError(f"Credentials of container at {container.container_path} do not open its volume header.")
+        if result.opened and container.effective_hash is None:
+            container.learned_prf = result.prf
+
+
+    async def pre_mount_hook(self, container: "VeracryptContainer") -> None:
+        """Checks a container in a thread before it is mounted. See `apply`.
+
+        Append to `VeracryptContainer.pre_mount_hooks` to check single mounts; bulk mounts are better checked all
+        at once through `mount_many(..., verifier=...)`.
+        """
+        self.apply(container, await asyncio.to_thread(self.verify_container, container))
+
+
+# **********
+if __name__ == "__main__":
+    pass
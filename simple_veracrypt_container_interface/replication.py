@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module replicates dismounted container files block by block, writing only the blocks that changed.
+
+The container is split into contiguous block ranges replicated by parallel worker threads. Each worker reads
+its blocks into a page-aligned buffer with `preadv` and hashes them. The replica side is compared through a
+block hash file kept next to the replica (`<replica>.blocks`), which is trusted while the replica's stat
+fingerprint matches the one it was written for. Without it the replica blocks are read and hashed as well.
+Only differing blocks are written with `pwrite`, so a sync costs a read of the source plus the size of the change.
+Where positional I/O is unavailable, such as on Windows, each worker seeks its own file objects instead.
+"""
+
+import os
+import mmap
+import asyncio
+import contextlib
+import time
+import struct
+import hashlib
+import logging
+import threading
+import concurrent.futures
+from pathlib import Path
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional
+
+from simple_veracrypt_container_interface.catalog import Fingerprint, fingerprint_of
+from simple_veracrypt_container_interface.utilities import exceptions, utilities
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer, AUTO_ASSIGN
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Default size of a compared block in bytes.
+DEFAULT_BLOCK_SIZE = 4 * 2 ** 20
+
+#: Default number of block ranges replicated at once.
+DEFAULT_WORKERS = 4
+
+_DIGEST_SIZE = 16
+_HEADER = struct.Struct("<8sQQQQ")  # Magic, block size, replica size, replica mtime in nanoseconds, replica inode
+_MAGIC = b"VCBLOCKS"
+_POSITIONAL_IO = hasattr(os, "preadv") and hasattr(os, "pwrite")
+
+# **********
+@dataclass
+class ReplicationReport:
+    """Outcome of a replication."""
+
+    #: Number of blocks compared.
+    blocks_total: int = 0
+
+    #: Number of blocks written to the replica.
+    blocks_changed: int = 0
+
+    #: Bytes read from the source.
+    bytes_read: int = 0
+
+    #: Bytes written to the replica.
+    bytes_written: int = 0
+
+    #: Wall-clock seconds for the whole replication.
+    seconds: float = 0.0
+
+    #: Whether the replica block hashes were trusted instead of reading the replica.
+    used_block_hashes: bool = False
+
+    @property
+    def read_bytes_per_second(self) -> float:
+        """Source scanning throughput."""
+        return self.bytes_read / self.seconds if self.seconds else 0.0
+
+
+def _block_hash_path(replica_path: Path) -> Path:
+    return replica_path.with_name(replica_path.name + ".blocks")
+
+
+def _load_block_hashes(replica_path: Path, block_size: int) -> Optional[List[bytes]]:
+    """Loads the replica block hashes if they were written for the replica as it is now."""
+    try:
+        data = _block_hash_path(replica_path).read_bytes()
+        fingerprint = fingerprint_of(replica_path)
+    except FileNotFoundError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, stored_block_size, *stored_fingerprint = _HEADER.unpack_from(data)
+    if magic != _MAGIC or stored_block_size != block_size or tuple(stored_fingerprint) != fingerprint:
+        return None
+    body = data[_HEADER.size:]
+    return [body[index:index + _DIGEST_SIZE] for index in range(0, len(body), _DIGEST_SIZE)]
+
+
+def _store_block_hashes(replica_path: Path, block_size: int, fingerprint: Fingerprint, hashes: List[bytes]) -> None:
+    path = _block_hash_path(replica_path)
+    temporary_path = path.with_name(path.name + ".tmp")
+    temporary_path.write_bytes(_HEADER.pack(_MAGIC, block_size, *fingerprint) + b"".join(hashes))
+    os.replace(temporary_path, path)
+
+
+def _hash(data: memoryview) -> bytes:
+    return hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest()
+
+
+def _read_at(file: BinaryIO, buffer: mmap.mmap, offset: int) -> int:
+    """Reads into a buffer from an offset, without moving the shared file position where the platform allows."""
+    if _POSITIONAL_IO:
+        return os.preadv(file.fileno(), [buffer], offset)
+    file.seek(offset)
+    return file.readinto(buffer) or 0
+
+
+def _write_at(file: BinaryIO, data: memoryview, offset: int) -> int:
+    """Writes data at an offset, without moving the shared file position where the platform allows."""
+    if _POSITIONAL_IO:
+        return os.pwrite(file.fileno(), data, offset)
+    file.seek(offset)
+    return file.write(data)
+
+
+# **********
+def replicate_file(source_path: Path, replica_path: Path, block_size: int = DEFAULT_BLOCK_SIZE, workers: int = DEFAULT_WORKERS) -> ReplicationReport:
+    """Brings a replica file up to date with a source file, writing only the blocks that differ.
+
+    The source must not change while it is replicated.
+
+    Args:
+        source_path (Path): File to replicate.
+        replica_path (Path): Replica to update, created if missing.
+        block_size (int, optional): Size of a compared block in bytes, a multiple of the page size. Defaults to DEFAULT_BLOCK_SIZE.
+        workers (int, optional): Number of block ranges replicated at once. Defaults to DEFAULT_WORKERS.
+
+    Raises:
+        ValueError: If the block size is not a positive multiple of the page size.
+
+    Returns:
+        ReplicationReport: Block counts, bytes read and written and the duration.
+    """
+    if block_size <= 0 or block_size % mmap.PAGESIZE:
+        raise ValueError(f"Block size must be a positive multiple of {mmap.PAGESIZE}, got {block_size}.")
+    started_at = time.monotonic()
+    size = os.stat(source_path).st_size
+    block_count = -(-size // block_size)
+
+    known_hashes = _load_block_hashes(replica_path, block_size)
+    report = ReplicationReport(blocks_total=block_count, used_block_hashes=known_hashes is not None)
+    hashes: List[bytes] = [b""] * block_count
+    lock = threading.Lock()
+
+    replica_descriptor = os.open(replica_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o600)
+    try:
+        if os.fstat(replica_descriptor).st_size != size:
+            os.ftruncate(replica_descriptor, size)
+            known_hashes = None  # A resized replica only has valid hashes for the blocks it kept, recompare them all
+
+        def replicate_range(first_block: int, last_block: int) -> None:
+            read, written, changed = 0, 0, 0
+            with open(source_path, "rb", buffering=0) as source, open(replica_path, "r+b", buffering=0) as replica, \
+                    mmap.mmap(-1, block_size) as source_buffer, mmap.mmap(-1, block_size) as replica_buffer:
+                for block in range(first_block, last_block):
+                    offset = block * block_size
+                    length = _read_at(source, source_buffer, offset)
+                    data = memoryview(source_buffer)[:length]
+                    digest = _hash(data)
+                    if known_hashes is not None and block < len(known_hashes):
+                        replica_digest = known_hashes[block]
+                    else:
+                        replica_length = _read_at(replica, replica_buffer, offset)
+                        replica_digest = _hash(memoryview(replica_buffer)[:replica_length])
+                    if digest != replica_digest:
+                        written += _write_at(replica, data, offset)
+                        changed += 1
+                    hashes[block] = digest
+                    read += length
+                    data.release()
+            with lock:
+                report.bytes_read += read
+                report.bytes_written += written
+                report.blocks_changed += changed
+
+        blocks_per_range = max(1, -(-block_count // workers))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(replicate_range, first_block, min(block_count, first_block + blocks_per_range))
+                for first_block in range(0, block_count, blocks_per_range)
+            ]
+            for future in futures:
+                future.result()
+        os.fsync(replica_descriptor)
+    finally:
+        os.close(replica_descriptor)
+
+    _store_block_hashes(replica_path, block_size, fingerprint_of(replica_path), hashes)
+    report.seconds = time.monotonic() - started_at
+    logger.info(
+        f"Replicated `{source_path}` to `{replica_path}`: {report.blocks_changed} of {report.blocks_total} blocks changed, "
+        f"{report.bytes_written} bytes written, {report.read_bytes_per_second / 2 ** 20:.1f} MiB/s read."
+    )
+    return report
+
+
+async def replicate_container(container: VeracryptContainer, replica_path: Path, block_size: int = DEFAULT_BLOCK_SIZE, workers: int = DEFAULT_WORKERS) -> ReplicationReport:
+    """Replicates a dismounted container off the event loop. See `replicate_file`.
+
+    The container is locked for the whole replication if it has a lock manager, so that no mount through the
+    manager starts while its file is read. A container without a mount target yet is looked up by its path among
+    the volumes VeraCrypt lists as mounted, where the backend can list them.
+
+    Args:
+        container (VeracryptContainer): Container to replicate.
+        replica_path (Path): Replica to update, created if missing.
+        block_size (int, optional): Size of a compared block in bytes. Defaults to DEFAULT_BLOCK_SIZE.
+        workers (int, optional): Number of block ranges replicated at once. Defaults to DEFAULT_WORKERS.
+
+    Raises:
+        AlreadyMountedError: If the container is mounted, since its file could change during the replication.
+
+    Returns:
+        ReplicationReport: Block counts, bytes read and written and the duration.
+    """
+    lock = container.lock_manager.lock_container(container) if container.lock_manager is not None else contextlib.nullcontext()
+    async with lock:
+        container.mount_table.invalidate()
+        if await _is_mounted(container):
+            raise exceptions.AlreadyMountedError(f"Container at {container.container_path} is mounted and cannot be replicated.")
+        with container.instrumentation.operation("replicate", container=str(container.container_path)):
+            return await asyncio.to_thread(replicate_file, container.container_path, replica_path, block_size, workers)
+
+
+async def _is_mounted(container: VeracryptContainer) -> bool:
+    """Checks whether a container is mounted at its target or, without a target yet, anywhere VeraCrypt reports."""
+    if container.mount_letter != AUTO_ASSIGN:
+        return utilities.is_mounted(container.mount_path, container.mount_table)
+    try:
+        await container.refresh_mount_state()
+    except NotImplementedError:
+        logger.warning(f"Cannot tell where the automatically assigned container at `{container.container_path}` is mounted, assuming it is not.")
+        return False
+    container_path = Path(os.path.abspath(container.container_path))
+    return any(
+        (backing := container.mount_table.backing_container(mount_point)) is not None and Path(os.path.abspath(backing)) == container_path
+        for mount_point in container.mount_table.entries()
+    )
+
+
+# **********
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains a synchronous client that runs container operations on one shared background event loop.
+
+Threaded code can call the client from any thread, including thread pools. Every operation is scheduled on the
+same long-lived loop and returns a `concurrent.futures.Future`, so overlapping calls run concurrently without
+creating an event loop per call.
+"""
+
+import asyncio
+import logging
+import threading
+import contextlib
+import concurrent.futures
+from typing import Any, Coroutine, Iterable, Iterator, Optional
+
+from simple_veracrypt_container_interface.bulk_operations import BulkOperationReport, mount_many, dismount_many, dismount_all
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer, DEFAULT_LEASE_LINGER
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+# **********
+class SyncVeracryptClient:
+    """Synchronous facade over container operations, backed by a background event loop thread."""
+
+    def __init__(self, thread_name: str = "veracrypt-event-loop"):
+        """Instantiates a new SyncVeracryptClient object and starts its event loop thread.
+
+        Args:
+            thread_name (str, optional): Name of the event loop thread. Defaults to "veracrypt-event-loop".
+        """
+        self.loop = asyncio.new_event_loop()
+        self._closing = False
+        self._thread = threading.Thread(target=self._run_loop, name=thread_name, daemon=True)
+        self._thread.start()
+
+
+    def _run_loop(self) -> None:
+        """Runs the event loop until the client is closed, then closes it from the thread that ran it."""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+
+    @property
+    def closed(self) -> bool:
+        """Whether the client has been closed."""
+        return self._closing or self.loop.is_closed()
+
+
+    def submit(self, coroutine: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Schedules a coroutine on the background event loop.
+
+        Args:
+            coroutine (Coroutine[Any, Any, Any]): Coroutine to run.
+
+        Raises:
+            RuntimeError: If the client is closed.
+
+        Returns:
+            concurrent.futures.Future: Future resolving to the result of the coroutine.
+        """
+        if self.closed:
+            coroutine.close()
+            raise RuntimeError("The client is closed.")
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+    # **********
+    def mount(self, container: VeracryptContainer, **kwargs) -> concurrent.futures.Future:
+        """Mounts a container on the background event loop.
+
+        Args:
+            container (VeracryptContainer): Container to mount.
+            **kwargs: Arguments passed on to `VeracryptContainer.mount`.
+
+        Returns:
+            concurrent.futures.Future: Future resolving once the container is mounted.
+        """
+        return self.submit(container.mount(**kwargs))
+
+
+    def dismount(self, container: VeracryptContainer, **kwargs) -> concurrent.futures.Future:
+        """Dismounts a container on the background event loop.
+
+        Args:
+            container (VeracryptContainer): Container to dismount.
+            **kwargs: Arguments passed on to `VeracryptContainer.dismount`.
+
+        Returns:
+            concurrent.futures.Future: Future resolving once the container is dismounted.
+        """
+        return self.submit(container.dismount(**kwargs))
+
+
+    def mount_many(self, containers: Iterable[VeracryptContainer], **kwargs) -> "concurrent.futures.Future[BulkOperationReport]":
+        """Mounts many containers with bounded concurrency on the background event loop.
+
+        Args:
+            containers (Iterable[VeracryptContainer]): Containers to mount.
+            **kwargs: Arguments passed on to `bulk_operations.mount_many`.
+
+        Returns:
+            concurrent.futures.Future[BulkOperationReport]: Future resolving to the report of the run.
+        """
+        return self.submit(mount_many(list(containers), **kwargs))
+
+
+    def dismount_many(self, containers: Iterable[VeracryptContainer], **kwargs) -> "concurrent.futures.Future[BulkOperationReport]":
+        """Dismounts many containers with bounded concurrency on the background event loop.
+
+        Args:
+            containers (Iterable[VeracryptContainer]): Containers to dismount.
+            **kwargs: Arguments passed on to `bulk_operations.dismount_many`.
+
+        Returns:
+            concurrent.futures.Future[BulkOperationReport]: Future resolving to the report of the run.
+        """
+        return self.submit(dismount_many(list(containers), **kwargs))
+
+
+    def dismount_all(self, containers: Iterable[VeracryptContainer], **kwargs) -> "concurrent.futures.Future[BulkOperationReport]":
+        """Dismounts every volume with a single VeraCrypt invocation on the background event loop.
+
+        Args:
+            containers (Iterable[VeracryptContainer]): Containers to report on.
+            **kwargs: Arguments passed on to `bulk_operations.dismount_all`.
+
+        Returns:
+            concurrent.futures.Future[BulkOperationReport]: Future resolving to the report of the run.
+        """
+        return self.submit(dismount_all(list(containers), **kwargs))
+
+
+    @contextlib.contextmanager
+    def lease(self, container: VeracryptContainer, linger: float = DEFAULT_LEASE_LINGER, timeout: Optional[float] = None) -> Iterator[VeracryptContainer]:
+        """Holds a container mounted for the duration of the context. See `VeracryptContainer.lease`.
+
+        Args:
+            container (VeracryptContainer): Container to lease.
+            linger (float, optional): Seconds to keep the container mounted after the last release. Defaults to DEFAULT_LEASE_LINGER.
+            timeout (Optional[float], optional): Seconds to wait for the container to be mounted, after which the lease is abandoned. Defaults to None.
+
+        Raises:
+            TimeoutError: If the container is not mounted within the timeout.
+
+        Yields:
+            VeracryptContainer: The mounted container.
+        """
+        lease = container.lease(linger)
+        # The timeout runs on the loop, so a lease taken just as it expires is returned rather than leaked
+        self.submit(asyncio.wait_for(lease.__aenter__(), timeout)).result()
+        try:
+            yield container
+        finally:
+            self.submit(lease.__aexit__(None, None, None)).result()
+
+
+    # **********
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Cancels pending operations, stops the event loop and joins its thread, which closes the loop once it stops.
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait for the operations to be cancelled and, separately, for the thread to finish. Defaults to None.
+
+        Raises:
+            TimeoutError: If the thread is still running after the timeout. It closes the loop once it finishes, and calling `close` again waits for it.
+        """
+        if not self._closing:
+            self._closing = True
+
+            async def shutdown() -> None:
+                tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await self.loop.shutdown_asyncgens()
+
+            try:
+                asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout)
+            except concurrent.futures.TimeoutError:
+                logger.warning("Pending operations were not cancelled in time, stopping the event loop anyway.")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise TimeoutError(f"Event loop thread `{self._thread.name}` did not finish within {timeout} seconds.")
+
+
+    def __enter__(self) -> "SyncVeracryptClient":
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# **********
+_default_client: Optional[SyncVeracryptClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> SyncVeracryptClient:
+    """Fetches the client shared by the whole process, starting it on first use.
+
+    Returns:
+        SyncVeracryptClient: The shared client.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None or _default_client.closed:
+            _default_client = SyncVeracryptClient()
+        return _default_client
+
+
+# **********
+if __name__ == "__main__":
+    pass
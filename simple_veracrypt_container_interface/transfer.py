@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains a bulk file transfer pipeline for copying trees into and out of mounted containers.
+
+The source tree is walked lazily with `os.scandir` and files are copied by a pool of worker threads. Each copy
+stays in the kernel where it can: `os.copy_file_range` first, then `os.sendfile`, and a userspace buffer copy
+only as the last resort. Each file, or symbolic link, is created under a temporary name beside its destination
+and moved into place, so an existing symbolic link at the destination is replaced rather than written through, and
+an interrupted copy never leaves a truncated file behind. Destination files take the permission bits and modification time of their
+source, so a file whose size and modification time already match is skipped on the next transfer. Directories
+are recreated even when they hold no files.
+"""
+
+import os
+import stat
+import time
+import errno
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import concurrent.futures
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Default number of files copied at once.
+DEFAULT_WORKERS = 4
+
+#: Bytes requested from the kernel per copy call.
+COPY_CHUNK_SIZE = 2 ** 30
+
+#: Hash algorithm used to verify copies.
+CHECKSUM_ALGORITHM = "sha256"
+
+# ENOTSOCK is how macOS refuses `sendfile` to a regular file
+_KERNEL_COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF, errno.ENOTSOCK}
+
+# **********
+@dataclass
+class TransferReport:
+    """Outcome of a tree transfer."""
+
+    #: Number of files copied.
+    files_copied: int = 0
+
+    #: Number of files skipped because the destination already matched.
+    files_skipped: int = 0
+
+    #: Number of bytes copied.
+    bytes_copied: int = 0
+
+    #: Wall-clock seconds for the whole transfer.
+    seconds: float = 0.0
+
+    #: Relative paths of the files that failed, with their errors.
+    errors: List[Tuple[Path, BaseException]] = field(default_factory=list)
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Copy throughput over the whole transfer."""
+        return self.bytes_copied / self.seconds if self.seconds else 0.0
+
+
+def walk_files(source: Path, include_directories: bool = False) -> Iterator[Tuple[os.DirEntry, Path]]:
+    """Walks a tree lazily, depth first.
+
+    Args:
+        source (Path): Root of the tree.
+        include_directories (bool, optional): Whether to yield each directory too, before anything inside it. Defaults to False.
+
+    Yields:
+        Tuple[os.DirEntry, Path]: Each regular file or symbolic link, and each directory if asked, with its path relative to the root.
+    """
+    stack = [Path()]
+    while stack:
+        relative_directory = stack.pop()
+        with os.scandir(source / relative_directory) as entries:
+            for entry in entries:
+                relative_path = relative_directory / entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(relative_path)
+                    if include_directories:
+                        yield entry, relative_path
+                elif entry.is_file(follow_symlinks=False) or entry.is_symlink():
+                    yield entry, relative_path
+
+
+def _kernel_copy(source_descriptor: int, destination_descriptor: int, size: int) -> int:
+    """Copies a file with `copy_file_range` or `sendfile`, returning how many bytes the kernel copied."""
+    copied = 0
+    for name in ("copy_file_range", "sendfile"):
+        function = getattr(os, name, None)
+        if function is None:
+            continue
+        try:
+            while copied < size:
+                if name == "copy_file_range":
+                    sent = function(source_descriptor, destination_descriptor, min(COPY_CHUNK_SIZE, size - copied))
+                else:
+                    sent = function(destination_descriptor, source_descriptor, copied, min(COPY_CHUNK_SIZE, size - copied))
+                if sent == 0:
+                    break
+                copied += sent
+            return copied
+        except OSError as e:
+            if e.errno not in _KERNEL_COPY_FALLBACK_ERRNOS or copied:
+                raise
+    return copied
+
+
+def copy_file(source: Path, destination: Path, size: int, verify: bool = False) -> int:
+    """Copies one file through a temporary file beside the destination, keeping the copy in the kernel where possible.
+
+    The copy takes the permission bits and modification time of the source before it replaces the destination.
+
+    Args:
+        source (Path): File to copy.
+        destination (Path): Path to copy it to, replaced if it exists, without following a symbolic link there.
+        size (int): Size of the source file.
+        verify (bool, optional): Whether to compare the checksums of the source and the copy before moving it into place. Defaults to False.
+
+    Raises:
+        ValueError: If `verify` is set and the checksums differ.
+
+    Returns:
+        int: Number of bytes copied.
+    """
+    source_stat = os.stat(source)
+    descriptor, temporary_name = tempfile.mkstemp(prefix=f".{destination.name}.", suffix=".tmp", dir=destination.parent)
+    temporary_path = Path(temporary_name)
+    try:
+        with open(source, "rb") as source_file, open(descriptor, "wb") as destination_file:
+            copied = _kernel_copy(source_file.fileno(), destination_file.fileno(), size)
+            if copied < size:
+                source_file.seek(copied)
+                destination_file.seek(copied)
+                shutil.copyfileobj(source_file, destination_file)
+            copied = destination_file.tell()
+        if verify and _checksum(source) != _checksum(temporary_path):
+            raise ValueError(f"Checksum of the copy of `{source}` does not match its source.")
+        os.chmod(temporary_path, stat.S_IMODE(source_stat.st_mode))
+        os.utime(temporary_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        os.replace(temporary_path, destination)
+    except BaseException:
+        temporary_path.unlink(missing_ok=True)
+        raise
+    return copied
+
+
+def copy_symlink(source: Path, destination: Path) -> None:
+    """Recreates a symbolic link under a temporary name beside the destination and moves it into place.
+
+    Args:
+        source (Path): Symbolic link to copy.
+        destination (Path): Path to create the link at, replaced if it is a file or a link.
+    """
+    link = os.readlink(source)
+    while True:
+        temporary_path = destination.with_name(f".{destination.name}.{os.urandom(6).hex()}.tmp")
+        try:
+            os.symlink(link, temporary_path)
+            break
+        except FileExistsError:
+            continue
+    try:
+        os.replace(temporary_path, destination)
+    except BaseException:
+        temporary_path.unlink(missing_ok=True)
+        raise
+
+
+def _checksum(path: Path) -> str:
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, CHECKSUM_ALGORITHM).hexdigest()
+
+
+# **********
+def copy_tree(source: Path, destination: Path, workers: int = DEFAULT_WORKERS, verify: bool = False, on_progress: Optional[Callable[[Path, int], None]] = None) -> TransferReport:
+    """Copies a tree with parallel workers, skipping files whose size and modification time already match.
+
+    Args:
+        source (Path): Root of the tree to copy.
+        destination (Path): Directory to copy the tree into, created if missing.
+        workers (int, optional): Number of files copied at once. Defaults to DEFAULT_WORKERS.
+        verify (bool, optional): Whether to compare the checksums of each source and copy. Defaults to False.
+        on_progress (Optional[Callable[[Path, int], None]], optional): Called from the workers with the relative path and size of each copied file. Defaults to None.
+
+    Raises:
+        NotADirectoryError: If the source is not a directory.
+
+    Returns:
+        TransferReport: Counts, throughput and the errors of the files that failed.
+    """
+    if not source.is_dir():
+        raise NotADirectoryError(f"Transfer source `{source}` is not a directory.")
+    report = TransferReport()
+    lock = threading.Lock()
+    created_directories = set()
+
+    def copy_one(entry: os.DirEntry, relative_path: Path) -> None:
+        target = destination / relative_path
+        if entry.is_symlink():
+            copy_symlink(Path(entry.path), target)
+            return
+        source_stat = entry.stat(follow_symlinks=False)
+        try:
+            target_stat = target.lstat()
+            if stat.S_ISREG(target_stat.st_mode) and target_stat.st_size == source_stat.st_size and target_stat.st_mtime_ns == source_stat.st_mtime_ns:
+                with lock:
+                    report.files_skipped += 1
+                return
+        except FileNotFoundError:
+            pass
+
+        copied = copy_file(Path(entry.path), target, source_stat.st_size, verify)
+        with lock:
+            report.files_copied += 1
+            report.bytes_copied += copied
+        if on_progress is not None:
+            on_progress(relative_path, copied)
+
+    started_at = time.monotonic()
+    logger.info(f"Copying `{source}` to `{destination}` with {workers} workers.")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def collect(done) -> None:
+            for future in done:
+                relative_path = pending.pop(future)
+                if future.exception() is not None:
+                    logger.error(f"Failed to copy `{relative_path}`: {future.exception()}")
+                    report.errors.append((relative_path, future.exception()))
+
+        for entry, relative_path in walk_files(source, include_directories=True):
+            if entry.is_dir(follow_symlinks=False):
+                (destination / relative_path).mkdir(parents=True, exist_ok=True)
+                created_directories.add(destination / relative_path)
+                continue
+            parent = (destination / relative_path).parent
+            if parent not in created_directories:
+                parent.mkdir(parents=True, exist_ok=True)
+                created_directories.add(parent)
+            pending[executor.submit(copy_one, entry, relative_path)] = relative_path
+            # Bounds the walk ahead of the copies so that huge trees are never held in memory
+            if len(pending) >= workers * 4:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+        collect(concurrent.futures.wait(pending).done)
+
+    report.seconds = time.monotonic() - started_at
+    logger.info(
+        f"Copied {report.files_copied} files ({report.bytes_copied} bytes, {report.bytes_per_second / 2 ** 20:.1f} MiB/s), "
+        f"skipped {report.files_skipped}, failed {len(report.errors)}."
+    )
+    return report
+
+
+# **********
+if __name__ == "__main__":
+    pass
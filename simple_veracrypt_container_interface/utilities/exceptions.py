@@ -5,6 +5,8 @@
 This module contains custom exceptions for the package.
 """
 
+from typing import List
+
 # **********
 class AlreadyMountedError(Exception):
     """Raised when a container, file system, or drive is already mounted."""
@@ -16,6 +18,41 @@ class AlreadyDismountedError(Exception):
     pass
 
 
+class NoMountPointAvailableError(Exception):
+    """Raised when no drive letter or mount directory is free to be assigned."""
+    pass
+
+
+class CommandTimeoutError(RuntimeError):
+    """Raised when a command does not finish within its timeout and is killed."""
+    pass
+
+
+class DependencyFailedError(RuntimeError):
+    """Raised when a container operation is skipped because an operation it depends on failed."""
+    pass
+
+
+class InvalidCredentialsError(Exception):
+    """Raised when the credentials of a container do not open its volume header."""
+    pass
+
+
+class IntegrityError(Exception):
+    """Raised when a container file differs from the chunk hashes recorded for it."""
+
+    def __init__(self, message: str, chunks: List[int]):
+        super().__init__(message)
+
+        #: Indexes of the chunks that differ.
+        self.chunks = chunks
+
+
+class IntegrityUnverifiableError(Exception):
+    """Raised when a container file is scrubbed but no chunk hashes were recorded to compare it against."""
+    pass
+
+
 # **********
 if __name__ == "__main__":
     pass
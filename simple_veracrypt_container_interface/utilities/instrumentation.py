@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains the instrumentation used to time the phases of container operations.
+
+An operation is recorded only while an `Instrumentation` with at least one sink is active. Code that wants to
+report a phase calls the module-level `phase` and `annotate` functions, which do nothing outside of a recorded
+operation, so disabled instrumentation costs one context variable lookup per call.
+"""
+
+import time
+import logging
+import threading
+import contextlib
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Default histogram bucket upper bounds, in seconds.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# **********
+@dataclass
+class OperationRecord:
+    """Timings and outcome of a single recorded operation."""
+
+    #: Name of the operation, such as `mount` or `dismount`.
+    operation: str
+
+    #: Labels identifying the operation, such as the container path.
+    labels: Dict[str, str] = field(default_factory=dict)
+
+    #: Seconds spent in each phase, in the order the phases finished.
+    phases: Dict[str, float] = field(default_factory=dict)
+
+    #: Seconds the whole operation took.
+    total_seconds: float = 0.0
+
+    #: Exit code of the VeraCrypt command, if one ran to completion.
+    exit_code: Optional[int] = None
+
+    #: Bytes the command wrote to standard output.
+    stdout_bytes: int = 0
+
+    #: Bytes the command wrote to standard error.
+    stderr_bytes: int = 0
+
+    #: Name of the exception that ended the operation, if any.
+    error: Optional[str] = None
+
+    #: Whether a mount was opened from the driver password cache, if the container uses one.
+    cache_hit: Optional[bool] = None
+
+
+class OperationRecorder:
+    """Collects the phases of one operation while it runs."""
+
+    def __init__(self, operation: str, labels: Dict[str, str]):
+        """Instantiates a new OperationRecorder object.
+
+        Args:
+            operation (str): Name of the operation.
+            labels (Dict[str, str]): Labels identifying the operation.
+        """
+        self.record = OperationRecord(operation, labels)
+
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times a phase of the operation. Repeated phases accumulate.
+
+        Args:
+            name (str): Name of the phase.
+        """
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record.phases[name] = self.record.phases.get(name, 0.0) + time.monotonic() - started_at
+
+
+_current_recorder: ContextVar[Optional[OperationRecorder]] = ContextVar("current_recorder", default=None)
+
+_NULL_PHASE = contextlib.nullcontext()
+
+
+def phase(name: str) -> contextlib.AbstractContextManager:
+    """Times a phase of the operation being recorded in the current context, if any.
+
+    Args:
+        name (str): Name of the phase.
+
+    Returns:
+        contextlib.AbstractContextManager: Context manager timing the phase.
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return _NULL_PHASE
+    return recorder.phase(name)
+
+
+def annotate(**fields: Any) -> None:
+    """Sets fields of the operation being recorded in the current context, if any.
+
+    Args:
+        **fields (Any): `OperationRecord` fields to set, such as `exit_code`.
+    """
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        for name, value in fields.items():
+            setattr(recorder.record, name, value)
+
+
+@contextlib.contextmanager
+def detached() -> Iterator[None]:
+    """Stops recording phases and fields into the operation of the current context until the block exits.
+
+    Used for auxiliary commands run during an operation, whose exit code and output must not replace those of the
+    operation's own command.
+    """
+    token = _current_recorder.set(None)
+    try:
+        yield
+    finally:
+        _current_recorder.reset(token)
+
+
+# **********
+class CallbackSink:
+    """Passes every finished operation to a callback."""
+
+    def __init__(self, callback: Callable[[OperationRecord], None]):
+        """Instantiates a new CallbackSink object.
+
+        Args:
+            callback (Callable[[OperationRecord], None]): Called with each finished operation.
+        """
+        self.callback = callback
+
+
+    def record(self, record: OperationRecord) -> None:
+        self.callback(record)
+
+
+class Histogram:
+    """Cumulative histogram of durations."""
+
+    def __init__(self, buckets: Sequence[float]):
+        """Instantiates a new Histogram object.
+
+        Args:
+            buckets (Sequence[float]): Sorted bucket upper bounds, in seconds.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+
+    def observe(self, value: float) -> None:
+        """Adds a value to the histogram.
+
+        Args:
+            value (float): Duration in seconds.
+        """
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class HistogramSink:
+    """Aggregates finished operations into in-memory histograms and counters."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Instantiates a new HistogramSink object.
+
+        Args:
+            buckets (Sequence[float], optional): Bucket upper bounds, in seconds. Defaults to DEFAULT_BUCKETS.
+        """
+        self.buckets = tuple(sorted(buckets))
+
+        #: Phase duration histograms keyed by operation and phase. The whole operation is the `total` phase.
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+
+        #: Number of operations keyed by operation and outcome.
+        self.outcomes: Dict[Tuple[str, str], int] = {}
+
+        #: Bytes of command output keyed by operation and stream.
+        self.output_bytes: Dict[Tuple[str, str], int] = {}
+
+        self._lock = threading.Lock()
+
+
+    def record(self, record: OperationRecord) -> None:
+        outcome = "success" if record.error is None else "failure"
+        with self._lock:
+            for phase_name, seconds in [*record.phases.items(), ("total", record.total_seconds)]:
+                key = (record.operation, phase_name)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(self.buckets)
+                self.histograms[key].observe(seconds)
+            self.outcomes[(record.operation, outcome)] = self.outcomes.get((record.operation, outcome), 0) + 1
+            for stream, size in (("stdout", record.stdout_bytes), ("stderr", record.stderr_bytes)):
+                self.output_bytes[(record.operation, stream)] = self.output_bytes.get((record.operation, stream), 0) + size
+
+
+    def render_prometheus(self, prefix: str = "veracrypt") -> str:
+        """Renders the aggregated metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix (str, optional): Prefix of every metric name. Defaults to "veracrypt".
+
+        Returns:
+            str: The metrics, one sample per line.
+        """
+        lines = [
+            f"# HELP {prefix}_phase_duration_seconds Duration of each phase of a container operation.",
+            f"# TYPE {prefix}_phase_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (operation, phase_name), histogram in sorted(self.histograms.items()):
+                labels = f'operation="{operation}",phase="{phase_name}"'
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{prefix}_phase_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{prefix}_phase_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{prefix}_phase_duration_seconds_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{prefix}_phase_duration_seconds_count{{{labels}}} {histogram.count}")
+
+            lines.append(f"# HELP {prefix}_operations_total Number of container operations by outcome.")
+            lines.append(f"# TYPE {prefix}_operations_total counter")
+            for (operation, outcome), count in sorted(self.outcomes.items()):
+                lines.append(f'{prefix}_operations_total{{operation="{operation}",outcome="{outcome}"}} {count}')
+
+            lines.append(f"# HELP {prefix}_command_output_bytes_total Bytes of output written by VeraCrypt commands.")
+            lines.append(f"# TYPE {prefix}_command_output_bytes_total counter")
+            for (operation, stream), size in sorted(self.output_bytes.items()):
+                lines.append(f'{prefix}_command_output_bytes_total{{operation="{operation}",stream="{stream}"}} {size}')
+        return "\n".join(lines) + "\n"
+
+
+# **********
+class Instrumentation:
+    """Records container operations and passes them to its sinks."""
+
+    def __init__(self, sinks: Sequence[Any] = ()):
+        """Instantiates a new Instrumentation object.
+
+        Args:
+            sinks (Sequence[Any], optional): Objects with a `record(OperationRecord)` method. Defaults to no sinks, which disables recording.
+        """
+        self.sinks: List[Any] = list(sinks)
+
+
+    @property
+    def enabled(self) -> bool:
+        """Whether operations are recorded."""
+        return bool(self.sinks)
+
+
+    def add_sink(self, sink: Any) -> None:
+        """Adds a sink, enabling recording.
+
+        Args:
+            sink (Any): Object with a `record(OperationRecord)` method.
+        """
+        self.sinks.append(sink)
+
+
+    @contextlib.contextmanager
+    def operation(self, name: str, **labels: str) -> Iterator[Optional[OperationRecorder]]:
+        """Records an operation, making it the target of `phase` and `annotate` in the current context.
+
+        Args:
+            name (str): Name of the operation.
+            **labels (str): Labels identifying the operation.
+
+        Yields:
+            Optional[OperationRecorder]: Recorder of the operation, or None if recording is disabled.
+        """
+        if not self.sinks:
+            yield None
+            return
+
+        recorder = OperationRecorder(name, labels)
+        token = _current_recorder.set(recorder)
+        started_at = time.monotonic()
+        try:
+            yield recorder
+        except BaseException as e:
+            recorder.record.error = type(e).__name__
+            raise
+        finally:
+            recorder.record.total_seconds = time.monotonic() - started_at
+            _current_recorder.reset(token)
+            for sink in self.sinks:
+                try:
+                    sink.record(recorder.record)
+                except Exception:
+                    logger.exception(f"Instrumentation sink {sink!r} failed.")
+
+
+#: Instrumentation shared by every container that is not given its own. Disabled until a sink is added.
+default_instrumentation = Instrumentation()
+
+
+# **********
+if __name__ == "__main__":
+    pass
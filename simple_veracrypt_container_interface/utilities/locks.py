@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains a lock manager that serializes operations on a container or mount target across processes.
+
+Within a process, tasks queue on an asyncio lock per key; across processes on the same host, the holder also
+takes an exclusive lock on a per-key lock file. The lock file is polled without blocking, so waiting never
+blocks the event loop and can be cancelled or timed out. Every acquisition records its wait time.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import tempfile
+import contextlib
+from pathlib import Path
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterable, Optional, Union, TYPE_CHECKING
+
+from simple_veracrypt_container_interface.utilities import instrumentation
+from simple_veracrypt_container_interface.utilities.mount_table import normalize_mount_point
+from simple_veracrypt_container_interface.utilities.mount_point_allocator import lock_file_descriptor, unlock_file_descriptor, lock_file_name
+
+if TYPE_CHECKING:
+    from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Directory holding the cross-process lock files.
+DEFAULT_LOCK_DIRECTORY = Path(tempfile.gettempdir()) / "simple_veracrypt_container_interface" / "locks"
+
+#: Initial seconds between attempts to take a lock file held by another process.
+DEFAULT_POLL_INTERVAL = 0.005
+
+#: Longest seconds between attempts to take a lock file held by another process.
+MAX_POLL_INTERVAL = 0.1
+
+# **********
+@dataclass
+class LockStatistics:
+    """Wait metrics of the locks of one kind."""
+
+    #: Number of times a lock was taken.
+    acquisitions: int = 0
+
+    #: Number of acquisitions that had to wait for another task or process.
+    contended: int = 0
+
+    #: Total seconds spent waiting.
+    total_wait_seconds: float = 0.0
+
+    #: Longest single wait in seconds.
+    max_wait_seconds: float = 0.0
+
+    def record(self, wait_seconds: float, contended: bool) -> None:
+        """Records one acquisition."""
+        self.acquisitions += 1
+        self.contended += contended
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+
+def container_lock_key(container_path: Union[str, Path]) -> str:
+    """Builds the lock key of a container file."""
+    return f"container:{os.path.abspath(container_path)}"
+
+
+def mount_point_lock_key(mount_point: Union[str, Path]) -> str:
+    """Builds the lock key of a mount target."""
+    return f"mount:{normalize_mount_point(mount_point)}"
+
+
+class LockManager:
+    """Hands out locks that exclude other tasks of this process and other processes on the host."""
+
+    def __init__(self, lock_directory: Path = DEFAULT_LOCK_DIRECTORY, timeout: Optional[float] = None):
+        """Instantiates a new LockManager object.
+
+        Args:
+            lock_directory (Path, optional): Directory holding the lock files, created if missing. Defaults to DEFAULT_LOCK_DIRECTORY.
+            timeout (Optional[float], optional): Default seconds to wait for a lock. Defaults to waiting forever.
+        """
+        self.lock_directory = lock_directory
+        self.timeout = timeout
+
+        #: Wait metrics keyed by lock kind (`container` or `mount`).
+        self.statistics: Dict[str, LockStatistics] = {}
+
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.lock_directory.mkdir(parents=True, exist_ok=True)
+
+
+    async def _acquire_file(self, key: str) -> int:
+        """Takes the lock file of a key, polling with backoff while another process holds it."""
+        fd = os.open(self.lock_directory / lock_file_name(key), os.O_RDWR | os.O_CREAT, 0o600)
+        interval = DEFAULT_POLL_INTERVAL
+        try:
+            while not lock_file_descriptor(fd, blocking=False):
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+
+    @contextlib.asynccontextmanager
+    async def hold(self, keys: Iterable[str], timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Holds the locks of several keys, taken in sorted order so that overlapping holders cannot deadlock.
+
+        Args:
+            keys (Iterable[str]): Lock keys, such as those built by `container_lock_key` and `mount_point_lock_key`.
+            timeout (Optional[float], optional): Seconds to wait for all of the locks. Defaults to the manager's timeout.
+
+        Raises:
+            TimeoutError: If the locks are not taken within the timeout.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        held_locks = []
+        held_files = []
+        try:
+            with instrumentation.phase("lock"):
+                async with asyncio.timeout(timeout):
+                    for key in sorted(set(keys)):
+                        started_at = time.monotonic()
+                        lock = self._locks.setdefault(key, asyncio.Lock())
+                        contended = lock.locked()
+                        await lock.acquire()
+                        held_locks.append(lock)
+                        fd = os.open(self.lock_directory / lock_file_name(key), os.O_RDWR | os.O_CREAT, 0o600)
+                        if lock_file_descriptor(fd, blocking=False):
+                            held_files.append(fd)
+                        else:
+                            os.close(fd)
+                            contended = True
+                            logger.debug(f"Waiting for another process to release lock `{key}`.")
+                            held_files.append(await self._acquire_file(key))
+                        wait_seconds = time.monotonic() - started_at
+                        self.statistics.setdefault(key.split(":", 1)[0], LockStatistics()).record(wait_seconds, contended)
+            yield
+        finally:
+            for fd in reversed(held_files):
+                unlock_file_descriptor(fd)
+                os.close(fd)
+            for lock in reversed(held_locks):
+                lock.release()
+
+
+    def lock_container(self, container: "VeracryptContainer", timeout: Optional[float] = None) -> contextlib.AbstractAsyncContextManager:
+        """Holds the locks of a container file and, unless it is assigned automatically, of its mount target.
+
+        Automatically assigned targets are already exclusive through their allocator reservation.
+
+        Args:
+            container (VeracryptContainer): Container to lock.
+            timeout (Optional[float], optional): Seconds to wait for the locks. Defaults to the manager's timeout.
+
+        Returns:
+            contextlib.AbstractAsyncContextManager: Context holding the locks.
+        """
+        return self.lock_containers([container], timeout)
+
+
+    def lock_containers(self, containers: Iterable["VeracryptContainer"], timeout: Optional[float] = None) -> contextlib.AbstractAsyncContextManager:
+        """Holds the locks of several containers at once, in the same sorted order as any other holder. See `lock_container`.
+
+        Args:
+            containers (Iterable[VeracryptContainer]): Containers to lock.
+            timeout (Optional[float], optional): Seconds to wait for the locks. Defaults to the manager's timeout.
+
+        Returns:
+            contextlib.AbstractAsyncContextManager: Context holding the locks.
+        """
+        keys = []
+        for container in containers:
+            keys.append(container_lock_key(container.container_path))
+            if not container.auto_assign:
+                keys.append(mount_point_lock_key(container.mount_path))
+        return self.hold(keys, timeout)
+
+
+# **********
+#: Lock manager shared by the containers of this process that opt into locking.
+default_lock_manager: Optional[LockManager] = None
+
+
+def get_default_lock_manager() -> LockManager:
+    """Fetches the lock manager shared by this process, creating it on first use.
+
+    Returns:
+        LockManager: The shared lock manager.
+    """
+    global default_lock_manager
+    if default_lock_manager is None:
+        default_lock_manager = LockManager()
+    return default_lock_manager
+
+
+# **********
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains an allocator that hands out free drive letters or mount directories.
+
+Reservations are tracked in memory for the current process and with per-target lock files for other
+processes on the same host, so concurrent mounts never pick the same target.
+"""
+
+import os
+import string
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Optional, Union
+
+from simple_veracrypt_container_interface.utilities import exceptions
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable, default_mount_table
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Directory holding the cross-process reservation lock files.
+DEFAULT_LOCK_DIRECTORY = Path(tempfile.gettempdir()) / "simple_veracrypt_container_interface" / "reservations"
+
+# **********
+def lock_file_descriptor(fd: int, blocking: bool = True) -> bool:
+    """Takes an exclusive lock on an open file.
+
+    Args:
+        fd (int): File descriptor to lock.
+        blocking (bool, optional): Whether to wait for the lock. Defaults to True.
+
+    Returns:
+        bool: Whether the lock was taken.
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def unlock_file_descriptor(fd: int) -> None:
+    """Releases a lock taken with `lock_file_descriptor`.
+
+    Args:
+        fd (int): File descriptor to unlock.
+    """
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def lock_file_name(key: str) -> str:
+    """Builds a file name that is safe to use for a lock key on every platform.
+
+    Args:
+        key (str): Key the lock protects, such as a mount target or container path.
+
+    Returns:
+        str: File name for the lock.
+    """
+    return hashlib.sha1(key.encode()).hexdigest() + ".lock"
+
+
+# **********
+class MountPointReservation:
+    """A mount target held by a MountPointAllocator until it is released."""
+
+    def __init__(self, allocator: "MountPointAllocator", target: str, fd: int):
+        """Instantiates a new MountPointReservation object.
+
+        Args:
+            allocator (MountPointAllocator): Allocator the target was reserved from.
+            target (str): Reserved drive letter or mount directory.
+            fd (int): Descriptor of the lock file held for the target.
+        """
+        self.allocator = allocator
+        self.target = target
+        self.fd = fd
+
+
+    def release(self) -> None:
+        """Returns the target to the allocator."""
+        self.allocator.release(self)
+
+
+    def __enter__(self) -> "MountPointReservation":
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class MountPointAllocator:
+    """Hands out drive letters or mount directories that no other task or process holds."""
+
+    def __init__(self, targets: Iterable[str], mount_table: Optional[MountTable] = None, lock_directory: Path = DEFAULT_LOCK_DIRECTORY):
+        """Instantiates a new MountPointAllocator object.
+
+        Args:
+            targets (Iterable[str]): Drive letters or mount directories that may be handed out.
+            mount_table (Optional[MountTable], optional): Mount table used to skip targets that are already mounted. Defaults to the shared snapshot.
+            lock_directory (Path, optional): Directory holding the cross-process lock files. Defaults to DEFAULT_LOCK_DIRECTORY.
+        """
+        self.mount_table = mount_table if mount_table is not None else default_mount_table
+        self.lock_directory = lock_directory
+        self.lock_directory.mkdir(parents=True, exist_ok=True)
+
+        self._free: Deque[str] = deque(dict.fromkeys(targets))
+        self._reserved: Dict[str, MountPointReservation] = {}
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def for_drive_letters(cls, letters: str = string.ascii_uppercase[3:], **kwargs) -> "MountPointAllocator":
+        """Creates an allocator that hands out drive letters.
+
+        Args:
+            letters (str, optional): Letters that may be handed out. Defaults to `D` through `Z`.
+
+        Returns:
+            MountPointAllocator: The new allocator.
+        """
+        return cls(letters, **kwargs)
+
+
+    @classmethod
+    def for_directories(cls, base_directory: Path, count: int, prefix: str = "veracrypt", **kwargs) -> "MountPointAllocator":
+        """Creates an allocator that hands out mount directories below a base directory.
+
+        Args:
+            base_directory (Path): Directory under which the mount directories are created.
+            count (int): Number of mount directories that may be handed out.
+            prefix (str, optional): Prefix of each mount directory name. Defaults to "veracrypt".
+
+        Returns:
+            MountPointAllocator: The new allocator.
+        """
+        return cls((str(base_directory / f"{prefix}{index}") for index in range(1, count + 1)), **kwargs)
+
+
+    @staticmethod
+    def mount_path(target: str) -> Path:
+        """Converts a target handed out by an allocator into the path it is mounted at.
+
+        Args:
+            target (str): Drive letter or mount directory.
+
+        Returns:
+            Path: `X:\\` for drive letters, otherwise the directory itself.
+        """
+        return Path(f"{target}:\\") if len(target) == 1 else Path(target)
+
+
+    def _try_lock(self, target: str) -> Optional[int]:
+        """Takes the cross-process lock file for a target without waiting.
+
+        Args:
+            target (str): Drive letter or mount directory.
+
+        Returns:
+            Optional[int]: Descriptor of the held lock file, or None if another process holds it.
+        """
+        fd = os.open(self.lock_directory / lock_file_name(target), os.O_RDWR | os.O_CREAT, 0o600)
+        if lock_file_descriptor(fd, blocking=False):
+            return fd
+        os.close(fd)
+        return None
+
+
+    def reserve(self, preferred: Optional[str] = None) -> MountPointReservation:
+        """Reserves a free target.
+
+        Args:
+            preferred (Optional[str], optional): Target to reserve if it is free. Defaults to None.
+
+        Raises:
+            NoMountPointAvailableError: If every target is mounted or reserved.
+
+        Returns:
+            MountPointReservation: The reserved target.
+        """
+        with self._lock:
+            if preferred is not None and preferred in self._free:
+                self._free.remove(preferred)
+                self._free.appendleft(preferred)
+
+            # Each candidate is examined at most once, skipped ones rotate to the back
+            for _ in range(len(self._free)):
+                target = self._free.popleft()
+                if self.mount_table.is_mounted(self.mount_path(target)):
+                    self._free.append(target)
+                    continue
+                fd = self._try_lock(target)
+                if fd is None:
+                    self._free.append(target)
+                    continue
+
+                reservation = MountPointReservation(self, target, fd)
+                self._reserved[target] = reservation
+                if len(target) > 1:
+                    Path(target).mkdir(parents=True, exist_ok=True)
+                logger.info(f"Reserved mount target `{target}`.")
+                return reservation
+
+        raise exceptions.NoMountPointAvailableError("No free mount target is available.")
+
+
+    def release(self, reservation: MountPointReservation) -> None:
+        """Releases a reservation so that its target can be handed out again.
+
+        Args:
+            reservation (MountPointReservation): Reservation to release.
+        """
+        with self._lock:
+            if self._reserved.get(reservation.target) is not reservation:
+                return
+            del self._reserved[reservation.target]
+            unlock_file_descriptor(reservation.fd)
+            os.close(reservation.fd)
+            self._free.append(reservation.target)
+        logger.info(f"Released mount target `{reservation.target}`.")
+
+
+    def is_reserved(self, target: Union[str, Path]) -> bool:
+        """Checks whether this allocator currently holds a target.
+
+        Args:
+            target (Union[str, Path]): Drive letter or mount directory.
+
+        Returns:
+            bool: Whether the target is reserved.
+        """
+        return str(target) in self._reserved
+
+
+# **********
+if __name__ == "__main__":
+    pass
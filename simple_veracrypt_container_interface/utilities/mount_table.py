@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module holds an in-memory snapshot of the system mount table.
+
+A single scan of the OS mount table (`/proc/self/mountinfo` on Linux, the logical drive bitmask on Windows)
+answers every mount-state query until the snapshot expires or is invalidated.
+"""
+
+import os
+import re
+import sys
+import time
+import string
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set, Union
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Linux mount table for the current process.
+MOUNTINFO_PATH = Path("/proc/self/mountinfo")
+
+#: Default number of seconds a snapshot is trusted before it is rescanned.
+DEFAULT_TTL = 1.0
+
+_DRIVE_PATTERN = re.compile(r"^([A-Za-z]):[\\/]?$")
+_OCTAL_ESCAPE_PATTERN = re.compile(r"\\([0-7]{3})")
+
+# **********
+@dataclass(frozen=True)
+class MountEntry:
+    """A single mounted file system."""
+
+    #: Normalized mount point (a directory, or `X:\` for drive letters).
+    mount_point: str
+
+    #: Device or source the file system is mounted from.
+    source: str = ""
+
+    #: File system type.
+    fstype: str = ""
+
+
+def normalize_mount_point(path: Union[str, Path]) -> str:
+    """Normalizes a mount point so that equivalent spellings share one index key.
+
+    Args:
+        path (Union[str, Path]): Drive letter path (e.g. `T:\\`) or mount directory.
+
+    Returns:
+        str: Normalized mount point.
+    """
+    path = str(path)
+    match = _DRIVE_PATTERN.match(path)
+    if match:
+        return f"{match.group(1).upper()}:\\"
+    return os.path.normpath(path)
+
+
+def parse_mountinfo(content: str) -> Dict[str, MountEntry]:
+    """Parses the content of a Linux `mountinfo` file.
+
+    Args:
+        content (str): Content of the file.
+
+    Returns:
+        Dict[str, MountEntry]: Mounted file systems keyed by normalized mount point.
+    """
+    entries = {}
+    for line in content.splitlines():
+        fields = line.split()
+        if "-" not in fields:
+            continue
+        separator = fields.index("-")
+        if separator < 5 or len(fields) < separator + 3:
+            continue
+        mount_point = _OCTAL_ESCAPE_PATTERN.sub(lambda match: chr(int(match.group(1), 8)), fields[4])
+        mount_point = normalize_mount_point(mount_point)
+        entries[mount_point] = MountEntry(mount_point, fields[separator + 2], fields[separator + 1])
+    return entries
+
+
+def _scan_windows_drives() -> Dict[str, MountEntry]:
+    """Scans the Windows drive letters that are currently in use.
+
+    Returns:
+        Dict[str, MountEntry]: Used drive letters keyed by normalized mount point.
+    """
+    try:
+        import ctypes
+        bitmask = ctypes.windll.kernel32.GetLogicalDrives()
+        letters = [letter for index, letter in enumerate(string.ascii_uppercase) if bitmask & (1 << index)]
+    except (ImportError, AttributeError):
+        letters = [letter for letter in string.ascii_uppercase if os.path.exists(letter + ":\\")]
+    return {f"{letter}:\\": MountEntry(f"{letter}:\\") for letter in letters}
+
+
+def scan_mount_table() -> Dict[str, MountEntry]:
+    """Scans the OS mount table once.
+
+    Returns:
+        Dict[str, MountEntry]: Mounted file systems keyed by normalized mount point.
+    """
+    if sys.platform == "win32":
+        return _scan_windows_drives()
+    try:
+        return parse_mountinfo(MOUNTINFO_PATH.read_text())
+    except OSError:
+        logger.warning(f"Unable to read `{MOUNTINFO_PATH}`, falling back to drive letter probing.")
+        return _scan_windows_drives()
+
+
+# **********
+class MountTable:
+    """Snapshot of the mount table with a time-to-live and explicit invalidation."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, scanner: Optional[Callable[[], Dict[str, MountEntry]]] = None):
+        """Instantiates a new MountTable object.
+
+        Args:
+            ttl (float, optional): Seconds a scan is trusted before it is repeated. Defaults to DEFAULT_TTL.
+            scanner (Optional[Callable[[], Dict[str, MountEntry]]], optional): Function scanning the mounts. Defaults to `scan_mount_table`.
+        """
+        self.ttl = ttl
+        self.scanner = scanner
+
+        #: Number of scans of the OS mount table performed so far.
+        self.scan_count = 0
+
+        self._entries: Dict[str, MountEntry] = {}
+        self._backing_containers: Dict[str, Path] = {}
+        self._scanned_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+
+    def refresh(self, force: bool = False) -> None:
+        """Rescans the OS mount table if the snapshot is stale.
+
+        Args:
+            force (bool, optional): Whether to rescan even if the snapshot is still fresh. Defaults to False.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._scanned_at is not None and now - self._scanned_at < self.ttl:
+                return
+            logger.debug("Scanning the mount table.")
+            self._entries = (self.scanner or scan_mount_table)()
+            self._scanned_at = now
+            self.scan_count += 1
+            # Forgets containers whose mount points disappeared externally
+            for mount_point in set(self._backing_containers) - set(self._entries):
+                del self._backing_containers[mount_point]
+
+
+    def invalidate(self) -> None:
+        """Marks the snapshot as stale so that the next query rescans."""
+        with self._lock:
+            self._scanned_at = None
+
+
+    def entries(self) -> Dict[str, MountEntry]:
+        """Fetches every mounted file system.
+
+        Returns:
+            Dict[str, MountEntry]: Mounted file systems keyed by normalized mount point.
+        """
+        self.refresh()
+        return dict(self._entries)
+
+
+    def is_mounted(self, path: Union[str, Path]) -> bool:
+        """Checks whether a path is a mount point.
+
+        Args:
+            path (Union[str, Path]): Drive letter path or mount directory.
+
+        Returns:
+            bool: Whether the path is mounted.
+        """
+        self.refresh()
+        return normalize_mount_point(path) in self._entries
+
+
+    def available_drive_letters(self) -> Set[str]:
+        """Fetches the drive letters that are not in use.
+
+        Returns:
+            Set[str]: Set of available drive letters.
+        """
+        self.refresh()
+        return {letter for letter in string.ascii_uppercase if f"{letter}:\\" not in self._entries}
+
+
+    def backing_container(self, path: Union[str, Path]) -> Optional[Path]:
+        """Fetches the container known to be mounted at a path.
+
+        Args:
+            path (Union[str, Path]): Drive letter path or mount directory.
+
+        Returns:
+            Optional[Path]: Path of the container, or None if unknown or not mounted.
+        """
+        self.refresh()
+        return self._backing_containers.get(normalize_mount_point(path))
+
+
+    def record_mount(self, path: Union[str, Path], container_path: Path) -> None:
+        """Records that a container was mounted at a path and invalidates the snapshot.
+
+        Args:
+            path (Union[str, Path]): Drive letter path or mount directory.
+            container_path (Path): Path of the container that was mounted.
+        """
+        with self._lock:
+            self._backing_containers[normalize_mount_point(path)] = container_path
+            self._scanned_at = None
+
+
+    def update_backing_containers(self, containers: Dict[Path, Path]) -> None:
+        """Replaces the known backing containers with a listing obtained from VeraCrypt.
+
+        Args:
+            containers (Dict[Path, Path]): Container paths keyed by the path they are mounted at.
+        """
+        with self._lock:
+            self._backing_containers = {normalize_mount_point(path): container_path for path, container_path in containers.items()}
+            self._scanned_at = None
+
+
+    def record_dismount(self, path: Union[str, Path]) -> None:
+        """Records that a path was dismounted and invalidates the snapshot.
+
+        Args:
+            path (Union[str, Path]): Drive letter path or mount directory.
+        """
+        with self._lock:
+            self._backing_containers.pop(normalize_mount_point(path), None)
+            self._scanned_at = None
+
+
+# **********
+#: Mount table shared by every container that is not given its own.
+default_mount_table = MountTable()
+
+
+# **********
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module contains an async watcher that turns mount table changes into events.
+
+On Linux the kernel flags `/proc/self/mountinfo` with `POLLPRI` whenever the mount table changes, so the
+watcher sleeps on an epoll descriptor registered with the event loop and rescans only when something was
+mounted or dismounted. Elsewhere, or when the mount table uses a custom scanner, it rescans at a fixed interval.
+"""
+
+import select
+import asyncio
+import logging
+from pathlib import Path
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Set, Union
+
+from simple_veracrypt_container_interface.utilities.mount_table import MountEntry, MountTable, MOUNTINFO_PATH, default_mount_table, normalize_mount_point
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Event kind of a file system that appeared.
+MOUNTED = "mounted"
+
+#: Event kind of a file system that disappeared.
+DISMOUNTED = "dismounted"
+
+#: Default number of seconds between rescans when change notifications are unavailable.
+DEFAULT_POLL_INTERVAL = 0.5
+
+# **********
+@dataclass(frozen=True)
+class MountEvent:
+    """A file system that was mounted or dismounted."""
+
+    #: `MOUNTED` or `DISMOUNTED`.
+    kind: str
+
+    #: The mounted file system, as last seen in the mount table.
+    entry: MountEntry
+
+    #: Container known to be mounted there, if any.
+    container_path: Optional[Path] = None
+
+    @property
+    def mount_point(self) -> str:
+        """Normalized mount point of the file system."""
+        return self.entry.mount_point
+
+
+class MountWatcher:
+    """Watches the mount table and wakes waiters the moment a file system appears or disappears."""
+
+    def __init__(self, mount_table: Optional[MountTable] = None, poll_interval: float = DEFAULT_POLL_INTERVAL, mountinfo_path: Path = MOUNTINFO_PATH):
+        """Instantiates a new MountWatcher object. It starts watching on first use or in `start`.
+
+        Args:
+            mount_table (Optional[MountTable], optional): Mount table to keep current. Defaults to the shared table.
+            poll_interval (float, optional): Seconds between rescans when change notifications are unavailable. Defaults to DEFAULT_POLL_INTERVAL.
+            mountinfo_path (Path, optional): Linux mount table to subscribe to. Defaults to MOUNTINFO_PATH.
+        """
+        self.mount_table = mount_table if mount_table is not None else default_mount_table
+        self.poll_interval = poll_interval
+        self.mountinfo_path = mountinfo_path
+
+        #: Whether the watcher is woken by kernel notifications rather than polling.
+        self.notifications_enabled = False
+
+        self._entries: Dict[str, MountEntry] = {}
+        self._containers: Dict[str, Path] = {}
+        self._notifications: Set[asyncio.Task] = set()
+        self._subscribers: List[asyncio.Queue] = []
+        self._changed: Optional[asyncio.Condition] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._mountinfo_file = None
+        self._epoll = None
+
+
+    # **********
+    async def start(self) -> None:
+        """Takes the initial snapshot and starts watching, if not already started."""
+        if self._task is not None:
+            return
+        self._changed = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self.mount_table.refresh(force=True)
+        self._entries = self.mount_table.entries()
+        self._containers = self._backing_containers(self._entries)
+        self._subscribe_to_kernel()
+        self._task = asyncio.create_task(self._watch())
+
+
+    async def close(self) -> None:
+        """Stops watching and ends every event stream."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._notifications:
+            await asyncio.gather(*self._notifications, return_exceptions=True)
+        self._unsubscribe_from_kernel()
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+
+    async def __aenter__(self) -> "MountWatcher":
+        await self.start()
+        return self
+
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+    def _subscribe_to_kernel(self) -> None:
+        """Registers for mount table change notifications, if the platform and scanner allow."""
+        if self.mount_table.scanner is not None or not hasattr(select, "epoll"):
+            return
+        try:
+            self._mountinfo_file = open(self.mountinfo_path, "rb")
+            self._epoll = select.epoll()
+            self._epoll.register(self._mountinfo_file.fileno(), select.EPOLLPRI | select.EPOLLERR)
+            asyncio.get_running_loop().add_reader(self._epoll.fileno(), self._on_notification)
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"Mount table notifications unavailable, polling every {self.poll_interval} s: {e}")
+            self._unsubscribe_from_kernel()
+            return
+        self.notifications_enabled = True
+
+
+    def _unsubscribe_from_kernel(self) -> None:
+        """Releases the change notification descriptors."""
+        if self._epoll is not None:
+            if self.notifications_enabled:
+                asyncio.get_running_loop().remove_reader(self._epoll.fileno())
+            self._epoll.close()
+            self._epoll = None
+        if self._mountinfo_file is not None:
+            self._mountinfo_file.close()
+            self._mountinfo_file = None
+        self.notifications_enabled = False
+
+
+    def _on_notification(self) -> None:
+        """Drains the pending notifications and wakes the watch loop."""
+        self._epoll.poll(0)
+        self._wakeup.set()
+
+
+    async def _watch(self) -> None:
+        """Rescans the mount table on every notification or poll interval and publishes the differences."""
+        while True:
+            if self.notifications_enabled:
+                await self._wakeup.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except TimeoutError:
+                    pass
+            self._wakeup.clear()
+            self.rescan()
+
+
+    def rescan(self) -> List[MountEvent]:
+        """Rescans the mount table now and publishes the differences to the last scan.
+
+        Returns:
+            List[MountEvent]: Events for the file systems that appeared or disappeared.
+        """
+        previous_containers = {**self._containers, **self._backing_containers(self._entries)}
+        self.mount_table.refresh(force=True)
+        entries = self.mount_table.entries()
+        containers = self._backing_containers(entries)
+        events = [
+            MountEvent(DISMOUNTED, entry, previous_containers.get(mount_point)) for mount_point, entry in self._entries.items() if mount_point not in entries
+        ] + [
+            MountEvent(MOUNTED, entry, containers.get(mount_point)) for mount_point, entry in entries.items() if mount_point not in self._entries
+        ]
+        self._entries = entries
+        self._containers = containers
+        if events:
+            logger.debug(f"Mount table changed: {', '.join(f'{event.kind} {event.mount_point}' for event in events)}.")
+            for queue in self._subscribers:
+                for event in events:
+                    queue.put_nowait(event)
+            notification = asyncio.get_running_loop().create_task(self._notify_waiters())
+            self._notifications.add(notification)
+            notification.add_done_callback(self._notifications.discard)
+        return events
+
+
+    def _backing_containers(self, entries: Dict[str, MountEntry]) -> Dict[str, Path]:
+        """Snapshots the containers known to back the scanned mount points.
+
+        The mount table forgets a container once its mount point disappears or is recorded as dismounted, so
+        dismount events are attributed from the snapshot of the previous scan.
+        """
+        containers = {}
+        for mount_point in entries:
+            container_path = self.mount_table.backing_container(mount_point)
+            if container_path is not None:
+                containers[mount_point] = container_path
+        return containers
+
+
+    async def _notify_waiters(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+
+    # **********
+    async def events(self) -> AsyncIterator[MountEvent]:
+        """Streams mount and dismount events from now on until the watcher is closed.
+
+        Yields:
+            MountEvent: The events, in the order they were observed.
+        """
+        await self.start()
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            self._subscribers.remove(queue)
+
+
+    async def _wait_for(self, path: Union[str, Path], mounted: bool, timeout: Optional[float]) -> None:
+        """Waits until a path is or is not in the latest scan."""
+        await self.start()
+        mount_point = normalize_mount_point(path)
+        async with asyncio.timeout(timeout):
+            async with self._changed:
+                await self._changed.wait_for(lambda: (mount_point in self._entries) == mounted)
+
+
+    async def wait_mounted(self, path: Union[str, Path], timeout: Optional[float] = None) -> MountEntry:
+        """Waits until a path is mounted.
+
+        Args:
+            path (Union[str, Path]): Drive letter path or mount directory.
+            timeout (Optional[float], optional): Seconds to wait. Defaults to waiting forever.
+
+        Raises:
+            TimeoutError: If the path is not mounted within the timeout.
+
+        Returns:
+            MountEntry: The mounted file system.
+        """
+        await self._wait_for(path, True, timeout)
+        return self._entries[normalize_mount_point(path)]
+
+
+    async def wait_dismounted(self, path: Union[str, Path], timeout: Optional[float] = None) -> None:
+        """Waits until a path is no longer mounted.
+
+        Args:
+            path (Union[str, Path]): Drive letter path or mount directory.
+            timeout (Optional[float], optional): Seconds to wait. Defaults to waiting forever.
+
+        Raises:
+            TimeoutError: If the path is still mounted after the timeout.
+        """
+        await self._wait_for(path, False, timeout)
+
+
+# **********
+if __name__ == "__main__":
+    pass
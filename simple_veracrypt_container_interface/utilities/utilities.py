@@ -6,55 +6,349 @@ This module holds utilities used by other modules.
 """
 
 import os
+import sys
+import signal
 import string
 import asyncio
 import logging
+import subprocess
+from collections import deque
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Set, List
+from typing import Set, List, Deque, Dict, Tuple, Optional, Callable, AsyncIterator
+
+from simple_veracrypt_container_interface.utilities import exceptions, instrumentation
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
 
 # **********
 # Sets up logger
 logger = logging.getLogger(__name__)
 
+#: Default number of trailing output lines kept per stream when streaming a command.
+DEFAULT_TAIL_LINES = 100
+
+#: Longest line emitted by a command stream before it is split.
+MAX_LINE_LENGTH = 64 * 1024
+
+#: Size of each read from a subprocess pipe while streaming.
+_READ_CHUNK_SIZE = 4096
+
+#: Starts each command in its own process group so that the whole group can be killed.
+if sys.platform == "win32":
+    _PROCESS_GROUP_OPTIONS = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    _PROCESS_GROUP_OPTIONS = {"start_new_session": True}
+
+# **********
+@dataclass
+class CommandResult:
+    """Outcome of a command run through `run_command`."""
+
+    #: Command represented as a list of arguments.
+    command: List[str]
+
+    #: Exit code of the process.
+    returncode: int
+
+    #: Decoded standard output. Only the trailing lines are kept when streaming.
+    stdout: str
+
+    #: Decoded standard error. Only the trailing lines are kept when streaming.
+    stderr: str
+
+    #: Total bytes written to standard output, including any that were not kept.
+    stdout_size: int = 0
+
+    #: Total bytes written to standard error, including any that were not kept.
+    stderr_size: int = 0
+
+
 # **********
-def available_drive_letters() -> Set[str]:
+async def _kill_process_tree(pid: int) -> bool:
+    """Kills a Windows process and every process it started with `taskkill`.
+
+    Args:
+        pid (int): Process ID of the root of the tree.
+
+    Returns:
+        bool: Whether `taskkill` succeeded.
+    """
+    try:
+        taskkill = await asyncio.create_subprocess_exec(
+            "taskkill", "/T", "/F", "/PID", str(pid), stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+    except OSError as e:
+        logger.warning(f"Unable to run taskkill: {e}")
+        return False
+    return await taskkill.wait() == 0
+
+
+async def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """Kills a command that is still running, along with its process group, and reaps it.
+
+    Windows has no signal for a process group, so the process tree is killed with `taskkill /T /F` instead,
+    falling back to the process alone if that fails.
+
+    Args:
+        process (asyncio.subprocess.Process): Process started with `_PROCESS_GROUP_OPTIONS`.
+    """
+    if process.returncode is not None:
+        return
+    logger.warning(f"Killing process group of command with PID {process.pid}.")
+    try:
+        if sys.platform == "win32":
+            if not await _kill_process_tree(process.pid) and process.returncode is None:
+                process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass  # Exited in the meantime
+    await process.wait()
+
+
+async def spawn_process(command: List[str], has_input: bool = False) -> asyncio.subprocess.Process:
+    """Starts a command in its own process group with its output redirected into pipes.
+
+    Cancelling the caller while the process is starting still kills the process group once it exists.
+
+    Args:
+        command (List[str]): Command represented as a list of arguments.
+        has_input (bool, optional): Whether to open a pipe to the standard input of the command. Defaults to False.
+
+    Returns:
+        asyncio.subprocess.Process: The started process.
+    """
+    spawn = asyncio.ensure_future(asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.PIPE if has_input else None,
+        stdout=asyncio.subprocess.PIPE,  # Capture stdout
+        stderr=asyncio.subprocess.PIPE,  # Capture stderr, if needed
+        **_PROCESS_GROUP_OPTIONS,
+    ))
+    try:
+        return await asyncio.shield(spawn)
+    except asyncio.CancelledError:
+        await kill_process_group(await spawn)
+        raise
+
+
+async def _read_lines(reader: asyncio.StreamReader, on_chunk: Optional[Callable[[int], None]] = None) -> AsyncIterator[str]:
+    """Reads decoded lines from a stream, splitting lines longer than `MAX_LINE_LENGTH`.
+
+    Args:
+        reader (asyncio.StreamReader): Stream to read from.
+        on_chunk (Optional[Callable[[int], None]], optional): Called with the size of each chunk read. Defaults to None.
+
+    Yields:
+        str: Each line without its trailing newline.
+    """
+    pending = b""
+    while chunk := await reader.read(_READ_CHUNK_SIZE):
+        if on_chunk is not None:
+            on_chunk(len(chunk))
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode(errors="replace")
+        while len(pending) >= MAX_LINE_LENGTH:
+            yield pending[:MAX_LINE_LENGTH].decode(errors="replace")
+            pending = pending[MAX_LINE_LENGTH:]
+    if pending:
+        yield pending.rstrip(b"\r").decode(errors="replace")
+
+
+class CommandStream:
+    """Runs a command and exposes its output as an async iterator of lines.
+
+    Only the last `max_tail_lines` lines of each stream are retained, so memory stays bounded
+    no matter how much output the command produces.
+    """
+
+    def __init__(self, command: List[str], max_tail_lines: int = DEFAULT_TAIL_LINES, input: Optional[bytes] = None):
+        """Instantiates a new CommandStream object.
+
+        Args:
+            command (List[str]): Command represented as a list of arguments.
+            max_tail_lines (int, optional): Number of trailing lines kept per stream. Defaults to DEFAULT_TAIL_LINES.
+            input (Optional[bytes], optional): Data written to the standard input of the command. Defaults to None.
+        """
+        self.command = command
+        self.input = input
+
+        #: Exit code of the process once it has finished.
+        self.returncode: Optional[int] = None
+
+        #: Trailing lines of standard output.
+        self.stdout_tail: Deque[str] = deque(maxlen=max_tail_lines)
+
+        #: Trailing lines of standard error.
+        self.stderr_tail: Deque[str] = deque(maxlen=max_tail_lines)
+
+        #: Total bytes read from each stream.
+        self.output_sizes: Dict[str, int] = {"stdout": 0, "stderr": 0}
+
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[str, str]]:
+        """Starts the command and yields its output as it is produced.
+
+        Yields:
+            Tuple[str, str]: Name of the stream (`stdout` or `stderr`) and the line read from it.
+        """
+        with instrumentation.phase("spawn"):
+            process = await spawn_process(self.command, self.input is not None)
+        if self.input is not None:
+            process.stdin.write(self.input)
+            try:
+                await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The command exited without reading its input
+            process.stdin.close()
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)  # Applies backpressure to the pipes
+
+        async def pump(name: str, reader: asyncio.StreamReader) -> None:
+            def count(size: int) -> None:
+                self.output_sizes[name] += size
+
+            async for line in _read_lines(reader, count):
+                await queue.put((name, line))
+            await queue.put((name, None))
+
+        tails = {"stdout": self.stdout_tail, "stderr": self.stderr_tail}
+        pumps = [asyncio.create_task(pump(name, getattr(process, name))) for name in tails]
+        try:
+            open_streams = len(pumps)
+            while open_streams:
+                name, line = await queue.get()
+                if line is None:
+                    open_streams -= 1
+                    continue
+                tails[name].append(line)
+                yield name, line
+            self.returncode = await process.wait()
+        finally:
+            for task in pumps:
+                task.cancel()
+            await kill_process_group(process)
+
+
+    def result(self) -> CommandResult:
+        """Builds the result of the finished command from the retained output.
+
+        Returns:
+            CommandResult: Exit code and trailing output of the command.
+        """
+        return CommandResult(
+            self.command, self.returncode, "\n".join(self.stdout_tail), "\n".join(self.stderr_tail),
+            self.output_sizes["stdout"], self.output_sizes["stderr"],
+        )
+
+
+# **********
+def available_drive_letters(mount_table: Optional[MountTable] = None) -> Set[str]:
     """Fetches a set of available drive letters for the system.
 
+    Args:
+        mount_table (Optional[MountTable], optional): Snapshot to answer from instead of probing every letter. Defaults to None.
+
     Returns:
         Set[str]: Set of available drive letters.
     """
     logger.info("Fetching available drive letters.")
+    if mount_table is not None:
+        return mount_table.available_drive_letters()
     return {letter for letter in string.ascii_uppercase if not os.path.exists(letter + ":\\")}
 
 
-def is_mounted(path: Path) -> bool:
+def is_mounted(path: Path, mount_table: Optional[MountTable] = None) -> bool:
     """Checks if a path is exists and is a mount for a file system.
 
     Args:
         path (Path): Path to check.
+        mount_table (Optional[MountTable], optional): Snapshot to answer from instead of probing the path. Defaults to None.
 
     Returns:
         bool: Whether the path is mounted.
     """
     logger.info(f"Checking if path is mounted: {path}")
+    if mount_table is not None:
+        return mount_table.is_mounted(path)
     return os.path.ismount(path) and path.exists()
 
 
-async def run_command(command: List[str], print_output: bool = True) -> None:
+async def run_command(
+    command: List[str],
+    print_output: bool = True,
+    stream: bool = False,
+    on_line: Optional[Callable[[str, str], None]] = None,
+    max_tail_lines: int = DEFAULT_TAIL_LINES,
+    input: Optional[bytes] = None,
+    timeout: Optional[float] = None,
+) -> CommandResult:
     """Runs a command in an asynchronous subprocess.
 
     Args:
         command (List[str]): Command represented as a list of arguments.
         print_output (bool, optional): Whether to print the output of the command. Defaults to True.
+        stream (bool, optional): Whether to process the output line by line while the command runs, keeping only the trailing lines. Defaults to False.
+        on_line (Optional[Callable[[str, str], None]], optional): Called with the stream name and each line as it is read. Implies streaming. Defaults to None.
+        max_tail_lines (int, optional): Number of trailing lines kept per stream when streaming. Defaults to DEFAULT_TAIL_LINES.
+        input (Optional[bytes], optional): Data written to the standard input of the command, such as a password. Defaults to None.
+        timeout (Optional[float], optional): Seconds after which the command and its process group are killed. Defaults to None.
+
+    Raises:
+        CommandTimeoutError: If the command does not finish within `timeout`.
+        RuntimeError: If the command exits with a non-zero code.
+
+    Returns:
+        CommandResult: Exit code and output of the command.
     """
+    deadline = asyncio.timeout(timeout)
+    try:
+        async with deadline:
+            if stream or on_line is not None:
+                return await _run_streaming(command, print_output, on_line, max_tail_lines, input)
+            return await _run_buffered(command, print_output, input)
+    except TimeoutError as e:
+        if deadline.expired():
+            raise exceptions.CommandTimeoutError(f"Command timed out after {timeout} seconds: {command}") from e
+        raise
+
+
+async def _run_streaming(
+    command: List[str],
+    print_output: bool,
+    on_line: Optional[Callable[[str, str], None]],
+    max_tail_lines: int,
+    input: Optional[bytes],
+) -> CommandResult:
+    """Runs a command while processing its output line by line. See `run_command`."""
+    command_stream = CommandStream(command, max_tail_lines, input)
+    with instrumentation.phase("execute"):
+        async for stream_name, line in command_stream:
+            if on_line is not None:
+                on_line(stream_name, line)
+            if print_output:
+                print(line)
+    result = command_stream.result()
+    instrumentation.annotate(exit_code=result.returncode, stdout_bytes=result.stdout_size, stderr_bytes=result.stderr_size)
+    if result.returncode != 0:
+        raise RuntimeError(f"Command failed: {command}\n{result.stderr}")
+    return result
+
+
+async def _run_buffered(command: List[str], print_output: bool, input: Optional[bytes]) -> CommandResult:
+    """Runs a command while buffering all of its output. See `run_command`."""
     # Create the subprocess, redirect the standard output into a pipe
-    process = await asyncio.create_subprocess_exec(
-        *command,
-        stdout=asyncio.subprocess.PIPE,  # Capture stdout
-        stderr=asyncio.subprocess.PIPE   # Capture stderr, if needed
-    )
+    with instrumentation.phase("spawn"):
+        process = await spawn_process(command, input is not None)
 
-    stdout, stderr = await process.communicate()  # Read from stdout and stderr
+    try:
+        with instrumentation.phase("execute"):
+            stdout, stderr = await process.communicate(input)  # Read from stdout and stderr
+    finally:
+        await kill_process_group(process)  # Only when cancelled or timed out
+    instrumentation.annotate(exit_code=process.returncode, stdout_bytes=len(stdout), stderr_bytes=len(stderr))
     
     if process.returncode != 0:
         raise RuntimeError(f"Command failed: {command}\n{stderr.decode()}")
@@ -63,6 +357,8 @@ async def run_command(command: List[str], print_output: bool = True) -> None:
     if print_output:
         print(stdout.decode())
         print(stderr.decode())
+
+    return CommandResult(command, process.returncode, stdout.decode(), stderr.decode(), len(stdout), len(stderr))
         
 
 # **********
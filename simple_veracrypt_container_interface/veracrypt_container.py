@@ -5,36 +5,118 @@
 This module contains the VeracryptContainer class, which is used to mount and dismount Veracrypt containers.
 """
 
+import time
+import asyncio
+import inspect
 import logging
+import contextlib
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Callable, AsyncIterator, Awaitable, Dict, Tuple, Union, TYPE_CHECKING
 
-from simple_veracrypt_container_interface.utilities import utilities, exceptions
+from simple_veracrypt_container_interface.backends import CommandBackend, WindowsBackend, MOUNT_HASH_ALGORITHMS
+from simple_veracrypt_container_interface.creation import CreateOptions, preallocate_file
+from simple_veracrypt_container_interface.journal import MountJournal, MOUNT_INTENT, MOUNTED, MOUNT_FAILED, DISMOUNT_INTENT, DISMOUNTED, DISMOUNT_FAILED
+from simple_veracrypt_container_interface.transfer import TransferReport, copy_tree, DEFAULT_WORKERS
+from simple_veracrypt_container_interface.warmup import PageCacheWarmer, WarmupStatistics
+from simple_veracrypt_container_interface.utilities import utilities, exceptions, instrumentation
+from simple_veracrypt_container_interface.utilities.instrumentation import Instrumentation, default_instrumentation
+from simple_veracrypt_container_interface.utilities.locks import LockManager
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable, default_mount_table
+from simple_veracrypt_container_interface.utilities.mount_point_allocator import MountPointAllocator, MountPointReservation
+
+if TYPE_CHECKING:
+    from simple_veracrypt_container_interface.catalog import ContainerCatalog
+    from simple_veracrypt_container_interface.password_cache import PasswordCache
 
 # **********
 # Sets up logger
 logger = logging.getLogger(__name__)
 
+#: Mount letter that makes the container reserve a free mount target from its allocator when mounting.
+AUTO_ASSIGN = "auto"
+
+#: Default seconds a leased container stays mounted after its last lease is released.
+DEFAULT_LEASE_LINGER = 5.0
+
+# Operations in flight, keyed by event loop, operation name, absolute container path and target, for coalescing duplicates
+_in_flight_operations: Dict[Tuple[asyncio.AbstractEventLoop, str, Path, Union[int, str]], asyncio.Task] = {}
+
 # **********
 class VeracryptContainer:
     """Represents a Veracrypt container that can be mounted and dismounted."""
     
     
-    def __init__(self, executable_path: Path, container_path: Path, mount_letter: str, password: Optional[str] = None, keyfile_path: Optional[Path] = None):
+    def __init__(self, executable_path: Path, container_path: Path, mount_letter: str, password: Optional[str] = None, keyfile_path: Optional[Path] = None, mount_table: Optional[MountTable] = None, allocator: Optional[MountPointAllocator] = None, backend: Optional[CommandBackend] = None, instrumentation: Optional[Instrumentation] = None, catalog: Optional["ContainerCatalog"] = None, lock_manager: Optional[LockManager] = None, hash: Optional[str] = None, pim: Optional[int] = None, truecrypt: bool = False, password_cache: Optional["PasswordCache"] = None, journal: Optional[MountJournal] = None, warmer: Optional[PageCacheWarmer] = None):
         """Instantiates a new VeracryptContainer object.
 
         Args:
             veracrypt_executable_path (Path): Path to the Veracrypt executable.
             container_path (Path): Path to the Veracrypt container.
-            mount_letter (str): Mount letter for the Veracrypt container.
+            mount_letter (str): Mount letter or mount directory for the Veracrypt container, or `AUTO_ASSIGN` to reserve a free one when mounting.
             password (Optional[str], optional): Password for the Veracrypt container if there is one. Defaults to None.
             keyfile_path (Optional[Path], optional): Path to the keyfile for the Veracrypt container if there is one. Defaults to None.
+            mount_table (Optional[MountTable], optional): Mount table snapshot used for mount-state checks. Defaults to the shared snapshot.
+            allocator (Optional[MountPointAllocator], optional): Allocator used when the mount letter is `AUTO_ASSIGN`. Defaults to the backend's default allocator, drive letters on Windows.
+            backend (Optional[CommandBackend], optional): Command-line syntax used to drive VeraCrypt. Defaults to the Windows switch syntax.
+            instrumentation (Optional[Instrumentation], optional): Records the timing of each mount and dismount phase. Defaults to the shared, initially disabled, instrumentation.
+            catalog (Optional[ContainerCatalog], optional): Catalog used to skip re-validating unchanged containers and to record mount durations. Defaults to None.
+            lock_manager (Optional[LockManager], optional): Serializes mounts and dismounts of the container and its mount target across tasks and processes. Defaults to None, which does not lock.
+            hash (Optional[str], optional): PRF of the volume header, one of `MOUNT_HASH_ALGORITHMS`. Defaults to the PRF learned from an earlier mount, or to letting VeraCrypt try each one.
+            pim (Optional[int], optional): Personal iterations multiplier of the volume, if not the default. Defaults to None.
+            truecrypt (bool, optional): Whether the container is a TrueCrypt volume. Defaults to False.
+            password_cache (Optional[PasswordCache], optional): Driver password cache to keep the password in and mount from. Defaults to None, which never caches.
+            journal (Optional[MountJournal], optional): Journal each mount and dismount is recorded in, to adopt the mounts after a restart. Defaults to None.
+            warmer (Optional[PageCacheWarmer], optional): Prefetches the files read in the previous session after each mount. Defaults to None, which does not warm.
+
+        Raises:
+            ValueError: If the hash algorithm is unknown.
+            EnvironmentError: If the Veracrypt executable is not found.
         """
         self.executable_path = executable_path
         self.container_path = container_path
         self.mount_letter = mount_letter
         self.password = password
         self.keyfile_path = keyfile_path
+        self.mount_table = mount_table if mount_table is not None else default_mount_table
+        self.allocator = allocator
+        self.backend = backend if backend is not None else WindowsBackend()
+        self.instrumentation = instrumentation if instrumentation is not None else default_instrumentation
+        self.catalog = catalog
+        self.lock_manager = lock_manager
+        self.hash = hash
+        self.pim = pim
+        self.truecrypt = truecrypt
+        self.password_cache = password_cache
+        self.journal = journal
+        self.warmer = warmer
+        
+        #: PRF VeraCrypt reported after the last mount without an explicit hash.
+        self.learned_prf: Optional[str] = None
+        
+        #: Whether the mount target is reserved from the allocator on each mount.
+        self.auto_assign = mount_letter == AUTO_ASSIGN
+        
+        #: Reservation of the automatically assigned mount target, held until dismount.
+        self.mount_reservation: Optional[MountPointReservation] = None
+        
+        #: Whether the next mount command leaves the password out so that VeraCrypt opens the volume from its cache.
+        self.mount_from_cache = False
+        
+        #: Whether the last successful mount was opened from the password cache, or None without a cache.
+        self.last_mount_cache_hit: Optional[bool] = None
+        
+        #: Background prefetch started by the last mount, if a warmer is set.
+        self.warmup_task: Optional[asyncio.Task] = None
+        
+        #: Progress of the last warmup, updated while it runs.
+        self.last_warmup: Optional[WarmupStatistics] = None
+        
+        #: Number of leases currently held on the container.
+        self.lease_count = 0
+        
+        self._lease_lock = asyncio.Lock()
+        self._lease_owns_mount = False
+        self._linger_task: Optional[asyncio.Task] = None
         
         #: Command to mount the Veracrypt container.
         self.subprocess_mount_command: Optional[List[str]] = None
@@ -42,12 +124,89 @@ class VeracryptContainer:
         #: Command to dismount the Veracrypt container.
         self.subprocess_dismount_command: Optional[List[str]] = None
         
+        #: Command to create the Veracrypt container.
+        self.subprocess_create_command: Optional[List[str]] = None
+        
+        #: Called with the container before each mount command is prepared; raising aborts the mount. An awaitable result is awaited, so slow hooks should be coroutines that run their work in a thread.
+        self.pre_mount_hooks: List[Callable[["VeracryptContainer"], Optional[Awaitable[None]]]] = []
+        
+        #: Called with the container after each successful dismount. An awaitable result is awaited.
+        self.post_dismount_hooks: List[Callable[["VeracryptContainer"], Optional[Awaitable[None]]]] = []
+        
+        if self.hash is not None and self.hash not in MOUNT_HASH_ALGORITHMS:
+            raise ValueError(f"Unknown hash algorithm `{self.hash}`, expected one of {', '.join(MOUNT_HASH_ALGORITHMS)}.")
+        
         # Ensures executable exists
         logger.info(f"Checking if Veracrypt executable exists at `{self.executable_path}`.")
         if self.executable_path is None or not (self.executable_path.stat().st_mode & 0o111):
             raise EnvironmentError(f"Veracrypt executable not found at `{self.executable_path}`.")
-        
-    
+
+
+    @property
+    def mount_path(self) -> Path:
+        """Path at which the Veracrypt container is mounted."""
+        return self.backend.mount_path(self.mount_letter)
+
+
+    @property
+    def effective_hash(self) -> Optional[str]:
+        """PRF passed to VeraCrypt: the configured hash, else the one learned from an earlier mount, if any."""
+        if self.hash is not None:
+            return self.hash
+        if self.learned_prf is None and self.catalog is not None:
+            entry = self.catalog.get(self.container_path)
+            if entry is not None:
+                return entry.prf
+        return self.learned_prf
+
+
+    async def _learn_prf(self) -> None:
+        """Asks VeraCrypt which PRF opened the freshly mounted volume and remembers it for the next mounts."""
+        try:
+            with instrumentation.detached():
+                prf = await self.backend.query_prf(self.executable_path, self.container_path)
+        except NotImplementedError:
+            return
+        except RuntimeError as e:
+            logger.warning(f"Unable to query the PRF of container at `{self.container_path}`: {str(e)}")
+            return
+        if prf is None:
+            return
+        logger.info(f"Container at `{self.container_path}` uses PRF `{prf}`, passing it on later mounts.")
+        self.learned_prf = prf
+        if self.catalog is not None:
+            self.catalog.record_prf(self.container_path, prf)
+
+
+    def _forget_prf(self) -> None:
+        """Drops a learned PRF after a failed mount, in case the volume header was re-encrypted with another one."""
+        if self.hash is not None or self.effective_hash is None:
+            return
+        logger.info(f"Forgetting the learned PRF of container at `{self.container_path}` after a failed mount.")
+        self.learned_prf = None
+        if self.catalog is not None:
+            self.catalog.record_prf(self.container_path, None)
+
+
+    def _assign_mount_target(self) -> None:
+        """Reserves a free mount target if the container is set to auto-assign one."""
+        if not self.auto_assign or self.mount_reservation is not None:
+            return
+        if self.allocator is None:
+            self.allocator = self.backend.default_allocator(self.mount_table)
+        self.mount_reservation = self.allocator.reserve()
+        self.mount_letter = self.mount_reservation.target
+
+
+    def _release_mount_target(self) -> None:
+        """Releases the automatically assigned mount target, if any."""
+        if self.mount_reservation is None:
+            return
+        self.mount_reservation.release()
+        self.mount_reservation = None
+        self.mount_letter = AUTO_ASSIGN
+
+
     def prepare_mount_subprocess(self) -> List[str]:
         """Prepares the command to mount the Veracrypt container.
 
@@ -55,56 +214,219 @@ class VeracryptContainer:
             FileNotFoundError: If the Veracrypt container is not found.
             FileNotFoundError: If the Veracrypt keyfile is not found.
             AlreadyMountedError: If the Veracrypt container is already mounted.
+            ValueError: If the mount target is auto-assigned and the backend has no default allocator.
 
         Returns:
             List[str]: Command to mount the Veracrypt container.
         """
         
-        if not self.container_path.exists():
-            raise FileNotFoundError(f"Container at {self.container_path} not found.")
-        if self.keyfile_path and not self.keyfile_path.exists():
-            raise FileNotFoundError(f"Keyfile at {self.keyfile_path} not found.")
+        with instrumentation.phase("validate"):
+            if self.catalog is not None:
+                self.catalog.validate(self.container_path, self.keyfile_path)
+            else:
+                if not self.container_path.exists():
+                    raise FileNotFoundError(f"Container at {self.container_path} not found.")
+                if self.keyfile_path and not self.keyfile_path.exists():
+                    raise FileNotFoundError(f"Keyfile at {self.keyfile_path} not found.")
         
-        if utilities.is_mounted(Path(f"{self.mount_letter}:\\")):
-            raise exceptions.AlreadyMountedError(f"Drive {self.mount_letter} is already mounted.")
+        with instrumentation.phase("probe"):
+            self._assign_mount_target()
+            if utilities.is_mounted(self.mount_path, self.mount_table):
+                raise exceptions.AlreadyMountedError(f"Drive {self.mount_letter} is already mounted.")
 
         logger.info(f"Preparing to mount Veracrypt container at `{self.container_path}`.")
         
         # Command to mount the Veracrypt container
-        command = [
-            self.executable_path,
-            "/volume", self.container_path.absolute(),
-            "/letter", self.mount_letter,
-            "/silent",
-            "/auto",
-            "/quit",
-        ]
-        
-        if self.keyfile_path:
-            command.extend(["/keyfile", self.keyfile_path.absolute()])
-    
-        if self.password:
-            command.extend(["/password", self.password])
-        else:
-            command.append("/tryemptypass")
-        
-        self.subprocess_mount_command = command
+        with instrumentation.phase("build"):
+            self.subprocess_mount_command = self.backend.build_mount_command(self)
         
         return self.subprocess_mount_command
         
         
-    async def mount(self, print_output: bool = True) -> None:
+    async def mount(self, print_output: bool = True, raise_on_error: bool = False, on_output: Optional[Callable[[str, str], None]] = None, timeout: Optional[float] = None) -> None:
         """Mounts the Veracrypt drive.
 
         Args:
             print_output (bool, optional): Whether to print the output to the console. Defaults to True.
+            raise_on_error (bool, optional): Whether to re-raise a failed mount command instead of only logging it. Defaults to False.
+            on_output (Optional[Callable[[str, str], None]], optional): Called with the stream name and each output line while the command runs. Defaults to None.
+            timeout (Optional[float], optional): Seconds after which the mount command and its process group are killed. Defaults to None.
+
+        Raises:
+            CommandTimeoutError: If the mount command times out and `raise_on_error` is set.
+            RuntimeError: If the mount command fails and `raise_on_error` is set.
         """
-        self.prepare_mount_subprocess()
-        logger.info(f"Mounting Veracrypt container at `{self.container_path}`.")
         try:
-            await utilities.run_command(self.subprocess_mount_command, print_output)
-        except RuntimeError as e:
-            logger.error(f"Error running mount command: {str(e)}")
+            await self._coalesce("mount", lambda: self._mount(print_output, on_output, timeout))
+        except RuntimeError:
+            if raise_on_error:
+                raise
+
+
+    async def _mount(self, print_output: bool, on_output: Optional[Callable[[str, str], None]], timeout: Optional[float]) -> None:
+        """Mounts the Veracrypt drive, raising if the mount command fails."""
+        with self.instrumentation.operation("mount", container=str(self.container_path)):
+            async with self._operation_lock():
+                if self.password_cache is not None:
+                    self.mount_from_cache = await self.password_cache.before_mount(self)
+                with instrumentation.phase("validate"):
+                    await self._run_hooks(self.pre_mount_hooks)
+                self.prepare_mount_subprocess()
+                self._journal(MOUNT_INTENT)
+                logger.info(f"Mounting Veracrypt container at `{self.container_path}`.")
+                started_at = time.monotonic()
+                try:
+                    cache_hit = await self._run_mount_command(print_output, on_output, timeout)
+                except asyncio.CancelledError:
+                    # Whether the volume was mounted is unknown; the intent is settled by the next recovery scan
+                    logger.warning(f"Mounting Veracrypt container at `{self.container_path}` was cancelled.")
+                    self.mount_table.invalidate()
+                    self._release_mount_target()
+                    raise
+                except RuntimeError as e:
+                    logger.error(f"Error running mount command: {str(e)}")
+                    instrumentation.annotate(error=type(e).__name__)
+                    self._journal(MOUNT_FAILED)
+                    self.mount_table.invalidate()
+                    self._release_mount_target()
+                    self._forget_prf()
+                    raise
+                else:
+                    self._journal(MOUNTED)
+                    with instrumentation.phase("record"):
+                        self.mount_table.record_mount(self.mount_path, self.container_path)
+                        if self.catalog is not None:
+                            self.catalog.record_mount(self.container_path, time.monotonic() - started_at)
+                    if self.password_cache is not None:
+                        self.last_mount_cache_hit = cache_hit
+                        instrumentation.annotate(cache_hit=cache_hit)
+                        try:
+                            await self.password_cache.record_mount(self, cache_hit)
+                        except RuntimeError as e:
+                            logger.warning(f"Unable to wipe the password cache after mounting container at `{self.container_path}`: {str(e)}")
+                    if self.effective_hash is None:
+                        with instrumentation.phase("learn"):
+                            await self._learn_prf()
+                    if self.warmer is not None:
+                        self._start_warmup()
+
+
+    async def _run_mount_command(self, print_output: bool, on_output: Optional[Callable[[str, str], None]], timeout: Optional[float]) -> bool:
+        """Runs the mount command, retrying with the password if the password cache did not open the volume.
+
+        Returns:
+            bool: Whether the volume was opened from the password cache.
+        """
+        if self.mount_from_cache:
+            try:
+                await utilities.run_command(self.subprocess_mount_command, print_output, on_line=on_output, input=self.backend.mount_input(self), timeout=timeout)
+                return True
+            except RuntimeError as e:
+                if isinstance(e, exceptions.CommandTimeoutError) or not self.password:
+                    raise
+                logger.info(f"Password cache did not open container at `{self.container_path}`, retrying with the password.")
+                self.password_cache.forget(self)
+            finally:
+                self.mount_from_cache = False
+            with instrumentation.phase("build"):
+                self.subprocess_mount_command = self.backend.build_mount_command(self)
+        await utilities.run_command(self.subprocess_mount_command, print_output, on_line=on_output, input=self.backend.mount_input(self), timeout=timeout)
+        return False
+        
+        
+    async def _coalesce(self, operation: str, start: Callable[[], Awaitable[None]]) -> None:
+        """Runs an operation, or attaches to the same operation on the same container file and target if one is already in flight.
+
+        The caller that started the operation owns it, so cancelling that caller cancels the operation; callers that
+        attached only stop waiting. A container whose target is assigned automatically only attaches to its own
+        operations, since another container object would not learn the target assigned to the first.
+
+        Args:
+            operation (str): Name of the operation, such as `mount`.
+            start (Callable[[], Awaitable[None]]): Starts the operation if none is in flight.
+        """
+        loop = asyncio.get_running_loop()
+        target = id(self) if self.auto_assign else str(self.mount_path)
+        key = (loop, operation, self.container_path.absolute(), target)
+        task = _in_flight_operations.get(key)
+        if task is not None:
+            logger.info(f"Attaching to the {operation} of Veracrypt container at `{self.container_path}` already in flight.")
+            return await asyncio.shield(task)
+        task = loop.create_task(start())
+        _in_flight_operations[key] = task
+        task.add_done_callback(lambda _: _in_flight_operations.pop(key, None))
+        return await task
+
+
+    async def cancel_operations(self) -> None:
+        """Cancels every mount or dismount of the container file in flight on the running loop and waits for them to stop."""
+        loop = asyncio.get_running_loop()
+        container_path = self.container_path.absolute()
+        tasks = [task for key, task in _in_flight_operations.items() if key[0] is loop and key[2] == container_path]
+        if not tasks:
+            return
+        logger.info(f"Cancelling {len(tasks)} operations of Veracrypt container at `{self.container_path}` in flight.")
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks)
+
+
+    def _start_warmup(self) -> None:
+        """Starts prefetching the profile of the previous session in the background."""
+        self.last_warmup = WarmupStatistics()
+        self.warmup_task = asyncio.get_running_loop().create_task(self.warmer.warm(self, self.last_warmup))
+
+
+    async def cancel_warmup(self) -> None:
+        """Cancels the warmup started by the last mount, if it is still running, and waits for its workers to stop."""
+        task, self.warmup_task = self.warmup_task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+    def record_access(self, path: Union[str, Path], offset: int = 0, length: int = 0) -> None:
+        """Records a read of a file in the mounted container into the profile warmed after the next mount.
+
+        Does nothing without a warmer. Safe to call from any thread.
+
+        Args:
+            path (Union[str, Path]): Path of the file, absolute or relative to the mount point.
+            offset (int, optional): Offset of the read. Defaults to 0.
+            length (int, optional): Length of the read, 0 for the rest of the file. Defaults to 0.
+        """
+        if self.warmer is not None:
+            self.warmer.record(self, path, offset, length)
+
+
+    async def _run_hooks(self, hooks: List[Callable[["VeracryptContainer"], Optional[Awaitable[None]]]]) -> None:
+        """Calls each hook with the container in order, awaiting the ones that return an awaitable."""
+        for hook in hooks:
+            result = hook(self)
+            if inspect.isawaitable(result):
+                await result
+
+
+    def _journal(self, event: str) -> None:
+        """Appends an event of the container to the mount journal, if one is set."""
+        if self.journal is None:
+            return
+        with instrumentation.phase("journal"):
+            self.journal.append(event, self)
+
+
+    @contextlib.asynccontextmanager
+    async def _operation_lock(self) -> AsyncIterator[None]:
+        """Locks the container and its mount target for a mount or dismount, if a lock manager is set."""
+        if self.lock_manager is None:
+            yield
+            return
+        async with self.lock_manager.lock_container(self):
+            # The snapshot may predate an operation another holder just finished, so the check must rescan
+            self.mount_table.invalidate()
+            yield
         
         
     def prepare_dismount_subprocess(self) -> List[str]:
@@ -117,40 +439,320 @@ class VeracryptContainer:
         Returns:
             List[str]: Command to dismount the Veracrypt container.
         """
-        if not self.container_path.exists():
-            raise FileNotFoundError(f"Container at {self.container_path} not found.")
-        if not utilities.is_mounted(Path(f"{self.mount_letter}:\\")):
-            raise exceptions.AlreadyDismountedError(f"Drive {self.mount_letter} is not mounted.")
+        with instrumentation.phase("validate"):
+            if not self.container_path.exists():
+                raise FileNotFoundError(f"Container at {self.container_path} not found.")
+        with instrumentation.phase("probe"):
+            if not utilities.is_mounted(self.mount_path, self.mount_table):
+                raise exceptions.AlreadyDismountedError(f"Drive {self.mount_letter} is not mounted.")
         
         logger.info(f"Preparing to dismount Veracrypt container at `{self.container_path}`.")
         
         # Command to dismount the Veracrypt container
-        command = [
-            self.executable_path,
-            "/volume", self.container_path.absolute(),
-            "/dismount", self.mount_letter,
-            "/force",
-            "/silent",
-            "/quit",
-        ]
-        
-        self.subprocess_dismount_command = command
+        with instrumentation.phase("build"):
+            self.subprocess_dismount_command = self.backend.build_dismount_command(self)
         
         return self.subprocess_dismount_command
     
     
-    async def dismount(self, print_output: bool = True) -> None:
+    async def dismount(self, print_output: bool = True, raise_on_error: bool = False, on_output: Optional[Callable[[str, str], None]] = None, timeout: Optional[float] = None) -> None:
         """Disounts the Veracrypt drive.
 
         Args:
             print_output (bool, optional): Whether to print the output to the console. Defaults to True.
+            raise_on_error (bool, optional): Whether to re-raise a failed dismount command instead of only logging it. Defaults to False.
+            on_output (Optional[Callable[[str, str], None]], optional): Called with the stream name and each output line while the command runs. Defaults to None.
+            timeout (Optional[float], optional): Seconds after which the dismount command and its process group are killed. Defaults to None.
+
+        Raises:
+            CommandTimeoutError: If the dismount command times out and `raise_on_error` is set.
+            RuntimeError: If the dismount command fails and `raise_on_error` is set.
         """
-        self.prepare_dismount_subprocess()
-        logger.info(f"Dismounting Veracrypt container at `{self.container_path}`.")
         try:
-            await utilities.run_command(self.subprocess_dismount_command, print_output)
-        except RuntimeError as e:
-            logger.error(f"Error running dismount command: {str(e)}")
+            await self._coalesce("dismount", lambda: self._dismount(print_output, on_output, timeout))
+        except RuntimeError:
+            if raise_on_error:
+                raise
+
+
+    async def _dismount(self, print_output: bool, on_output: Optional[Callable[[str, str], None]], timeout: Optional[float]) -> None:
+        """Dismounts the Veracrypt drive, raising if the dismount command fails."""
+        with self.instrumentation.operation("dismount", container=str(self.container_path)):
+            async with self._operation_lock():
+                await self.cancel_warmup()
+                self.prepare_dismount_subprocess()
+                self._journal(DISMOUNT_INTENT)
+                logger.info(f"Dismounting Veracrypt container at `{self.container_path}`.")
+                try:
+                    await utilities.run_command(self.subprocess_dismount_command, print_output, on_line=on_output, timeout=timeout)
+                except asyncio.CancelledError:
+                    logger.warning(f"Dismounting Veracrypt container at `{self.container_path}` was cancelled.")
+                    self.mount_table.invalidate()
+                    raise
+                except RuntimeError as e:
+                    logger.error(f"Error running dismount command: {str(e)}")
+                    instrumentation.annotate(error=type(e).__name__)
+                    self._journal(DISMOUNT_FAILED)
+                    self.mount_table.invalidate()
+                    raise
+                else:
+                    await self.reconcile_dismount()
+
+
+    async def reconcile_dismount(self) -> None:
+        """Records a finished dismount in the journal, the mount table, the allocator, the hooks and the password cache.
+
+        Called by `dismount`, and by whoever dismounted the container by other means, such as `dismount_all`.
+        """
+        self._journal(DISMOUNTED)
+        with instrumentation.phase("record"):
+            self.mount_table.record_dismount(self.mount_path)
+            self._release_mount_target()
+            await self._run_hooks(self.post_dismount_hooks)
+            if self.warmer is not None:
+                self.warmer.end_session(self)
+        if self.password_cache is not None:
+            try:
+                await self.password_cache.record_dismount(self)
+            except RuntimeError as e:
+                logger.warning(f"Unable to wipe the password cache after dismounting container at `{self.container_path}`: {str(e)}")
+
+
+    def prepare_create_subprocess(self, options: CreateOptions) -> List[str]:
+        """Prepares the command to create the Veracrypt container, preallocating its backing file if possible.
+
+        Args:
+            options (CreateOptions): Parameters of the new container.
+
+        Raises:
+            FileExistsError: If a file exists at the container path and `options.overwrite` is not set.
+            FileNotFoundError: If the Veracrypt keyfile is not found.
+
+        Returns:
+            List[str]: Command to create the Veracrypt container.
+        """
+        with instrumentation.phase("validate"):
+            if self.container_path.exists() and not options.overwrite:
+                raise FileExistsError(f"Container at {self.container_path} already exists.")
+            if self.keyfile_path and not self.keyfile_path.exists():
+                raise FileNotFoundError(f"Keyfile at {self.keyfile_path} not found.")
+
+        existed = self.container_path.exists()
+        preallocated = options.preallocate and options.quick_format and self.backend.supports_preallocation
+        if preallocated:
+            with instrumentation.phase("preallocate"):
+                preallocate_file(self.container_path, options.size, sparse=options.dynamic, overwrite=options.overwrite)
+
+        logger.info(f"Preparing to create Veracrypt container at `{self.container_path}`.")
+        
+        # Command to create the Veracrypt container
+        try:
+            with instrumentation.phase("build"):
+                self.subprocess_create_command = self.backend.build_create_command(self, options, preallocated)
+        except BaseException:
+            if preallocated and not existed:
+                self.container_path.unlink(missing_ok=True)  # Leaves no preallocated file without a command to format it
+            raise
+        
+        return self.subprocess_create_command
+
+
+    async def create(self, options: CreateOptions, print_output: bool = True, raise_on_error: bool = False, on_output: Optional[Callable[[str, str], None]] = None, timeout: Optional[float] = None) -> None:
+        """Creates and formats the Veracrypt container.
+
+        Args:
+            options (CreateOptions): Parameters of the new container.
+            print_output (bool, optional): Whether to print the output to the console. Defaults to True.
+            raise_on_error (bool, optional): Whether to re-raise a failed create command instead of only logging it. Defaults to False.
+            on_output (Optional[Callable[[str, str], None]], optional): Called with the stream name and each output line while the command runs. Defaults to None.
+            timeout (Optional[float], optional): Seconds after which the create command and its process group are killed. Defaults to None.
+
+        Raises:
+            CommandTimeoutError: If the create command times out and `raise_on_error` is set.
+            RuntimeError: If the create command fails and `raise_on_error` is set.
+        """
+        with self.instrumentation.operation("create", container=str(self.container_path)):
+            existed = self.container_path.exists()
+            try:
+                self.prepare_create_subprocess(options)
+                logger.info(f"Creating Veracrypt container at `{self.container_path}`.")
+                await utilities.run_command(self.subprocess_create_command, print_output, on_line=on_output, input=self.backend.mount_input(self), timeout=timeout)
+            except BaseException as e:
+                if not existed:
+                    self.container_path.unlink(missing_ok=True)  # Leaves no preallocated or half-formatted container behind
+                if isinstance(e, asyncio.CancelledError):
+                    logger.warning(f"Creating Veracrypt container at `{self.container_path}` was cancelled.")
+                    raise
+                if not isinstance(e, RuntimeError):
+                    raise
+                logger.error(f"Error running create command: {str(e)}")
+                instrumentation.annotate(error=type(e).__name__)
+                if raise_on_error:
+                    raise
+
+
+    def _mounted_path(self, relative_path: Union[str, Path]) -> Path:
+        """Resolves a path inside the mounted container.
+
+        Raises:
+            AlreadyDismountedError: If the Veracrypt container is not mounted.
+        """
+        if self.mount_letter == AUTO_ASSIGN or not utilities.is_mounted(self.mount_path, self.mount_table):
+            raise exceptions.AlreadyDismountedError(f"Container at {self.container_path} is not mounted.")
+        return self.mount_path / relative_path
+
+
+    async def copy_into(self, source: Path, relative_destination: Union[str, Path] = "", workers: int = DEFAULT_WORKERS, verify: bool = False, on_progress: Optional[Callable[[Path, int], None]] = None) -> TransferReport:
+        """Copies a tree into the mounted Veracrypt container. See `transfer.copy_tree`.
+
+        Args:
+            source (Path): Directory to copy.
+            relative_destination (Union[str, Path], optional): Directory inside the container to copy into. Defaults to its root.
+            workers (int, optional): Number of files copied at once. Defaults to DEFAULT_WORKERS.
+            verify (bool, optional): Whether to compare the checksums of each source and copy. Defaults to False.
+            on_progress (Optional[Callable[[Path, int], None]], optional): Called from the workers with each copied file and its size. Defaults to None.
+
+        Raises:
+            AlreadyDismountedError: If the Veracrypt container is not mounted.
+
+        Returns:
+            TransferReport: Counts, throughput and the errors of the files that failed.
+        """
+        destination = self._mounted_path(relative_destination)
+        with self.instrumentation.operation("copy_into", container=str(self.container_path)):
+            return await asyncio.to_thread(copy_tree, source, destination, workers, verify, on_progress)
+
+
+    async def copy_out(self, destination: Path, relative_source: Union[str, Path] = "", workers: int = DEFAULT_WORKERS, verify: bool = False, on_progress: Optional[Callable[[Path, int], None]] = None) -> TransferReport:
+        """Copies a tree out of the mounted Veracrypt container. See `transfer.copy_tree`.
+
+        Args:
+            destination (Path): Directory to copy into.
+            relative_source (Union[str, Path], optional): Directory inside the container to copy. Defaults to its root.
+            workers (int, optional): Number of files copied at once. Defaults to DEFAULT_WORKERS.
+            verify (bool, optional): Whether to compare the checksums of each source and copy. Defaults to False.
+            on_progress (Optional[Callable[[Path, int], None]], optional): Called from the workers with each copied file and its size. Defaults to None.
+
+        Raises:
+            AlreadyDismountedError: If the Veracrypt container is not mounted.
+
+        Returns:
+            TransferReport: Counts, throughput and the errors of the files that failed.
+        """
+        source = self._mounted_path(relative_source)
+        if self.warmer is not None:
+            # Files copied out are read whole, so they are worth warming next time
+            def record_copy(relative_path: Path, size: int, report=on_progress) -> None:
+                self.record_access(Path(relative_source) / relative_path)
+                if report is not None:
+                    report(relative_path, size)
+            on_progress = record_copy
+        with self.instrumentation.operation("copy_out", container=str(self.container_path)):
+            return await asyncio.to_thread(copy_tree, source, destination, workers, verify, on_progress)
+
+
+    @contextlib.asynccontextmanager
+    async def lease(self, linger: Optional[float] = DEFAULT_LEASE_LINGER) -> AsyncIterator["VeracryptContainer"]:
+        """Holds the Veracrypt container mounted for the duration of the context.
+
+        The first lease mounts the container and concurrent leases share that mount. Once the last
+        lease is released the container is dismounted after `linger` seconds, unless a new lease
+        arrives first. A container that was already mounted when leased is never dismounted by its leases.
+
+        Args:
+            linger (Optional[float], optional): Seconds to keep the container mounted after the last release, or None to keep it mounted until `expire_lease` is called. Defaults to DEFAULT_LEASE_LINGER.
+
+        Yields:
+            VeracryptContainer: The mounted container.
+        """
+        await self.acquire_lease()
+        try:
+            yield self
+        finally:
+            await self.release_lease(linger)
+
+
+    async def acquire_lease(self) -> None:
+        """Takes a lease, mounting the container if no lease holds it yet. Prefer `lease`; each call must be paired with `release_lease`.
+
+        Raises:
+            RuntimeError: If the container could not be mounted.
+        """
+        async with self._lease_lock:
+            if self._linger_task is not None:
+                self._linger_task.cancel()
+                self._linger_task = None
+            if self.lease_count == 0 and not self._lease_owns_mount:
+                try:
+                    await self.mount(print_output=False, raise_on_error=True)
+                    self._lease_owns_mount = True
+                except exceptions.AlreadyMountedError:
+                    logger.info(f"Leasing already mounted Veracrypt container at `{self.container_path}`.")
+            self.lease_count += 1
+
+
+    async def release_lease(self, linger: Optional[float] = DEFAULT_LEASE_LINGER) -> None:
+        """Releases a lease taken by `acquire_lease`, scheduling the dismount once no lease is left.
+
+        Args:
+            linger (Optional[float], optional): Seconds to keep the container mounted after the last release, or None to keep it mounted until `expire_lease` is called. Defaults to DEFAULT_LEASE_LINGER.
+
+        Raises:
+            RuntimeError: If the container could not be dismounted without lingering.
+        """
+        async with self._lease_lock:
+            self.lease_count -= 1
+            if self.lease_count > 0 or not self._lease_owns_mount or linger is None:
+                return
+            if linger <= 0:
+                await self._dismount_idle()
+            else:
+                self._linger_task = asyncio.create_task(self._dismount_after(linger))
+
+
+    async def _dismount_after(self, linger: float) -> None:
+        """Dismounts the container after the linger period if it is still unleased.
+
+        Args:
+            linger (float): Seconds to wait before dismounting.
+        """
+        await asyncio.sleep(linger)
+        async with self._lease_lock:
+            self._linger_task = None
+            if self.lease_count == 0 and self._lease_owns_mount:
+                try:
+                    await self._dismount_idle()
+                except RuntimeError:
+                    pass  # Already logged by `dismount`, nobody is left to report it to
+
+
+    async def _dismount_idle(self) -> None:
+        """Dismounts the container that the leases mounted."""
+        self._lease_owns_mount = False
+        try:
+            await self.dismount(print_output=False, raise_on_error=True)
+        except exceptions.AlreadyDismountedError:
+            logger.warning(f"Leased Veracrypt container at `{self.container_path}` was dismounted externally.")
+
+
+    async def expire_lease(self) -> None:
+        """Dismounts a lingering container immediately instead of waiting out its linger period."""
+        async with self._lease_lock:
+            if self._linger_task is not None:
+                self._linger_task.cancel()
+                self._linger_task = None
+            if self.lease_count == 0 and self._lease_owns_mount:
+                await self._dismount_idle()
+
+
+    async def refresh_mount_state(self) -> None:
+        """Asks VeraCrypt which volumes are mounted and records them in the mount table.
+
+        Raises:
+            NotImplementedError: If the backend cannot list mounted volumes.
+        """
+        volumes = await self.backend.list_mounted_volumes(self.executable_path)
+        self.mount_table.update_backing_containers(volumes)
     
     
 # **********
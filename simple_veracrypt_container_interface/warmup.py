@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+This module warms the page cache of a freshly mounted container from the accesses of its previous session.
+
+The first reads after a mount are slow because every block is read and decrypted cold. `PageCacheWarmer` records
+which files, and which ranges of them, a session reads into a per-container `AccessProfile`, saved when the
+container is dismounted. After the next mount it prefetches those ranges in the background, most often read files
+first, with a bounded pool of worker threads: `os.posix_fadvise(POSIX_FADV_WILLNEED)` where the platform has it,
+and plain reads elsewhere. Warming is cancelled before a dismount, and reports the bytes prefetched and the time it
+took.
+
+Profiles hold the paths of files inside the container in the clear, so keep the profile directory on an encrypted
+disk if those names are sensitive.
+
+    warmer = PageCacheWarmer(Path("/var/lib/veracrypt/profiles"))
+    container = VeracryptContainer(executable_path, container_path, "/mnt/data", password="...", warmer=warmer)
+    await container.mount()
+    container.record_access("index/hot.db", 0, 2 ** 20)
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import posixpath
+import concurrent.futures
+from pathlib import Path, PurePosixPath
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# **********
+# Sets up logger
+logger = logging.getLogger(__name__)
+
+#: Default number of files prefetched at once.
+DEFAULT_WARMUP_WORKERS = 4
+
+#: Bytes prefetched per call, which bounds how long a cancelled worker takes to stop.
+WARMUP_CHUNK_SIZE = 8 * 2 ** 20
+
+#: Byte range of a file as offset and length, where a length of 0 reaches the end of the file.
+Range = Tuple[int, int]
+
+# **********
+def normalize_relative_path(path: Union[str, Path]) -> str:
+    """Normalizes the path of a file relative to the mount point.
+
+    Args:
+        path (Union[str, Path]): Relative path of the file.
+
+    Raises:
+        ValueError: If the path is absolute or climbs out of the mount point.
+
+    Returns:
+        str: Normalized POSIX path.
+    """
+    normalized = posixpath.normpath(path.as_posix() if isinstance(path, Path) else str(path))
+    if PurePosixPath(normalized).is_absolute() or normalized == ".." or normalized.startswith("../") or normalized == ".":
+        raise ValueError(f"Path `{path}` is not a file below the mount point.")
+    return normalized
+
+
+def merge_ranges(ranges: Iterable[Range]) -> List[Range]:
+    """Merges overlapping and adjacent ranges.
+
+    Args:
+        ranges (Iterable[Range]): Ranges to merge.
+
+    Returns:
+        List[Range]: Disjoint ranges sorted by offset.
+    """
+    merged: List[List[Optional[int]]] = []
+    for offset, length in sorted(ranges):
+        end = offset + length if length else None
+        if merged and (merged[-1][1] is None or offset <= merged[-1][1]):
+            if merged[-1][1] is not None:
+                merged[-1][1] = None if end is None else max(merged[-1][1], end)
+            continue
+        merged.append([offset, end])
+    return [(start, end - start if end is not None else 0) for start, end in merged]
+
+
+@dataclass
+class AccessProfile:
+    """Files and ranges a session read from a container, in the order they were first read."""
+
+    #: Absolute path of the container.
+    container_path: Path
+
+    #: Ranges read from each file, keyed by its normalized POSIX path relative to the mount point.
+    files: Dict[str, List[Range]] = field(default_factory=dict)
+
+    #: Number of reads recorded of each file, keyed like `files`.
+    reads: Dict[str, int] = field(default_factory=dict)
+
+
+    def record(self, relative_path: str, offset: int = 0, length: int = 0) -> None:
+        """Records a read.
+
+        Args:
+            relative_path (str): POSIX path of the file relative to the mount point.
+            offset (int, optional): Offset of the read. Defaults to 0.
+            length (int, optional): Length of the read, 0 for the rest of the file. Defaults to 0.
+
+        Raises:
+            ValueError: If the range is negative or the path leaves the mount point.
+        """
+        if offset < 0 or length < 0:
+            raise ValueError(f"Invalid range of `{relative_path}`: offset {offset}, length {length}.")
+        relative_path = normalize_relative_path(relative_path)
+        self.files[relative_path] = merge_ranges(self.files.get(relative_path, []) + [(offset, length)])
+        self.reads[relative_path] = self.reads.get(relative_path, 0) + 1
+
+
+    def ranked(self) -> List[Tuple[str, List[Range]]]:
+        """Lists the files by how often they were read, most first, breaking ties by first read.
+
+        Returns:
+            List[Tuple[str, List[Range]]]: Relative paths and ranges of the files.
+        """
+        order = sorted(self.files, key=lambda relative_path: -self.reads.get(relative_path, 1))
+        return [(relative_path, self.files[relative_path]) for relative_path in order]
+
+
+@dataclass
+class WarmupStatistics:
+    """Progress of warming a container, updated while it runs."""
+
+    #: Files whose ranges were all prefetched.
+    files: int = 0
+
+    #: Bytes prefetched.
+    bytes_prefetched: int = 0
+
+    #: Seconds from the start of the warmup until it finished or was cancelled.
+    seconds: float = 0.0
+
+    #: Whether the warmup was cancelled before it finished.
+    cancelled: bool = False
+
+    #: Relative paths of the files that could not be prefetched, with their errors.
+    errors: List[Tuple[str, BaseException]] = field(default_factory=list)
+
+
+def prefetch_file(path: Path, ranges: List[Range], cancelled: threading.Event, budget: Optional[List[int]] = None, lock: Optional[threading.Lock] = None) -> int:
+    """Prefetches ranges of a file into the page cache, chunk by chunk.
+
+    Args:
+        path (Path): File to prefetch.
+        ranges (List[Range]): Ranges to prefetch, clipped to the size of the file.
+        cancelled (threading.Event): Stops the prefetch between chunks once set.
+        budget (Optional[List[int]], optional): Single-item list of the bytes left to prefetch, shared between workers. Defaults to no limit.
+        lock (Optional[threading.Lock], optional): Guards the budget. Required with a budget.
+
+    Returns:
+        int: Bytes prefetched.
+    """
+    prefetched = 0
+    with open(path, "rb") as file:
+        descriptor = file.fileno()
+        size = os.fstat(descriptor).st_size
+        for offset, length in ranges:
+            end = size if not length else min(size, offset + length)
+            while offset < end and not cancelled.is_set():
+                chunk = min(WARMUP_CHUNK_SIZE, end - offset)
+                if budget is not None:
+                    with lock:
+                        chunk = min(chunk, budget[0])
+                        budget[0] -= chunk
+                    if chunk <= 0:
+                        return prefetched
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(descriptor, offset, chunk, os.POSIX_FADV_WILLNEED)
+                else:
+                    file.seek(offset)
+                    chunk = len(file.read(chunk))
+                    if not chunk:
+                        break
+                offset += chunk
+                prefetched += chunk
+    return prefetched
+
+
+# **********
+class PageCacheWarmer:
+    """Records per-container access profiles and prefetches them after each mount."""
+
+    def __init__(self, profile_directory: Path, workers: int = DEFAULT_WARMUP_WORKERS, max_bytes: Optional[int] = None):
+        """Instantiates a new PageCacheWarmer object.
+
+        Args:
+            profile_directory (Path): Directory holding one profile per container, created if missing.
+            workers (int, optional): Files prefetched at once, shared by every container. Defaults to DEFAULT_WARMUP_WORKERS.
+            max_bytes (Optional[int], optional): Most bytes prefetched per mount. Defaults to no limit.
+        """
+        if workers <= 0:
+            raise ValueError(f"Warmup workers must be positive, got {workers}.")
+        self.profile_directory = Path(profile_directory)
+        self.workers = workers
+        self.max_bytes = max_bytes
+
+        self._sessions: Dict[Path, AccessProfile] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+
+    def close(self) -> None:
+        """Stops the worker threads once the prefetches in flight finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+    # **********
+    def profile_path(self, container: "VeracryptContainer") -> Path:
+        """Builds the path of the profile of a container.
+
+        Args:
+            container (VeracryptContainer): Container to build the path for.
+
+        Returns:
+            Path: Path of the profile.
+        """
+        return self._profile_path(container.container_path.absolute())
+
+
+    def _profile_path(self, container_path: Path) -> Path:
+        return self.profile_directory / (hashlib.sha1(str(container_path).encode()).hexdigest() + ".json")
+
+
+    def load_profile(self, container: "VeracryptContainer") -> AccessProfile:
+        """Loads the profile of a container. Files whose paths leave the mount point are dropped.
+
+        Args:
+            container (VeracryptContainer): Container to load the profile of.
+
+        Returns:
+            AccessProfile: The saved profile, or an empty one if there is none or it is unreadable.
+        """
+        profile = AccessProfile(container.container_path.absolute())
+        try:
+            content = json.loads(self.profile_path(container).read_text())
+            files = {relative_path: [tuple(item) for item in ranges] for relative_path, ranges in content["files"].items()}
+            reads = content.get("reads", {})
+        except FileNotFoundError:
+            return profile
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable warmup profile of container at `{container.container_path}`: {e}")
+            return profile
+
+        for relative_path, ranges in files.items():
+            try:
+                key = normalize_relative_path(relative_path)
+            except ValueError as e:
+                logger.warning(f"Ignoring warmup profile entry of container at `{container.container_path}`: {e}")
+                continue
+            profile.files[key] = ranges
+            profile.reads[key] = reads.get(relative_path, 1) if isinstance(reads, dict) else 1
+        return profile
+
+
+    def save_profile(self, profile: AccessProfile) -> None:
+        """Atomically saves a profile, readable only by its owner.
+
+        Args:
+            profile (AccessProfile): Profile to save.
+        """
+        self.profile_directory.mkdir(parents=True, exist_ok=True)
+        path = self._profile_path(profile.container_path)
+        temporary_path = path.with_name(path.name + ".tmp")
+        descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(descriptor, "w") as file:
+            json.dump({"container": str(profile.container_path), "files": profile.files, "reads": profile.reads}, file)
+        os.replace(temporary_path, path)
+
+
+    # **********
+    def record(self, container: "VeracryptContainer", path: Union[str, Path], offset: int = 0, length: int = 0) -> None:
+        """Records a read of the current session of a container. Safe to call from any thread.
+
+        Args:
+            container (VeracryptContainer): Mounted container the file is in.
+            path (Union[str, Path]): Path of the file, absolute or relative to the mount point.
+            offset (int, optional): Offset of the read. Defaults to 0.
+            length (int, optional): Length of the read, 0 for the rest of the file. Defaults to 0.
+
+        Raises:
+            ValueError: If the path is outside the mount point, or the range is negative.
+        """
+        path = Path(path)
+        if path.is_absolute():
+            path = path.relative_to(container.mount_path)
+        relative_path = normalize_relative_path(path)
+        key = container.container_path.absolute()
+        with self._lock:
+            session = self._sessions.setdefault(key, AccessProfile(key))
+            session.record(relative_path, offset, length)
+
+
+    def end_session(self, container: "VeracryptContainer") -> Optional[AccessProfile]:
+        """Ends the session of a container and saves its accesses as the profile warmed after the next mount.
+
+        A session that recorded nothing keeps the previous profile.
+
+        Args:
+            container (VeracryptContainer): Container that was dismounted.
+
+        Returns:
+            Optional[AccessProfile]: The saved profile, or None if the session recorded nothing.
+        """
+        with self._lock:
+            session = self._sessions.pop(container.container_path.absolute(), None)
+        if session is None or not session.files:
+            return None
+        self.save_profile(session)
+        logger.info(f"Saved warmup profile of {len(session.files)} files for container at `{container.container_path}`.")
+        return session
+
+
+    async def warm(self, container: "VeracryptContainer", statistics: Optional[WarmupStatistics] = None) -> WarmupStatistics:
+        """Prefetches the profile of a mounted container into the page cache, most often read files first.
+
+        Cancelling the warmup stops every worker after its current chunk and waits for them before re-raising, so
+        that no file inside the container is held open once it returns.
+
+        Args:
+            container (VeracryptContainer): Mounted container.
+            statistics (Optional[WarmupStatistics], optional): Statistics to update while warming. Defaults to new ones.
+
+        Returns:
+            WarmupStatistics: Files and bytes prefetched and the time it took.
+        """
+        statistics = statistics if statistics is not None else WarmupStatistics()
+        profile = self.load_profile(container)
+        if not profile.files:
+            return statistics
+
+        started_at = time.monotonic()
+        cancelled = threading.Event()
+        budget = [self.max_bytes] if self.max_bytes is not None else None
+        lock = threading.Lock()
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="warmup")
+
+        def warm_one(relative_path: str, ranges: List[Range]) -> None:
+            if cancelled.is_set():
+                return
+            try:
+                prefetched = prefetch_file(container.mount_path / relative_path, ranges, cancelled, budget, lock)
+            except OSError as e:
+                with lock:
+                    statistics.errors.append((relative_path, e))
+                return
+            with lock:
+                statistics.bytes_prefetched += prefetched
+                if not cancelled.is_set():
+                    statistics.files += 1
+
+        logger.info(f"Warming {len(profile.files)} files of container at `{container.container_path}`.")
+        futures = [self._executor.submit(warm_one, relative_path, ranges) for relative_path, ranges in profile.ranked()]
+        try:
+            await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        except asyncio.CancelledError:
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+            await asyncio.to_thread(concurrent.futures.wait, futures)
+            statistics.cancelled = True
+            raise
+        finally:
+            statistics.seconds = time.monotonic() - started_at
+            logger.info(
+                f"{'Cancelled warming' if statistics.cancelled else 'Warmed'} container at `{container.container_path}`: "
+                f"{statistics.files} files, {statistics.bytes_prefetched} bytes in {statistics.seconds:.3f}s."
+            )
+        return statistics
+
+
+# **********
+if __name__ == "__main__":
+    pass
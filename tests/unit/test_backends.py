@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the VeraCrypt command backends.
+"""
+
+import sys
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+import unittest.mock
+from unittest.mock import MagicMock
+
+from simple_veracrypt_container_interface.backends import LinuxTextBackend, WindowsBackend
+from simple_veracrypt_container_interface.creation import CreateOptions
+from simple_veracrypt_container_interface.utilities.instrumentation import Instrumentation, CallbackSink
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# Stand-in for the Linux executable that records its arguments and standard input
+STUB_EXECUTABLE = """\
+#!{python}
+import sys, json
+arguments = sys.argv[1:]
+if "--list" in arguments:
+    print("1: /containers/a b.hc /dev/mapper/veracrypt1 /mnt/a b")
+    sys.exit(0)
+if "--volume-properties" in arguments:
+    print("Slot: 1\\nPKCS-5 PRF: HMAC-SHA-512\\nPKCS-5 Iterations: 500000")
+    sys.exit(0)
+stdin = sys.stdin.read() if "--stdin" in arguments else None
+with open({log!r}, "a") as log:
+    log.write(json.dumps({{"arguments": arguments, "stdin": stdin}}) + "\\n")
+"""
+
+# ****************
+class TestLinuxTextBackend(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        directory = Path(self.temporary_directory.name)
+        self.log_path = directory / "calls.log"
+        self.executable_path = directory / "veracrypt"
+        self.executable_path.write_text(STUB_EXECUTABLE.format(python=sys.executable, log=str(self.log_path)))
+        self.executable_path.chmod(0o755)
+
+        self.container_path = directory / "volume.hc"
+        self.container_path.touch()
+        self.mount_table = MagicMock(spec=MountTable)
+        self.container = VeracryptContainer(
+            self.executable_path, self.container_path, str(directory / "mnt"),
+            password="Password", mount_table=self.mount_table, backend=LinuxTextBackend(),
+        )
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def read_calls(self):
+        return [json.loads(line) for line in self.log_path.read_text().splitlines()]
+
+
+    # ****************
+    # Mount tests
+    def test_mount_passes_password_over_stdin(self):
+        # Arrange
+        self.mount_table.is_mounted.return_value = False
+
+        # Act
+        asyncio.run(self.container.mount(print_output=False, raise_on_error=True))
+
+        # Assert
+        call, = self.read_calls()
+        self.assertEqual(call["arguments"][:3], ["--text", "--non-interactive", "--stdin"])
+        self.assertIn("--mount", call["arguments"])
+        self.assertEqual(call["arguments"][-1], self.container.mount_letter)
+        self.assertNotIn("Password", call["arguments"])
+        self.assertEqual(call["stdin"], "Password\n")
+        self.mount_table.record_mount.assert_called_once_with(Path(self.container.mount_letter), self.container_path)
+
+
+    def test_auto_assigned_mount_uses_directories_below_mount_root(self):
+        # Arrange
+        self.mount_table.is_mounted.return_value = False
+        mount_root = self.container_path.parent / "auto"
+        container = VeracryptContainer(self.executable_path, self.container_path, "auto", password="Password", mount_table=self.mount_table, backend=LinuxTextBackend(mount_root))
+
+        # Act
+        asyncio.run(container.mount(print_output=False, raise_on_error=True))
+
+        # Assert
+        self.assertEqual(container.mount_path, mount_root / "veracrypt1")
+        self.assertEqual(self.read_calls()[0]["arguments"][-1], str(mount_root / "veracrypt1"))
+        container._release_mount_target()
+
+
+    def test_auto_assigned_mount_without_mount_root_is_rejected(self):
+        # Arrange
+        self.mount_table.is_mounted.return_value = False
+        container = VeracryptContainer(self.executable_path, self.container_path, "auto", password="Password", mount_table=self.mount_table, backend=LinuxTextBackend())
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            asyncio.run(container.mount(print_output=False, raise_on_error=True))
+        self.assertFalse(self.log_path.exists())
+
+
+    def test_mount_learns_prf_and_passes_it_on_later_mounts(self):
+        # Arrange
+        self.mount_table.is_mounted.return_value = False
+
+        # Act
+        asyncio.run(self.container.mount(print_output=False, raise_on_error=True))
+        asyncio.run(self.container.mount(print_output=False, raise_on_error=True))
+
+        # Assert
+        first, second = self.read_calls()
+        self.assertEqual(self.container.learned_prf, "sha512")
+        self.assertFalse(any(argument.startswith("--hash") for argument in first["arguments"]))
+        self.assertIn("--hash=SHA-512", second["arguments"])
+
+
+    def test_prf_query_does_not_overwrite_mount_record(self):
+        # Arrange
+        self.mount_table.is_mounted.return_value = False
+        records = []
+        self.container.instrumentation = Instrumentation([CallbackSink(records.append)])
+
+        # Act
+        asyncio.run(self.container.mount(print_output=False, raise_on_error=True))
+
+        # Assert
+        record, = records
+        self.assertEqual((record.exit_code, record.stdout_bytes), (0, 0))
+        self.assertIn("learn", record.phases)
+        self.assertEqual(self.container.learned_prf, "sha512")
+
+
+    def test_mount_passes_explicit_hash_pim_and_truecrypt_mode(self):
+        # Arrange
+        self.mount_table.is_mounted.return_value = False
+        container = VeracryptContainer(
+            self.executable_path, self.container_path, self.container.mount_letter, password="Password",
+            mount_table=self.mount_table, backend=LinuxTextBackend(), hash="ripemd160", pim=7, truecrypt=True,
+        )
+
+        # Act
+        asyncio.run(container.mount(print_output=False, raise_on_error=True))
+
+        # Assert
+        call, = self.read_calls()
+        self.assertIn("--hash=RIPEMD-160", call["arguments"])
+        self.assertIn("--pim=7", call["arguments"])
+        self.assertIn("--truecrypt", call["arguments"])
+        self.assertIsNone(container.learned_prf)
+
+
+    def test_unknown_hash_is_rejected(self):
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            VeracryptContainer(self.executable_path, self.container_path, "auto", hash="md5", backend=LinuxTextBackend())
+
+
+    # ****************
+    # Dismount tests
+    def test_dismount_targets_container_path(self):
+        # Arrange
+        self.mount_table.is_mounted.return_value = True
+
+        # Act
+        asyncio.run(self.container.dismount(print_output=False, raise_on_error=True))
+
+        # Assert
+        call, = self.read_calls()
+        self.assertEqual(call["arguments"], ["--text", "--non-interactive", "--force", "--dismount", str(self.container_path)])
+
+
+    def test_dismount_all_omits_volume(self):
+        # Act
+        command = LinuxTextBackend().build_dismount_all_command(self.executable_path)
+        forced_command = LinuxTextBackend().build_dismount_all_command(self.executable_path, force=True)
+
+        # Assert
+        self.assertEqual(command[1:], ["--text", "--non-interactive", "--dismount"])
+        self.assertEqual(forced_command[1:], ["--text", "--non-interactive", "--force", "--dismount"])
+
+
+    # ****************
+    # Create tests
+    def test_quick_create_preallocates_and_formats_in_place(self):
+        # Arrange
+        container_path = self.container_path.with_name("new.hc")
+        container = VeracryptContainer(self.executable_path, container_path, "auto", password="Password", backend=LinuxTextBackend())
+
+        # Act
+        asyncio.run(container.create(CreateOptions(2 ** 20, hash="sha256", quick=True), print_output=False, raise_on_error=True))
+
+        # Assert
+        call, = self.read_calls()
+        self.assertEqual(container_path.stat().st_size, 2 ** 20)
+        self.assertIn(f"--size={2 ** 20}", call["arguments"])
+        self.assertIn("--hash=SHA-256", call["arguments"])
+        self.assertEqual(call["arguments"][-2:], ["--quick", "--force"])
+        self.assertEqual(call["stdin"], "Password\n")
+
+
+    def test_create_refuses_existing_container(self):
+        # Act & Assert
+        with self.assertRaises(FileExistsError):
+            asyncio.run(self.container.create(CreateOptions(2 ** 20), print_output=False))
+
+
+    # ****************
+    # Listing tests
+    def test_refresh_mount_state_parses_list_output(self):
+        # Act
+        asyncio.run(self.container.refresh_mount_state())
+
+        # Assert
+        self.mount_table.update_backing_containers.assert_called_once_with({Path("/mnt/a b"): Path("/containers/a b.hc")})
+
+
+# ****************
+class TestWindowsBackend(unittest.TestCase):
+
+    def test_mount_path_uses_drive_letters(self):
+        # Assert
+        self.assertEqual(WindowsBackend().mount_path("T"), Path("T:\\"))
+
+
+    def test_dismount_all_omits_drive_letter(self):
+        # Act
+        command = WindowsBackend().build_dismount_all_command(Path("VeraCrypt.exe"))
+        forced_command = WindowsBackend().build_dismount_all_command(Path("VeraCrypt.exe"), force=True)
+
+        # Assert
+        self.assertEqual(command, [Path("VeraCrypt.exe"), "/dismount", "/silent", "/quit"])
+        self.assertEqual(forced_command, [Path("VeraCrypt.exe"), "/dismount", "/force", "/silent", "/quit"])
+
+
+    def test_create_uses_format_executable(self):
+        with unittest.mock.patch('pathlib.Path.stat', return_value=MagicMock(st_mode=0o700)):
+            # Arrange
+            container = VeracryptContainer(Path("C:/VeraCrypt/VeraCrypt.exe"), Path("volume.hc"), "T", password="Password")
+
+            # Act
+            command = WindowsBackend().build_create_command(container, CreateOptions(2 ** 20, dynamic=True), preallocated=False)
+
+        # Assert
+        self.assertEqual(command[0].name, WindowsBackend.FORMAT_EXECUTABLE_NAME)
+        self.assertEqual(command[command.index("/size") + 1], str(2 ** 20))
+        self.assertEqual(command[-2:], ["/dynamic", "/quick"])
+
+
+    def test_mount_passes_learned_prf_as_hash_switch(self):
+        with unittest.mock.patch('pathlib.Path.stat', return_value=MagicMock(st_mode=0o700)):
+            # Arrange
+            container = VeracryptContainer(Path("C:/VeraCrypt/VeraCrypt.exe"), Path("volume.hc"), "T", password="Password", pim=3)
+            container.learned_prf = "blake2s"
+
+            # Act
+            command = WindowsBackend().build_mount_command(container)
+
+        # Assert
+        self.assertEqual(command[command.index("/hash") + 1], "blake2s")
+        self.assertEqual(command[command.index("/pim") + 1], "3")
+
+
+    def test_list_mounted_volumes_is_not_supported(self):
+        # Act & Assert
+        with self.assertRaises(NotImplementedError):
+            asyncio.run(WindowsBackend().list_mounted_volumes(Path("VeraCrypt.exe")))
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
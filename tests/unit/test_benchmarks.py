@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the benchmark suite and its fake VeraCrypt executable.
+"""
+
+import os
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+
+from benchmarks import run_benchmarks
+from benchmarks.fake_veracrypt import scan_fake_mounts
+
+# ****************
+@unittest.skipIf(os.name == "nt", "The fake executable launcher relies on a shebang line.")
+class TestBenchmarks(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.working_directory = Path(self.temporary_directory.name)
+        self.environment_patch = mock.patch.dict(os.environ, {"FAKE_VERACRYPT_LATENCY": "0", "FAKE_VERACRYPT_FAILURE_RATE": "0"})
+        self.environment_patch.start()
+
+    def tearDown(self):
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+
+    # ****************
+    # Benchmark tests
+    def test_benchmark_mounts_and_dismounts_through_fake_executable(self):
+        for backend_name in ("linux", "windows"):
+            with self.subTest(backend=backend_name):
+                # Arrange
+                working_directory = self.working_directory / backend_name
+                working_directory.mkdir()
+
+                # Act
+                mount, dismount = asyncio.run(run_benchmarks.benchmark(3, 2, working_directory, backend_name))
+
+                # Assert
+                self.assertEqual((mount.operation, mount.containers, mount.failures), ("mount", 3, 0))
+                self.assertEqual((dismount.operation, dismount.failures), ("dismount", 0))
+                self.assertEqual(scan_fake_mounts(working_directory / "state"), {})
+
+
+    def test_failure_rate_is_reported(self):
+        # Arrange
+        os.environ["FAKE_VERACRYPT_FAILURE_RATE"] = "1"
+
+        # Act
+        mount, _ = asyncio.run(run_benchmarks.benchmark(2, 2, self.working_directory, "linux"))
+
+        # Assert
+        self.assertEqual(mount.failures, 2)
+
+
+    # ****************
+    # Statistics tests
+    def test_percentile_uses_nearest_rank(self):
+        # Assert
+        self.assertEqual(run_benchmarks.percentile(list(range(1, 101)), 0.5), 50)
+        self.assertEqual(run_benchmarks.percentile(list(range(1, 101)), 0.99), 99)
+        self.assertEqual(run_benchmarks.percentile([], 0.5), 0.0)
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the bulk mount and dismount helpers.
+"""
+
+import os
+import asyncio
+import tempfile
+from pathlib import Path
+from graphlib import CycleError
+
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt, scan_fake_mounts
+from simple_veracrypt_container_interface.backends import LinuxTextBackend, WindowsBackend
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+from simple_veracrypt_container_interface.utilities import exceptions
+from simple_veracrypt_container_interface.journal import MountJournal
+from simple_veracrypt_container_interface.utilities.locks import LockManager
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.bulk_operations import mount_many, dismount_many, dismount_all, mount_graph, dismount_graph, AdaptiveConcurrencyLimiter
+
+# ****************
+class TestBulkOperations(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.order = []
+
+    def make_container(self, fail: bool = False, name: str = None) -> MagicMock:
+        container = MagicMock(spec=VeracryptContainer)
+
+        async def operation(*args, **kwargs):
+            self.order.append(name)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            if fail:
+                raise RuntimeError("Command failed")
+
+        container.mount.side_effect = operation
+        container.dismount.side_effect = operation
+        return container
+
+
+    # ****************
+    # Mount many tests
+    def test_mount_many_respects_concurrency_limit(self):
+        # Arrange
+        containers = [self.make_container() for _ in range(8)]
+
+        # Act
+        report = asyncio.run(mount_many(containers, concurrency=3))
+
+        # Assert
+        self.assertEqual(self.peak_in_flight, 3)
+        self.assertEqual(len(report.succeeded), 8)
+        for container in containers:
+            container.mount.assert_called_once_with(False, raise_on_error=True, timeout=None)
+
+
+    def test_mount_many_reports_failures_per_container(self):
+        # Arrange
+        containers = [self.make_container(), self.make_container(fail=True)]
+
+        # Act
+        report = asyncio.run(mount_many(containers, concurrency=2))
+
+        # Assert
+        self.assertTrue(report.results[0].succeeded)
+        self.assertIsInstance(report.results[1].error, RuntimeError)
+        self.assertEqual(report.failed, [report.results[1]])
+        self.assertGreater(report.wall_clock_seconds, 0)
+
+
+    # ****************
+    # Dismount many tests
+    def test_dismount_many_calls_dismount(self):
+        # Arrange
+        containers = [self.make_container() for _ in range(2)]
+
+        # Act
+        report = asyncio.run(dismount_many(containers, concurrency=1))
+
+        # Assert
+        self.assertEqual(self.peak_in_flight, 1)
+        self.assertEqual(len(report.succeeded), 2)
+        for container in containers:
+            container.dismount.assert_called_once()
+
+
+    # ****************
+    # Dependency graph tests
+    def test_mount_graph_mounts_dependencies_first_and_branches_in_parallel(self):
+        # Arrange
+        containers = {name: self.make_container(name=name) for name in ("outer", "inner", "other")}
+        dependencies = {"inner": {"outer"}}
+
+        # Act
+        report = asyncio.run(mount_graph(containers, dependencies, concurrency=4))
+
+        # Assert
+        self.assertEqual(len(report.succeeded), 3)
+        self.assertLess(self.order.index("outer"), self.order.index("inner"))
+        self.assertEqual(self.peak_in_flight, 2)
+
+
+    def test_dismount_graph_dismounts_dependents_first(self):
+        # Arrange
+        containers = {name: self.make_container(name=name) for name in ("outer", "inner")}
+
+        # Act
+        asyncio.run(dismount_graph(containers, {"inner": {"outer"}}))
+
+        # Assert
+        self.assertEqual(self.order, ["inner", "outer"])
+
+
+    def test_mount_graph_skips_dependents_of_failed_container(self):
+        # Arrange
+        containers = {"outer": self.make_container(fail=True, name="outer"), "inner": self.make_container(name="inner")}
+
+        # Act
+        report = asyncio.run(mount_graph(containers, {"inner": {"outer"}}))
+
+        # Assert
+        self.assertIsInstance(report.results[0].error, RuntimeError)
+        self.assertIsInstance(report.results[1].error, exceptions.DependencyFailedError)
+        containers["inner"].mount.assert_not_called()
+
+
+    def test_mount_graph_rejects_cycles_and_unknown_dependencies(self):
+        # Arrange
+        containers = {name: self.make_container(name=name) for name in ("a", "b")}
+
+        # Act & Assert
+        with self.assertRaises(CycleError):
+            asyncio.run(mount_graph(containers, {"a": {"b"}, "b": {"a"}}))
+        with self.assertRaises(ValueError):
+            asyncio.run(mount_graph(containers, {"a": {"c"}}))
+        with self.assertRaises(ValueError):
+            asyncio.run(dismount_graph(containers, {"a": {"c"}}))
+
+
+    def test_already_mounted_or_dismounted_dependencies_do_not_skip_dependents(self):
+        # Arrange
+        mounted = {"outer": self.make_container(name="outer"), "inner": self.make_container(name="inner")}
+        mounted["outer"].mount.side_effect = exceptions.AlreadyMountedError("Drive O is already mounted.")
+        dismounted = {"outer": self.make_container(name="outer"), "inner": self.make_container(name="inner")}
+        dismounted["inner"].dismount.side_effect = exceptions.AlreadyDismountedError("Drive I is not mounted.")
+
+        # Act
+        mount_report = asyncio.run(mount_graph(mounted, {"inner": {"outer"}}))
+        dismount_report = asyncio.run(dismount_graph(dismounted, {"inner": {"outer"}}))
+
+        # Assert
+        self.assertIsInstance(mount_report.results[0].error, exceptions.AlreadyMountedError)
+        self.assertTrue(mount_report.results[1].succeeded)
+        self.assertIsInstance(dismount_report.results[1].error, exceptions.AlreadyDismountedError)
+        self.assertTrue(dismount_report.results[0].succeeded)
+
+
+    # ****************
+    # Adaptive limiter tests
+    def test_limiter_shrinks_on_slow_operations_and_grows_on_fast_ones(self):
+        async def scenario():
+            limiter = AdaptiveConcurrencyLimiter(4, max_limit=5, target_latency=1.0)
+            await limiter.acquire()
+            await limiter.release(latency=2.0)
+            shrunk = limiter.limit
+            await limiter.acquire()
+            await limiter.release(latency=0.1)
+            return shrunk, limiter.limit
+
+        # Act
+        shrunk, grown = asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(shrunk, 2)
+        self.assertEqual(grown, 3)
+
+
+    def test_limiter_rejects_invalid_limits(self):
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            AdaptiveConcurrencyLimiter(0)
+
+
+# ****************
+@unittest.skipIf(os.name == "nt", "The fake executable launcher relies on a shebang line.")
+class TestDismountAll(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.state_directory = self.directory / "state"
+        self.environment_patch = mock.patch.dict(os.environ, {STATE_DIRECTORY_VARIABLE: str(self.state_directory)})
+        self.environment_patch.start()
+        self.executable_path = install_fake_veracrypt(self.directory)
+        self.mount_table = MountTable(ttl=0, scanner=lambda: scan_fake_mounts(self.state_directory))
+
+    def tearDown(self):
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+    def make_containers(self, count: int, backend=None, lock_manager=None):
+        containers = []
+        for index in range(count):
+            container_path = self.directory / f"volume{index}.hc"
+            container_path.touch()
+            containers.append(VeracryptContainer(
+                self.executable_path, container_path, "ABCDEFGH"[index], password="Password",
+                mount_table=self.mount_table, backend=backend or WindowsBackend(), lock_manager=lock_manager,
+            ))
+        return containers
+
+
+    # ****************
+    # Dismount all tests
+    def test_dismounts_every_container_in_one_invocation(self):
+        # Arrange
+        containers = self.make_containers(3)
+
+        async def scenario():
+            for container in containers:
+                await container.mount(print_output=False, raise_on_error=True)
+            return await dismount_all(containers)
+
+        # Act
+        report = asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(len(report.succeeded), 3)
+        self.assertEqual(report.final_concurrency, 1)
+        self.assertEqual(scan_fake_mounts(self.state_directory), {})
+
+
+    def test_reports_containers_that_stay_mounted(self):
+        # Arrange
+        containers = self.make_containers(2)
+
+        async def scenario():
+            for container in containers:
+                await container.mount(print_output=False, raise_on_error=True)
+            with mock.patch.dict(os.environ, {"FAKE_VERACRYPT_FAILURE_RATE": "1"}):
+                return await dismount_all(containers)
+
+        # Act
+        report = asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(len(report.failed), 2)
+        self.assertTrue(all(isinstance(result.error, RuntimeError) for result in report.failed))
+
+
+    def test_only_mounted_containers_are_reconciled(self):
+        # Arrange
+        mounted, never_mounted = self.make_containers(2)
+
+        async def scenario():
+            await mounted.mount(print_output=False, raise_on_error=True)
+            with mock.patch.object(never_mounted, "reconcile_dismount") as record_dismount:
+                report = await dismount_all([mounted, never_mounted])
+            return report, record_dismount
+
+        # Act
+        report, record_dismount = asyncio.run(scenario())
+
+        # Assert
+        self.assertTrue(report.results[0].succeeded)
+        self.assertIsInstance(report.results[1].error, exceptions.AlreadyDismountedError)
+        record_dismount.assert_not_called()
+
+
+    def test_reconciles_auto_assigned_containers_adopted_from_the_journal(self):
+        # Arrange
+        journal = MountJournal(self.directory / "mounts.journal")
+        container_path = self.directory / "volume.hc"
+        container_path.touch()
+        asyncio.run(VeracryptContainer(self.executable_path, container_path, "auto", password="Password", mount_table=self.mount_table, backend=WindowsBackend(), journal=journal).mount(print_output=False, raise_on_error=True))
+        entry, = journal.recover(self.mount_table).adopted
+        adopted = VeracryptContainer(self.executable_path, container_path, "auto", mount_table=self.mount_table, backend=WindowsBackend(), journal=journal)
+        entry.restore(adopted)
+
+        # Act
+        report = asyncio.run(dismount_all([adopted]))
+
+        # Assert
+        self.assertEqual(len(report.succeeded), 1)
+        self.assertEqual(scan_fake_mounts(self.state_directory), {})
+        self.assertEqual(journal.replay(), {})
+        journal.close()
+
+
+    def test_takes_container_locks_and_cancels_operations_in_flight(self):
+        # Arrange
+        lock_manager = LockManager(self.directory / "locks")
+        containers = self.make_containers(2, lock_manager=lock_manager)
+
+        async def scenario():
+            await containers[0].mount(print_output=False, raise_on_error=True)
+            with mock.patch.dict(os.environ, {"FAKE_VERACRYPT_LATENCY": "5"}):
+                mount = asyncio.create_task(containers[1].mount(print_output=False, raise_on_error=True))
+                await asyncio.sleep(0.2)
+            report = await dismount_all(containers)
+            return report, mount
+
+        # Act
+        report, mount = asyncio.run(scenario())
+
+        # Assert
+        self.assertTrue(mount.cancelled())
+        self.assertTrue(report.results[0].succeeded)
+        self.assertIsInstance(report.results[1].error, exceptions.AlreadyDismountedError)
+        self.assertEqual(lock_manager.statistics["container"].acquisitions, 4)
+        self.assertEqual(scan_fake_mounts(self.state_directory), {})
+
+
+    def test_rejects_mixed_backends(self):
+        # Arrange
+        containers = self.make_containers(1) + self.make_containers(1, backend=LinuxTextBackend())
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            asyncio.run(dismount_all(containers))
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
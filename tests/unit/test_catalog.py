@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the ContainerCatalog class.
+"""
+
+import asyncio
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+
+from simple_veracrypt_container_interface.catalog import ContainerCatalog
+from simple_veracrypt_container_interface.veracrypt_container import AUTO_ASSIGN
+
+# ****************
+class TestContainerCatalog(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.database_path = self.directory / "catalog.sqlite3"
+        self.catalog = ContainerCatalog(self.database_path)
+
+        self.container_path = self.directory / "a.hc"
+        self.container_path.write_bytes(b"\0" * 16)
+        self.keyfile_path = self.directory / "keyfile"
+        self.keyfile_path.touch()
+
+        self.executable_path = self.directory / "veracrypt"
+        self.executable_path.touch()
+        self.executable_path.chmod(0o755)
+
+    def tearDown(self):
+        self.catalog.close()
+        self.temporary_directory.cleanup()
+
+
+    # ****************
+    # Index tests
+    def test_entries_persist_across_instances(self):
+        # Arrange
+        self.catalog.add(self.container_path, self.keyfile_path, "T", tags=["finance", "daily"])
+        self.catalog.close()
+
+        # Act
+        self.catalog = ContainerCatalog(self.database_path)
+        entry = self.catalog.get(self.container_path)
+
+        # Assert
+        self.assertEqual(entry.keyfile_path, self.keyfile_path)
+        self.assertEqual(entry.preferred_mount_point, "T")
+        self.assertEqual(entry.tags, {"finance", "daily"})
+
+
+    def test_prf_persists_and_survives_re_adding(self):
+        # Arrange
+        self.catalog.add(self.container_path)
+        self.catalog.record_prf(self.container_path, "sha256")
+        self.catalog.add(self.container_path, tags=["daily"])
+        self.catalog.close()
+
+        # Act
+        self.catalog = ContainerCatalog(self.database_path)
+
+        # Assert
+        self.assertEqual(self.catalog.get(self.container_path).prf, "sha256")
+
+
+    def test_database_without_prf_column_is_upgraded(self):
+        # Arrange
+        self.catalog.close()
+        database_path = self.directory / "old.sqlite3"
+        connection = sqlite3.connect(str(database_path))
+        connection.execute(
+            "CREATE TABLE containers (container_path TEXT PRIMARY KEY, keyfile_path TEXT, preferred_mount_point TEXT, "
+            "size INTEGER, mtime_ns INTEGER, inode INTEGER, last_mount_seconds REAL)"
+        )
+        connection.execute("INSERT INTO containers VALUES (?, NULL, 'T', NULL, NULL, NULL, 1.5)", (str(self.container_path),))
+        connection.commit()
+        connection.close()
+
+        # Act
+        self.catalog = ContainerCatalog(database_path)
+        self.catalog.record_prf(self.container_path, "sha512")
+
+        # Assert
+        entry = self.catalog.get(self.container_path)
+        self.assertEqual(entry.last_mount_seconds, 1.5)
+        self.assertEqual(entry.prf, "sha512")
+
+
+    def test_find_by_tag(self):
+        # Arrange
+        other_path = self.directory / "b.hc"
+        self.catalog.add_many([(self.container_path, None, None, ["daily"]), (other_path, None, None, ["weekly"])])
+
+        # Act
+        entries = self.catalog.find_by_tag("daily")
+
+        # Assert
+        self.assertEqual([entry.container_path for entry in entries], [self.container_path])
+
+
+    def test_retagging_replaces_tags(self):
+        # Arrange
+        self.catalog.add(self.container_path, tags=["daily"])
+
+        # Act
+        self.catalog.add(self.container_path, tags=["weekly"])
+
+        # Assert
+        self.assertEqual(self.catalog.find_by_tag("daily"), [])
+        self.assertEqual(len(self.catalog.find_by_tag("weekly")), 1)
+
+
+    def test_remove(self):
+        # Arrange
+        self.catalog.add(self.container_path, tags=["daily"])
+
+        # Act
+        self.catalog.remove(self.container_path)
+
+        # Assert
+        self.assertIsNone(self.catalog.get(self.container_path))
+        self.assertEqual(self.catalog.find_by_tag("daily"), [])
+
+
+    # ****************
+    # Validation tests
+    def test_unchanged_fingerprint_is_not_rewritten(self):
+        # Arrange
+        self.catalog.add(self.container_path, self.keyfile_path)
+        self.catalog.validate(self.container_path, self.keyfile_path)
+
+        with mock.patch.object(self.catalog, "_write") as write:
+            # Act
+            self.catalog.validate(self.container_path, self.keyfile_path)
+
+        # Assert
+        write.assert_not_called()
+
+
+    def test_deleted_keyfile_fails_validation_of_unchanged_container(self):
+        # Arrange
+        self.catalog.add(self.container_path, self.keyfile_path)
+        self.catalog.validate(self.container_path, self.keyfile_path)
+        self.keyfile_path.unlink()
+
+        # Act & Assert
+        with self.assertRaises(FileNotFoundError):
+            self.catalog.validate(self.container_path, self.keyfile_path)
+
+
+    def test_changed_container_is_revalidated(self):
+        # Arrange
+        self.catalog.add(self.container_path, self.keyfile_path)
+        self.catalog.validate(self.container_path, self.keyfile_path)
+        self.keyfile_path.unlink()
+        self.container_path.write_bytes(b"\0" * 32)
+
+        # Act & Assert
+        with self.assertRaises(FileNotFoundError):
+            self.catalog.validate(self.container_path, self.keyfile_path)
+
+
+    def test_missing_container_fails_validation(self):
+        # Act & Assert
+        with self.assertRaises(FileNotFoundError):
+            self.catalog.validate(self.directory / "missing.hc")
+
+
+    # ****************
+    # Container tests
+    def test_build_container_mounts_through_catalog(self):
+        # Arrange
+        self.catalog.add(self.container_path, self.keyfile_path, tags=["daily"])
+        mount_table = MagicMock()
+        mount_table.is_mounted.return_value = False
+        container = self.catalog.build_container(self.container_path, self.executable_path, mount_table=mount_table, mount_letter="T")
+
+        with mock.patch('simple_veracrypt_container_interface.utilities.utilities.run_command', return_value=None):
+            # Act
+            asyncio.run(container.mount())
+
+        # Assert
+        entry = self.catalog.get(self.container_path)
+        self.assertEqual(container.keyfile_path, self.keyfile_path)
+        self.assertIsNotNone(entry.fingerprint)
+        self.assertIsNotNone(entry.last_mount_seconds)
+
+
+    def test_build_container_without_preferred_mount_point_auto_assigns(self):
+        # Arrange
+        self.catalog.add(self.container_path)
+
+        # Act
+        container = self.catalog.build_container(self.container_path, self.executable_path)
+
+        # Assert
+        self.assertEqual(container.mount_letter, AUTO_ASSIGN)
+
+
+    def test_container_uses_prf_from_catalog_and_forgets_it_after_failure(self):
+        # Arrange
+        self.catalog.add(self.container_path)
+        self.catalog.record_prf(self.container_path, "sha256")
+        mount_table = MagicMock()
+        mount_table.is_mounted.return_value = False
+        container = self.catalog.build_container(self.container_path, self.executable_path, mount_table=mount_table, mount_letter="T")
+        hash_before = container.effective_hash
+
+        with mock.patch('simple_veracrypt_container_interface.utilities.utilities.run_command', side_effect=RuntimeError("Incorrect password")):
+            # Act
+            asyncio.run(container.mount(print_output=False))
+
+        # Assert
+        self.assertEqual(hash_before, "sha256")
+        self.assertIsNone(self.catalog.get(self.container_path).prf)
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the console script.
+"""
+
+import io
+import os
+import tempfile
+import contextlib
+from pathlib import Path
+
+import unittest
+from unittest import mock
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt, scan_fake_mounts
+from simple_veracrypt_container_interface import cli
+from simple_veracrypt_container_interface.utilities.mount_table import default_mount_table
+
+# ****************
+@unittest.skipIf(os.name == "nt", "The fake executable launcher relies on a shebang line.")
+class TestCli(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.state_directory = self.directory / "state"
+        self.environment_patch = mock.patch.dict(os.environ, {STATE_DIRECTORY_VARIABLE: str(self.state_directory), "CLI_PASSWORD": "Password"})
+        self.environment_patch.start()
+        self.scanner_patch = mock.patch.object(default_mount_table, "scanner", lambda: scan_fake_mounts(self.state_directory))
+        self.scanner_patch.start()
+        default_mount_table.invalidate()
+
+        install_fake_veracrypt(self.directory)
+        containers = []
+        for name, depends_on in (("outer", "[]"), ("inner", '["outer"]'), ("other", "[]")):
+            (self.directory / f"{name}.hc").touch()
+            mount_point = self.directory / "mnt" / name
+            containers.append(
+                f'[[containers]]\nname = "{name}"\npath = "{name}.hc"\nmount_point = "{mount_point}"\n'
+                f'password_env = "CLI_PASSWORD"\ndepends_on = {depends_on}\n'
+            )
+        self.manifest_path = self.directory / "environment.toml"
+        self.manifest_path.write_text('executable = "veracrypt"\nbackend = "linux"\n' + "".join(containers))
+
+    def tearDown(self):
+        self.scanner_patch.stop()
+        default_mount_table.invalidate()
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+    def run_cli(self, *arguments: str):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            exit_code = cli.main(list(arguments))
+        return exit_code, stdout.getvalue(), stderr.getvalue()
+
+
+    # ****************
+    # Command tests
+    def test_plan_prints_dependency_levels(self):
+        # Act
+        exit_code, stdout, _ = self.run_cli("plan", str(self.manifest_path))
+
+        # Assert
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(stdout.splitlines(), ["1: other, outer", "2: inner"])
+
+
+    def test_mount_then_dismount_environment(self):
+        # Act
+        mount_exit_code, mount_stdout, _ = self.run_cli("mount", str(self.manifest_path))
+        mounted = scan_fake_mounts(self.state_directory)
+        dismount_exit_code, _, _ = self.run_cli("dismount", str(self.manifest_path))
+
+        # Assert
+        self.assertEqual(mount_exit_code, 0)
+        self.assertIn("3/3 succeeded", mount_stdout)
+        self.assertEqual(len(mounted), 3)
+        self.assertEqual(dismount_exit_code, 0)
+        self.assertEqual(scan_fake_mounts(self.state_directory), {})
+
+
+    def test_invalid_manifest_exits_with_usage_error(self):
+        # Arrange
+        self.manifest_path.write_text("not toml [")
+
+        # Act
+        exit_code, _, stderr = self.run_cli("mount", str(self.manifest_path))
+
+        # Assert
+        self.assertEqual(exit_code, 2)
+        self.assertIn("Invalid manifest", stderr)
+
+
+    def test_unknown_hash_exits_with_usage_error(self):
+        # Arrange
+        self.manifest_path.write_text(self.manifest_path.read_text() + 'hash = "md5"\n')
+
+        # Act
+        exit_code, _, stderr = self.run_cli("mount", str(self.manifest_path))
+
+        # Assert
+        self.assertEqual(exit_code, 2)
+        self.assertIn("md5", stderr)
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for container creation and backing file preallocation.
+"""
+
+import os
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt
+from simple_veracrypt_container_interface.backends import LinuxTextBackend
+from simple_veracrypt_container_interface.bulk_operations import create_many
+from simple_veracrypt_container_interface.creation import CreateOptions, preallocate_file
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# ****************
+class TestPreallocation(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+
+    # ****************
+    # Preallocation tests
+    def test_preallocated_file_reserves_blocks_and_sparse_file_does_not(self):
+        # Arrange
+        full, sparse = self.directory / "full.hc", self.directory / "sparse.hc"
+
+        # Act
+        preallocate_file(full, 2 ** 22)
+        preallocate_file(sparse, 2 ** 22, sparse=True)
+
+        # Assert
+        self.assertEqual(full.stat().st_size, 2 ** 22)
+        self.assertEqual(sparse.stat().st_size, 2 ** 22)
+        if hasattr(os, "posix_fallocate") and hasattr(full.stat(), "st_blocks"):
+            self.assertGreater(full.stat().st_blocks, sparse.stat().st_blocks)
+
+
+    def test_preallocation_refuses_existing_file_unless_overwriting(self):
+        # Arrange
+        path = self.directory / "volume.hc"
+        path.write_bytes(b"data")
+
+        # Act & Assert
+        with self.assertRaises(FileExistsError):
+            preallocate_file(path, 2 ** 20)
+        preallocate_file(path, 2 ** 20, overwrite=True)
+        self.assertEqual(path.stat().st_size, 2 ** 20)
+
+
+    def test_options_are_validated(self):
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            CreateOptions(0)
+        with self.assertRaises(ValueError):
+            CreateOptions(2 ** 20, hash="md5")
+        self.assertTrue(CreateOptions(2 ** 20, dynamic=True).quick_format)
+
+
+# ****************
+@unittest.skipIf(os.name == "nt", "The fake executable launcher relies on a shebang line.")
+class TestCreateMany(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.environment_patch = mock.patch.dict(os.environ, {STATE_DIRECTORY_VARIABLE: str(self.directory / "state")})
+        self.environment_patch.start()
+        executable_path = install_fake_veracrypt(self.directory)
+        self.containers = [
+            VeracryptContainer(executable_path, self.directory / f"container{index}.hc", "auto", password="Password", backend=LinuxTextBackend())
+            for index in range(4)
+        ]
+
+    def tearDown(self):
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+
+    # ****************
+    # Bulk creation tests
+    def test_create_many_creates_every_container(self):
+        # Act
+        report = asyncio.run(create_many(self.containers, CreateOptions(2 ** 20, quick=True), concurrency=2))
+
+        # Assert
+        self.assertEqual(len(report.succeeded), 4)
+        for container in self.containers:
+            self.assertEqual(container.container_path.stat().st_size, 2 ** 20)
+
+
+    def test_failed_creation_removes_backing_file(self):
+        # Arrange
+        os.environ["FAKE_VERACRYPT_FAILURE_RATE"] = "1"
+
+        # Act
+        report = asyncio.run(create_many(self.containers[:1], CreateOptions(2 ** 20, quick=True)))
+
+        # Assert
+        self.assertEqual(len(report.failed), 1)
+        self.assertFalse(self.containers[0].container_path.exists())
+
+
+    def test_failed_command_build_removes_preallocated_file(self):
+        # Arrange
+        container = self.containers[0]
+
+        # Act
+        with mock.patch.object(LinuxTextBackend, "build_create_command", side_effect=ValueError("Unsupported option.")):
+            with self.assertRaises(ValueError):
+                asyncio.run(container.create(CreateOptions(2 ** 20, quick=True), print_output=False))
+
+        # Assert
+        self.assertFalse(container.container_path.exists())
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
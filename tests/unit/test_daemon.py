@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the mount daemon and its client.
+"""
+
+import os
+import socket
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt, scan_fake_mounts
+from simple_veracrypt_container_interface.backends import LinuxTextBackend
+from simple_veracrypt_container_interface.daemon import MountDaemon, DaemonClient, DaemonRequestError
+from simple_veracrypt_container_interface.utilities import exceptions
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+
+# ****************
+@unittest.skipIf(not hasattr(asyncio, "start_unix_server"), "Unix domain sockets are not available.")
+class TestMountDaemon(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.working_directory = Path(self.temporary_directory.name)
+        self.state_directory = self.working_directory / "state"
+        self.environment_patch = mock.patch.dict(os.environ, {STATE_DIRECTORY_VARIABLE: str(self.state_directory)})
+        self.environment_patch.start()
+
+        self.container_path = self.working_directory / "a.hc"
+        self.container_path.touch()
+        self.mount_point = str(self.working_directory / "mnt" / "a")
+        self.socket_path = self.working_directory / "daemon.sock"
+        self.daemon = MountDaemon(
+            install_fake_veracrypt(self.working_directory),
+            self.socket_path,
+            backend=LinuxTextBackend(),
+            mount_table=MountTable(ttl=0, scanner=lambda: scan_fake_mounts(self.state_directory)),
+            linger=0,
+        )
+
+    def tearDown(self):
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+    async def serve(self, scenario):
+        await self.daemon.start()
+        try:
+            async with DaemonClient(self.socket_path) as client:
+                return await scenario(client)
+        finally:
+            await self.daemon.close()
+
+
+    # ****************
+    # Request tests
+    def test_mount_status_and_dismount(self):
+        # Arrange
+        async def scenario(client):
+            await client.ping()
+            mounted = await client.mount(self.container_path, self.mount_point, password="Password")
+            volumes = await client.status()
+            dismounted = await client.dismount(self.container_path)
+            return mounted, volumes, dismounted
+
+        # Act
+        mounted, volumes, dismounted = asyncio.run(self.serve(scenario))
+
+        # Assert
+        self.assertTrue(mounted["mounted"])
+        self.assertEqual(mounted["mount_point"], self.mount_point)
+        self.assertEqual([volume["container"] for volume in volumes], [str(self.container_path)])
+        self.assertFalse(dismounted["mounted"])
+        self.assertEqual(scan_fake_mounts(self.state_directory), {})
+
+
+    def test_errors_are_raised_as_package_exceptions(self):
+        # Arrange
+        async def scenario(client):
+            with self.assertRaises(exceptions.AlreadyDismountedError):
+                await client.dismount(self.container_path)
+            with self.assertRaises(DaemonRequestError):
+                await client.request("unknown")
+
+        # Act & Assert
+        asyncio.run(self.serve(scenario))
+
+
+    def test_leases_are_released_when_connection_closes(self):
+        # Arrange
+        async def scenario(client):
+            async with DaemonClient(self.socket_path) as other_client:
+                state = await other_client.lease(self.container_path, self.mount_point, password="Password").__aenter__()
+            for _ in range(100):
+                status = await client.status(self.container_path)
+                if not status["mounted"]:
+                    break
+                await asyncio.sleep(0.05)
+            return state, status
+
+        # Act
+        leased, released = asyncio.run(self.serve(scenario))
+
+        # Assert
+        self.assertEqual((leased["mounted"], leased["leases"]), (True, 1))
+        self.assertEqual((released["mounted"], released["leases"]), (False, 0))
+
+
+    def test_socket_is_created_owner_only(self):
+        # Arrange
+        async def scenario(client):
+            return self.socket_path.stat().st_mode & 0o777
+
+        # Act
+        mode = asyncio.run(self.serve(scenario))
+
+        # Assert
+        self.assertEqual(mode, 0o600)
+
+
+    def test_lease_releases_are_serialized_with_other_operations(self):
+        # Arrange
+        exclusive_actions = []
+        exclusive = self.daemon._exclusive
+
+        def recording_exclusive(container):
+            exclusive_actions.append(container.lease_count)
+            return exclusive(container)
+
+        async def scenario(client):
+            async with client.lease(self.container_path, self.mount_point, password="Password"):
+                pass
+            async with DaemonClient(self.socket_path) as other_client:
+                await other_client.lease(self.container_path, self.mount_point, password="Password").__aenter__()
+            for _ in range(100):
+                if len(exclusive_actions) == 4:
+                    break
+                await asyncio.sleep(0.05)
+
+        # Act
+        with mock.patch.object(self.daemon, "_exclusive", side_effect=recording_exclusive):
+            asyncio.run(self.serve(scenario))
+
+        # Assert
+        self.assertEqual(exclusive_actions, [0, 1, 0, 1, 0])
+
+
+    def test_lingering_and_closing_dismounts_are_serialized_with_other_operations(self):
+        # Arrange
+        exclusive_actions = []
+        exclusive = self.daemon._exclusive
+        other_path = self.working_directory / "b.hc"
+        other_path.touch()
+
+        def recording_exclusive(container):
+            exclusive_actions.append((container.container_path.name, container.lease_count))
+            return exclusive(container)
+
+        async def scenario(client):
+            async with client.lease(self.container_path, self.mount_point, password="Password", linger=0.05):
+                pass
+            async with client.lease(other_path, str(self.working_directory / "mnt" / "b"), password="Password", linger=60):
+                pass
+            for _ in range(100):
+                if not (await client.status(self.container_path))["mounted"]:
+                    break
+                await asyncio.sleep(0.05)
+
+        # Act
+        with mock.patch.object(self.daemon, "_exclusive", side_effect=recording_exclusive):
+            asyncio.run(self.serve(scenario))
+
+        # Assert
+        self.assertEqual([lease_count for name, lease_count in exclusive_actions if name == "a.hc"], [0, 1, 0, 0])
+        self.assertEqual([lease_count for name, lease_count in exclusive_actions if name == "b.hc"], [0, 1, 0])
+        self.assertEqual(scan_fake_mounts(self.state_directory), {})
+
+
+    def test_live_socket_is_not_taken_over_but_stale_one_is_replaced(self):
+        # Arrange
+        other_daemon = MountDaemon(self.daemon.executable_path, self.socket_path, backend=LinuxTextBackend())
+
+        async def scenario(client):
+            with self.assertRaises(RuntimeError):
+                await other_daemon.start()
+            await client.ping()
+
+        asyncio.run(self.serve(scenario))
+        stale_socket = socket.socket(socket.AF_UNIX)
+        stale_socket.bind(str(self.socket_path))
+        stale_socket.close()
+
+        # Act & Assert
+        asyncio.run(self.serve(lambda client: client.ping()))
+
+
+    def test_request_with_different_mount_point_or_keyfile_is_rejected(self):
+        # Arrange
+        async def scenario(client):
+            await client.mount(self.container_path, self.mount_point, password="Password")
+            with self.assertRaises(DaemonRequestError):
+                await client.mount(self.container_path, str(self.working_directory / "mnt" / "other"), password="Password")
+            with self.assertRaises(DaemonRequestError):
+                await client.mount(self.container_path, self.mount_point, password="Password", keyfile_path=self.working_directory / "keyfile")
+            await client.dismount(self.container_path)
+
+        # Act & Assert
+        asyncio.run(self.serve(scenario))
+
+
+    def test_concurrent_mounts_of_one_container_are_serialized(self):
+        # Arrange
+        async def scenario(client):
+            return await asyncio.gather(
+                *(client.mount(self.container_path, self.mount_point, password="Password") for _ in range(3)),
+                return_exceptions=True,
+            )
+
+        # Act
+        results = asyncio.run(self.serve(scenario))
+
+        # Assert
+        self.assertEqual(sum(isinstance(result, dict) for result in results), 1)
+        self.assertEqual(sum(isinstance(result, exceptions.AlreadyMountedError) for result in results), 2)
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
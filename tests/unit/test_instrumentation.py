@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the instrumentation module.
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock, PropertyMock
+
+from simple_veracrypt_container_interface.utilities import instrumentation, utilities
+from simple_veracrypt_container_interface.utilities.instrumentation import Instrumentation, CallbackSink, HistogramSink, OperationRecord
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# ****************
+class TestInstrumentation(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.records = []
+        self.instrumentation = Instrumentation([CallbackSink(self.records.append)])
+
+
+    # ****************
+    # Recording tests
+    def test_operation_records_phases_and_outcome(self):
+        # Act
+        with self.instrumentation.operation("mount", container="a.hc"):
+            with instrumentation.phase("validate"):
+                pass
+            instrumentation.annotate(exit_code=0)
+
+        # Assert
+        record, = self.records
+        self.assertEqual(record.operation, "mount")
+        self.assertEqual(record.labels, {"container": "a.hc"})
+        self.assertIn("validate", record.phases)
+        self.assertEqual(record.exit_code, 0)
+        self.assertIsNone(record.error)
+
+
+    def test_operation_records_raised_error(self):
+        # Act
+        with self.assertRaises(ValueError):
+            with self.instrumentation.operation("mount"):
+                raise ValueError()
+
+        # Assert
+        self.assertEqual(self.records[0].error, "ValueError")
+
+
+    def test_disabled_instrumentation_records_nothing(self):
+        # Act
+        with Instrumentation().operation("mount") as recorder:
+            with instrumentation.phase("validate"):
+                instrumentation.annotate(exit_code=0)
+
+        # Assert
+        self.assertIsNone(recorder)
+
+
+    def test_run_command_records_spawn_execute_and_output_size(self):
+        # Act
+        with self.instrumentation.operation("command"):
+            asyncio.run(utilities.run_command([sys.executable, "-c", "print('12345')"], print_output=False))
+
+        # Assert
+        record, = self.records
+        self.assertIn("spawn", record.phases)
+        self.assertIn("execute", record.phases)
+        self.assertEqual(record.exit_code, 0)
+        self.assertGreaterEqual(record.stdout_bytes, 6)
+
+
+    def test_container_mount_records_phases(self):
+        # Arrange
+        executable_path = MagicMock(spec=Path)
+        type(executable_path).stat = PropertyMock(return_value=MagicMock(st_mode=0o700))
+        container = VeracryptContainer(executable_path, Path('/fake/path'), 'Z', mount_table=MagicMock(), instrumentation=self.instrumentation)
+        container.mount_table.is_mounted.return_value = False
+
+        with mock.patch('simple_veracrypt_container_interface.utilities.utilities.run_command', side_effect=RuntimeError("Command failed")), \
+            mock.patch('pathlib.Path.exists', return_value=True):
+            # Act
+            asyncio.run(container.mount())
+
+        # Assert
+        record, = self.records
+        self.assertEqual(list(record.phases), ["validate", "probe", "build"])
+        self.assertEqual(record.error, "RuntimeError")
+
+
+    # ****************
+    # Histogram tests
+    def test_histogram_sink_renders_prometheus_text(self):
+        # Arrange
+        sink = HistogramSink(buckets=(0.1, 1.0))
+        sink.record(OperationRecord("mount", phases={"execute": 0.5}, total_seconds=0.6, stdout_bytes=10))
+        sink.record(OperationRecord("mount", phases={"execute": 2.0}, total_seconds=2.1, error="RuntimeError"))
+
+        # Act
+        text = sink.render_prometheus()
+
+        # Assert
+        self.assertIn('veracrypt_phase_duration_seconds_bucket{operation="mount",phase="execute",le="0.1"} 0', text)
+        self.assertIn('veracrypt_phase_duration_seconds_bucket{operation="mount",phase="execute",le="1.0"} 1', text)
+        self.assertIn('veracrypt_phase_duration_seconds_count{operation="mount",phase="total"} 2', text)
+        self.assertIn('veracrypt_operations_total{operation="mount",outcome="failure"} 1', text)
+        self.assertIn('veracrypt_command_output_bytes_total{operation="mount",stream="stdout"} 10', text)
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
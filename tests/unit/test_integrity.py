@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the IntegrityChecker class.
+"""
+
+import os
+import mmap
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock, PropertyMock
+
+from simple_veracrypt_container_interface.catalog import ContainerCatalog
+from simple_veracrypt_container_interface.integrity import IntegrityChecker
+from simple_veracrypt_container_interface.utilities import exceptions
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+CHUNK_SIZE = mmap.ALLOCATIONGRANULARITY
+
+# ****************
+class TestIntegrityChecker(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.container_path = self.directory / "volume.hc"
+        self.container_path.write_bytes(os.urandom(CHUNK_SIZE * 3 + 100))
+        self.checker = IntegrityChecker(self.directory / "integrity", chunk_size=CHUNK_SIZE, workers=2)
+
+    def tearDown(self):
+        self.checker.close()
+        self.temporary_directory.cleanup()
+
+    def overwrite(self, offset: int, data: bytes) -> None:
+        stat = self.container_path.stat()
+        with open(self.container_path, "r+b") as file:
+            file.seek(offset)
+            file.write(data)
+        os.utime(self.container_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+    # ****************
+    # Verification tests
+    def test_first_verification_records_every_chunk(self):
+        # Act
+        manifest = self.checker.verify(self.container_path)
+
+        # Assert
+        self.assertEqual(len(manifest.chunks), 4)
+        self.assertEqual(self.checker.load_manifest(self.container_path), manifest)
+
+
+    def test_unchanged_fingerprint_skips_hashing(self):
+        # Arrange
+        self.checker.record(self.container_path)
+
+        with mock.patch.object(self.checker, "hash_file") as hash_file:
+            # Act
+            self.checker.verify(self.container_path)
+
+        # Assert
+        hash_file.assert_not_called()
+
+
+    def test_changed_file_reports_changed_chunks(self):
+        # Arrange
+        self.checker.record(self.container_path)
+        with open(self.container_path, "r+b") as file:
+            file.seek(CHUNK_SIZE * 2 + 5)
+            file.write(b"tampered")
+
+        # Act & Assert
+        with self.assertRaises(exceptions.IntegrityError) as context:
+            self.checker.verify(self.container_path)
+        self.assertEqual(context.exception.chunks, [2])
+
+
+    def test_scrub_detects_corruption_behind_unchanged_fingerprint(self):
+        # Arrange
+        self.checker.record(self.container_path)
+        self.overwrite(10, b"bitrot")
+
+        # Act & Assert
+        self.checker.verify(self.container_path)
+        with self.assertRaises(exceptions.IntegrityError) as context:
+            self.checker.verify(self.container_path, scrub=True)
+        self.assertEqual(context.exception.chunks, [0])
+
+
+    def test_sealed_file_is_trusted_without_hashing(self):
+        # Arrange
+        self.checker.seal(self.container_path)
+
+        with mock.patch.object(self.checker, "hash_file") as hash_file:
+            # Act
+            manifest = self.checker.verify(self.container_path)
+
+        # Assert
+        hash_file.assert_not_called()
+        self.assertIsNone(manifest.chunks)
+
+
+    def test_sealed_file_changed_outside_session_is_reported(self):
+        # Arrange
+        self.checker.seal(self.container_path)
+        with open(self.container_path, "ab") as file:
+            file.write(b"appended")
+
+        # Act & Assert
+        with self.assertRaises(exceptions.IntegrityError) as context:
+            self.checker.verify(self.container_path)
+        self.assertEqual(context.exception.chunks, [])
+
+
+    def test_sealing_an_unchanged_file_keeps_its_chunk_hashes_for_scrubs(self):
+        # Arrange
+        self.checker.record(self.container_path)
+        self.checker.seal(self.container_path)
+        self.overwrite(CHUNK_SIZE, b"bitrot")
+
+        # Act & Assert
+        with self.assertRaises(exceptions.IntegrityError) as context:
+            self.checker.verify(self.container_path, scrub=True)
+        self.assertEqual(context.exception.chunks, [1])
+
+
+    def test_scrub_of_file_sealed_without_chunk_hashes_is_unverifiable(self):
+        # Arrange
+        self.checker.seal(self.container_path)
+
+        # Act & Assert
+        with self.assertRaises(exceptions.IntegrityUnverifiableError):
+            self.checker.verify(self.container_path, scrub=True)
+
+
+    def test_hashing_processes_are_not_forked_from_threads(self):
+        # Act
+        self.checker.hash_file(self.container_path)
+
+        # Assert
+        self.assertIn(self.checker._executor._mp_context.get_start_method(), ("forkserver", "spawn"))
+
+
+    def test_invalid_chunk_size_is_rejected(self):
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            IntegrityChecker(self.directory, chunk_size=CHUNK_SIZE + 1)
+
+
+    # ****************
+    # Hook tests
+    def test_pre_mount_hook_aborts_mount_of_tampered_container(self):
+        # Arrange
+        catalog = ContainerCatalog(self.directory / "catalog.sqlite")
+        checker = IntegrityChecker.beside_catalog(catalog, chunk_size=CHUNK_SIZE, workers=1)
+        executable_path = MagicMock(spec=Path)
+        type(executable_path).stat = PropertyMock(return_value=MagicMock(st_mode=0o700))
+        container = VeracryptContainer(executable_path, self.container_path, 'Z', mount_table=MagicMock())
+        container.pre_mount_hooks.append(checker.pre_mount_hook)
+        checker.record(self.container_path)
+        self.container_path.write_bytes(b"replaced")
+
+        # Act & Assert
+        with mock.patch('simple_veracrypt_container_interface.utilities.utilities.run_command') as run_command:
+            with self.assertRaises(exceptions.IntegrityError):
+                asyncio.run(container.mount(print_output=False))
+        run_command.assert_not_called()
+        self.assertTrue((self.directory / "integrity").is_dir())
+        checker.close()
+        catalog.close()
+
+
+    def test_post_dismount_hook_seals_unless_rehash_is_opted_in(self):
+        # Arrange
+        container = MagicMock(container_path=self.container_path)
+        rehashing_checker = IntegrityChecker(self.directory / "rehashed", chunk_size=CHUNK_SIZE, workers=1, rehash_on_dismount=True)
+
+        # Act
+        asyncio.run(self.checker.post_dismount_hook(container))
+        asyncio.run(rehashing_checker.post_dismount_hook(container))
+
+        # Assert
+        self.assertIsNone(self.checker.load_manifest(self.container_path).chunks)
+        self.assertEqual(len(rehashing_checker.load_manifest(self.container_path).chunks), 4)
+        rehashing_checker.close()
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
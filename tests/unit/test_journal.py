@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the crash-safe mount journal.
+"""
+
+import os
+import json
+import stat
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt, scan_fake_mounts
+from simple_veracrypt_container_interface.backends import LinuxTextBackend
+from simple_veracrypt_container_interface.daemon import MountDaemon
+from simple_veracrypt_container_interface.journal import MountJournal, MOUNTED, DISMOUNTED
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# ****************
+@unittest.skipIf(os.name == "nt", "The fake executable launcher relies on a shebang line.")
+class TestMountJournal(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.state_directory = self.directory / "state"
+        self.environment_patch = mock.patch.dict(os.environ, {STATE_DIRECTORY_VARIABLE: str(self.state_directory)})
+        self.environment_patch.start()
+        self.executable_path = install_fake_veracrypt(self.directory)
+        self.journal_path = self.directory / "mounts.journal"
+        self.journal = MountJournal(self.journal_path)
+
+    def tearDown(self):
+        self.journal.close()
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+    def make_mount_table(self):
+        return MountTable(ttl=0, scanner=lambda: scan_fake_mounts(self.state_directory))
+
+    def make_container(self, name: str, mount_table=None, journal=None):
+        container_path = self.directory / f"{name}.hc"
+        container_path.touch()
+        return VeracryptContainer(
+            self.executable_path, container_path, str(self.directory / "mnt" / name), password="Password",
+            mount_table=mount_table or self.make_mount_table(), backend=LinuxTextBackend(), journal=journal or self.journal, pim=7,
+        )
+
+    def read_events(self):
+        return [json.loads(line)["event"] for line in self.journal_path.read_text().splitlines()]
+
+
+    # ****************
+    # Recording tests
+    def test_mount_and_dismount_write_intents_and_completions(self):
+        # Arrange
+        container = self.make_container("a")
+
+        async def scenario():
+            await container.mount(print_output=False, raise_on_error=True)
+            await container.dismount(print_output=False, raise_on_error=True)
+
+        # Act
+        asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(self.read_events(), ["mount_intent", "mounted", "dismount_intent", "dismounted"])
+        self.assertNotIn("Password", self.journal_path.read_text())
+        self.assertEqual(self.journal.replay(), {})
+
+
+    def test_failed_mount_is_not_replayed(self):
+        # Arrange
+        container = self.make_container("a")
+
+        # Act
+        with mock.patch.dict(os.environ, {"FAKE_VERACRYPT_FAILURE_RATE": "1"}):
+            asyncio.run(container.mount(print_output=False))
+
+        # Assert
+        self.assertEqual(self.read_events(), ["mount_intent", "mount_failed"])
+        self.assertEqual(self.journal.replay(), {})
+
+
+    # ****************
+    # Recovery tests
+    def test_restart_adopts_existing_mounts_with_one_scan(self):
+        # Arrange
+        containers = [self.make_container(name) for name in "abc"]
+
+        async def scenario():
+            for container in containers:
+                await container.mount(print_output=False, raise_on_error=True)
+            await containers[1].dismount(print_output=False, raise_on_error=True)
+        asyncio.run(scenario())
+        self.journal.close()
+
+        # Act
+        journal = MountJournal(self.journal_path)
+        mount_table = self.make_mount_table()
+        report = journal.recover(mount_table)
+
+        # Assert
+        self.assertEqual(mount_table.scan_count, 1)
+        self.assertEqual([entry.container_path.name for entry in report.adopted], ["a.hc", "c.hc"])
+        self.assertEqual(report.adopted[0].pim, 7)
+        self.assertEqual(report.discarded, [])
+        self.assertEqual(report.records, 8)
+        self.assertEqual(len(self.journal_path.read_text().splitlines()), 2)
+        self.assertEqual(self.journal_path.stat().st_mode & 0o777, 0o600)
+        journal.close()
+
+
+    def test_adopted_container_dismounts_without_remounting(self):
+        # Arrange
+        asyncio.run(self.make_container("a").mount(print_output=False, raise_on_error=True))
+        journal = MountJournal(self.journal_path)
+        mount_table = self.make_mount_table()
+        entry, = journal.recover(mount_table).adopted
+        container = VeracryptContainer(self.executable_path, entry.container_path, "auto", mount_table=mount_table, backend=LinuxTextBackend(), journal=journal)
+
+        # Act
+        entry.restore(container)
+        asyncio.run(container.dismount(print_output=False, raise_on_error=True))
+
+        # Assert
+        self.assertEqual(container.pim, 7)
+        self.assertEqual(scan_fake_mounts(self.state_directory), {})
+        self.assertEqual(journal.replay(), {})
+        journal.close()
+
+
+    def test_unfinished_intents_are_settled_by_the_scan(self):
+        # Arrange
+        mounted, lost = self.make_container("a"), self.make_container("b")
+        asyncio.run(mounted.mount(print_output=False, raise_on_error=True))
+        self.journal.append("mount_intent", lost)
+        self.journal.append("dismount_intent", mounted)
+
+        # Act
+        report = MountJournal(self.journal_path).recover(self.make_mount_table())
+
+        # Assert
+        self.assertEqual([entry.container_path.name for entry in report.adopted], ["a.hc"])
+        self.assertIsNone(report.adopted[0].pending)
+        self.assertEqual([(entry.container_path.name, entry.pending) for entry in report.discarded], [("b.hc", "mount")])
+
+
+    def test_torn_trailing_record_is_skipped(self):
+        # Arrange
+        asyncio.run(self.make_container("a").mount(print_output=False, raise_on_error=True))
+        with open(self.journal_path, "a") as file:
+            file.write('{"event": "dismou')
+
+        # Act
+        report = MountJournal(self.journal_path).recover(self.make_mount_table())
+
+        # Assert
+        self.assertEqual(len(report.adopted), 1)
+        self.assertEqual(report.torn_records, 1)
+
+
+    @unittest.skipIf(not hasattr(os, "O_DIRECTORY"), "Directories cannot be opened for fsync.")
+    def test_compaction_fsyncs_the_directory_after_replacing_the_file(self):
+        # Arrange
+        synced_directories = []
+        fsync = os.fsync
+
+        def recording_fsync(descriptor):
+            synced_directories.append(stat.S_ISDIR(os.fstat(descriptor).st_mode))
+            fsync(descriptor)
+
+        # Act
+        with mock.patch("os.fsync", side_effect=recording_fsync):
+            self.journal.recover(self.make_mount_table())
+
+        # Assert
+        self.assertEqual(synced_directories, [False, True])
+
+
+    def test_records_after_compaction_are_appended_to_new_file(self):
+        # Arrange
+        container = self.make_container("a")
+        asyncio.run(container.mount(print_output=False, raise_on_error=True))
+
+        # Act
+        self.journal.recover(self.make_mount_table())
+        asyncio.run(container.dismount(print_output=False, raise_on_error=True))
+
+        # Assert
+        self.assertEqual(self.read_events(), [MOUNTED, "dismount_intent", DISMOUNTED])
+
+
+    # ****************
+    # Daemon tests
+    def test_daemon_adopts_mounts_of_previous_instance(self):
+        # Arrange
+        asyncio.run(self.make_container("a").mount(print_output=False, raise_on_error=True))
+        daemon = MountDaemon(self.executable_path, self.directory / "daemon.sock", backend=LinuxTextBackend(), mount_table=self.make_mount_table(), journal=MountJournal(self.journal_path))
+
+        # Act
+        report = daemon.recover()
+        container = daemon.containers[report.adopted[0].container_path]
+
+        # Assert
+        self.assertTrue(daemon._describe(container)["mounted"])
+        self.assertEqual(container.mount_path, self.directory / "mnt" / "a")
+        daemon.journal.close()
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
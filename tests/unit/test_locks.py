@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the cross-process lock manager.
+"""
+
+import os
+import asyncio
+import tempfile
+import concurrent.futures
+from pathlib import Path
+
+import unittest
+from unittest import mock
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt, scan_fake_mounts
+from simple_veracrypt_container_interface.backends import LinuxTextBackend
+from simple_veracrypt_container_interface.utilities import exceptions
+from simple_veracrypt_container_interface.utilities.locks import LockManager, container_lock_key, mount_point_lock_key
+from simple_veracrypt_container_interface.utilities.mount_point_allocator import lock_file_descriptor, unlock_file_descriptor, lock_file_name
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# ****************
+class TestLockManager(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.manager = LockManager(self.directory / "locks")
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+
+    # ****************
+    # Serialization tests
+    def test_tasks_holding_same_key_run_one_at_a_time(self):
+        # Arrange
+        events = []
+
+        async def hold(name):
+            async with self.manager.hold([container_lock_key("volume.hc")]):
+                events.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                events.append(f"{name} end")
+
+        async def run():
+            await asyncio.gather(hold("a"), hold("b"))
+
+        # Act
+        asyncio.run(run())
+
+        # Assert
+        self.assertEqual(events, ["a start", "a end", "b start", "b end"])
+        statistics = self.manager.statistics["container"]
+        self.assertEqual(statistics.acquisitions, 2)
+        self.assertEqual(statistics.contended, 1)
+        self.assertGreater(statistics.max_wait_seconds, 0)
+
+
+    def test_waits_for_lock_file_held_elsewhere(self):
+        # Arrange
+        key = mount_point_lock_key("/mnt/volume")
+        fd = os.open(self.manager.lock_directory / lock_file_name(key), os.O_RDWR | os.O_CREAT, 0o600)
+        self.assertTrue(lock_file_descriptor(fd, blocking=False))
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, unlock_file_descriptor, fd)
+            async with self.manager.hold([key]):
+                pass
+
+        # Act
+        try:
+            asyncio.run(run())
+        finally:
+            os.close(fd)
+
+        # Assert
+        statistics = self.manager.statistics["mount"]
+        self.assertEqual(statistics.contended, 1)
+        self.assertGreaterEqual(statistics.total_wait_seconds, 0.04)
+
+
+    def test_times_out_while_lock_file_is_held(self):
+        # Arrange
+        key = container_lock_key("volume.hc")
+        fd = os.open(self.manager.lock_directory / lock_file_name(key), os.O_RDWR | os.O_CREAT, 0o600)
+        lock_file_descriptor(fd)
+
+        async def run():
+            async with self.manager.hold([key], timeout=0.05):
+                pass
+
+        # Act & Assert
+        try:
+            with self.assertRaises(TimeoutError):
+                asyncio.run(run())
+        finally:
+            os.close(fd)
+        self.assertNotIn("container", self.manager.statistics)
+
+
+# ****************
+@unittest.skipIf(os.name == "nt", "The fake executable launcher relies on a shebang line.")
+class TestContainerLocking(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.state_directory = self.directory / "state"
+        self.environment_patch = mock.patch.dict(os.environ, {STATE_DIRECTORY_VARIABLE: str(self.state_directory), "FAKE_VERACRYPT_LATENCY": "0.1"})
+        self.environment_patch.start()
+        self.executable_path = install_fake_veracrypt(self.directory)
+        self.container_path = self.directory / "volume.hc"
+        self.container_path.touch()
+
+    def tearDown(self):
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+    def make_container(self):
+        # Each container has its own long-lived snapshot and lock manager, as separate processes would
+        mount_table = MountTable(ttl=60, scanner=lambda: scan_fake_mounts(self.state_directory))
+        mount_table.refresh()
+        return VeracryptContainer(
+            self.executable_path, self.container_path, str(self.directory / "mnt"), password="Password",
+            mount_table=mount_table, backend=LinuxTextBackend(), lock_manager=LockManager(self.directory / "locks"),
+        )
+
+
+    # ****************
+    # Mount tests
+    def test_concurrent_mounts_with_stale_snapshots_mount_once(self):
+        # Arrange
+        containers = [self.make_container(), self.make_container()]
+
+        def mount(container):
+            try:
+                asyncio.run(container.mount(print_output=False, raise_on_error=True))
+            except exceptions.AlreadyMountedError as e:
+                return e
+
+        # Act
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(mount, containers))
+
+        # Assert
+        self.assertEqual(sum(isinstance(result, exceptions.AlreadyMountedError) for result in results), 1)
+        self.assertEqual(len(scan_fake_mounts(self.state_directory)), 1)
+        self.assertEqual(sum(container.lock_manager.statistics["container"].contended for container in containers), 1)
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
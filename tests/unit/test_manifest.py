@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the manifest module.
+"""
+
+import os
+import json
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+
+from simple_veracrypt_container_interface.backends import LinuxTextBackend
+from simple_veracrypt_container_interface.manifest import load_manifest, dependency_levels
+
+# ****************
+class TestManifest(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def write_manifest(self, name: str, content: str) -> Path:
+        path = self.directory / name
+        path.write_text(content)
+        return path
+
+
+    # ****************
+    # Loading tests
+    def test_toml_manifest_infers_nesting_dependencies(self):
+        # Arrange
+        path = self.write_manifest("environment.toml", '''
+executable = "/usr/bin/veracrypt"
+backend = "linux"
+
+[[containers]]
+name = "outer"
+path = "outer.hc"
+mount_point = "/mnt/outer"
+
+[[containers]]
+name = "inner"
+path = "/mnt/outer/inner.hc"
+mount_point = "/mnt/inner"
+
+[[containers]]
+name = "keyed"
+path = "keyed.hc"
+mount_point = "/mnt/keyed"
+keyfile = "/mnt/inner/keyed.key"
+
+[[containers]]
+name = "other"
+path = "other.hc"
+depends_on = ["outer"]
+''')
+
+        # Act
+        manifest = load_manifest(path)
+        dependencies = manifest.dependencies()
+
+        # Assert
+        self.assertIsInstance(manifest.backend, LinuxTextBackend)
+        self.assertEqual(manifest.entries["outer"].container_path, self.directory.resolve() / "outer.hc")
+        self.assertEqual(dependencies, {"outer": set(), "inner": {"outer"}, "keyed": {"inner"}, "other": {"outer"}})
+        self.assertEqual(dependency_levels(dependencies), [["outer"], ["inner", "other"], ["keyed"]])
+
+
+    def test_relative_mount_points_are_resolved_against_manifest_directory(self):
+        # Arrange
+        path = self.write_manifest("environment.toml", '''
+executable = "/usr/bin/veracrypt"
+backend = "linux"
+
+[[containers]]
+name = "outer"
+path = "outer.hc"
+mount_point = "mnt/outer"
+
+[[containers]]
+name = "inner"
+path = "mnt/outer/inner.hc"
+mount_point = "mnt/inner"
+
+[[containers]]
+name = "lettered"
+path = "lettered.hc"
+mount_point = "T"
+''')
+
+        # Act
+        manifest = load_manifest(path)
+
+        # Assert
+        self.assertEqual(manifest.entries["outer"].mount_point, str(self.directory.resolve() / "mnt" / "outer"))
+        self.assertEqual(manifest.entries["lettered"].mount_point, "T")
+        self.assertEqual(manifest.dependencies()["inner"], {"outer"})
+
+
+    def test_json_manifest_reads_password_from_environment(self):
+        # Arrange
+        path = self.write_manifest("environment.json", json.dumps({
+            "executable": "/usr/bin/veracrypt",
+            "backend": "linux",
+            "containers": [{"name": "a", "path": "a.hc", "mount_point": "/mnt/a", "password_env": "A_PASSWORD", "hash": "sha256", "pim": 12}],
+        }))
+
+        with mock.patch.dict(os.environ, {"A_PASSWORD": "Password"}), \
+            mock.patch('pathlib.Path.stat', return_value=mock.MagicMock(st_mode=0o700)):
+            # Act
+            containers = load_manifest(path).build_containers()
+
+        # Assert
+        self.assertEqual(containers["a"].password, "Password")
+        self.assertEqual((containers["a"].hash, containers["a"].pim), ("sha256", 12))
+
+
+    def test_invalid_manifests_are_rejected(self):
+        # Arrange
+        duplicate = self.write_manifest("duplicate.toml", 'executable = "v"\n[[containers]]\nname = "a"\npath = "a"\n[[containers]]\nname = "a"\npath = "b"\n')
+        unknown = self.write_manifest("unknown.toml", 'executable = "v"\n[[containers]]\nname = "a"\npath = "a"\ndepends_on = ["b"]\n')
+        missing = self.write_manifest("missing.toml", '[[containers]]\nname = "a"\npath = "a"\n')
+        string_dependency = self.write_manifest("string.toml", 'executable = "v"\n[[containers]]\nname = "a"\npath = "a"\ndepends_on = "b"\n')
+
+        # Act & Assert
+        for path in (duplicate, unknown, missing, string_dependency):
+            with self.subTest(manifest=path.name), self.assertRaises(ValueError):
+                load_manifest(path)
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the MountPointAllocator class.
+"""
+
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock, PropertyMock
+
+from simple_veracrypt_container_interface.utilities.exceptions import NoMountPointAvailableError
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.utilities.mount_point_allocator import MountPointAllocator
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer, AUTO_ASSIGN
+
+# ****************
+class TestMountPointAllocator(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.lock_directory = Path(self.temporary_directory.name) / "locks"
+        self.mount_table = MagicMock(spec=MountTable)
+        self.mount_table.is_mounted.return_value = False
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def make_allocator(self, letters: str = "TUV") -> MountPointAllocator:
+        return MountPointAllocator.for_drive_letters(letters, mount_table=self.mount_table, lock_directory=self.lock_directory)
+
+
+    # ****************
+    # Reservation tests
+    def test_reservations_are_unique(self):
+        # Arrange
+        allocator = self.make_allocator()
+
+        # Act
+        targets = {allocator.reserve().target for _ in range(3)}
+
+        # Assert
+        self.assertEqual(targets, {"T", "U", "V"})
+        with self.assertRaises(NoMountPointAvailableError):
+            allocator.reserve()
+
+
+    def test_released_target_can_be_reserved_again(self):
+        # Arrange
+        allocator = self.make_allocator("T")
+
+        # Act
+        with allocator.reserve():
+            self.assertTrue(allocator.is_reserved("T"))
+        released = not allocator.is_reserved("T")
+        second = allocator.reserve()
+
+        # Assert
+        self.assertTrue(released)
+        self.assertEqual(second.target, "T")
+
+
+    def test_mounted_targets_are_skipped(self):
+        # Arrange
+        self.mount_table.is_mounted.side_effect = lambda path: path == Path("T:\\")
+        allocator = self.make_allocator()
+
+        # Act
+        reservation = allocator.reserve()
+
+        # Assert
+        self.assertEqual(reservation.target, "U")
+
+
+    def test_targets_locked_by_another_allocator_are_skipped(self):
+        # Arrange
+        other_process_allocator = self.make_allocator()
+        allocator = self.make_allocator()
+        other_process_allocator.reserve()
+
+        # Act
+        reservation = allocator.reserve()
+
+        # Assert
+        self.assertEqual(reservation.target, "U")
+
+
+    def test_directory_targets_are_created(self):
+        # Arrange
+        base_directory = Path(self.temporary_directory.name) / "mounts"
+        allocator = MountPointAllocator.for_directories(base_directory, 2, mount_table=self.mount_table, lock_directory=self.lock_directory)
+
+        # Act
+        reservation = allocator.reserve()
+
+        # Assert
+        self.assertEqual(Path(reservation.target), base_directory / "veracrypt1")
+        self.assertTrue(Path(reservation.target).is_dir())
+
+
+    # ****************
+    # Auto-assign tests
+    def test_container_auto_assigns_and_releases_target(self):
+        # Arrange
+        executable_path = MagicMock(spec=Path)
+        type(executable_path).stat = PropertyMock(return_value=MagicMock(st_mode=0o700))
+        allocator = self.make_allocator()
+        container = VeracryptContainer(executable_path, Path('/fake/path'), AUTO_ASSIGN, mount_table=self.mount_table, allocator=allocator)
+
+        with mock.patch('simple_veracrypt_container_interface.utilities.utilities.run_command', return_value=None), \
+            mock.patch('pathlib.Path.exists', return_value=True):
+            # Act
+            asyncio.run(container.mount())
+            assigned_letter = container.mount_letter
+            self.mount_table.is_mounted.return_value = True
+            asyncio.run(container.dismount())
+
+        # Assert
+        self.assertEqual(assigned_letter, "T")
+        self.assertEqual(container.mount_letter, AUTO_ASSIGN)
+        self.assertFalse(allocator.is_reserved("T"))
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
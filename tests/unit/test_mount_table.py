@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the MountTable class.
+"""
+
+from pathlib import Path
+
+import unittest
+from unittest import mock
+
+from simple_veracrypt_container_interface.utilities import mount_table
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable, MountEntry, parse_mountinfo
+
+MOUNTINFO = """\
+23 28 0:22 / /proc rw,relatime - proc proc rw
+61 28 253:0 / /mnt/secure\\040volume rw,relatime - ext4 /dev/mapper/veracrypt1 rw
+62 28 253:1 / /mnt/other rw,relatime shared:5 - exfat /dev/mapper/veracrypt2 rw
+"""
+
+# ****************
+class TestMountTable(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.entries = parse_mountinfo(MOUNTINFO)
+        self.scan_patch = mock.patch.object(mount_table, 'scan_mount_table', side_effect=lambda: dict(self.entries))
+        self.mock_scan = self.scan_patch.start()
+        self.table = MountTable(ttl=60)
+
+    def tearDown(self):
+        self.scan_patch.stop()
+
+
+    # ****************
+    # Parsing tests
+    def test_parse_mountinfo_decodes_entries(self):
+        # Assert
+        self.assertEqual(self.entries["/mnt/secure volume"], MountEntry("/mnt/secure volume", "/dev/mapper/veracrypt1", "ext4"))
+        self.assertEqual(self.entries["/mnt/other"].fstype, "exfat")
+
+
+    # ****************
+    # Query tests
+    def test_queries_share_one_scan(self):
+        # Act
+        for _ in range(100):
+            self.assertTrue(self.table.is_mounted(Path("/mnt/other/")))
+            self.assertFalse(self.table.is_mounted(Path("/mnt/missing")))
+
+        # Assert
+        self.assertEqual(self.mock_scan.call_count, 1)
+
+
+    def test_available_drive_letters_excludes_used_letters(self):
+        # Arrange
+        self.entries = {"C:\\": MountEntry("C:\\"), "T:\\": MountEntry("T:\\")}
+
+        # Act
+        letters = self.table.available_drive_letters()
+
+        # Assert
+        self.assertNotIn("C", letters)
+        self.assertNotIn("T", letters)
+        self.assertEqual(len(letters), 24)
+
+
+    def test_record_mount_invalidates_and_tracks_backing_container(self):
+        # Arrange
+        self.table.refresh()
+        self.entries["/mnt/new"] = MountEntry("/mnt/new")
+
+        # Act
+        self.table.record_mount("/mnt/new", Path("/containers/a.hc"))
+
+        # Assert
+        self.assertTrue(self.table.is_mounted("/mnt/new"))
+        self.assertEqual(self.table.backing_container("/mnt/new"), Path("/containers/a.hc"))
+        self.assertEqual(self.mock_scan.call_count, 2)
+
+
+    def test_record_dismount_forgets_backing_container(self):
+        # Arrange
+        self.table.record_mount("/mnt/other", Path("/containers/b.hc"))
+        del self.entries["/mnt/other"]
+
+        # Act
+        self.table.record_dismount("/mnt/other")
+
+        # Assert
+        self.assertFalse(self.table.is_mounted("/mnt/other"))
+        self.assertIsNone(self.table.backing_container("/mnt/other"))
+
+
+    def test_expired_snapshot_is_rescanned(self):
+        # Arrange
+        table = MountTable(ttl=0)
+
+        # Act
+        table.is_mounted("/mnt/other")
+        table.is_mounted("/mnt/other")
+
+        # Assert
+        self.assertEqual(self.mock_scan.call_count, 2)
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the MountWatcher class.
+"""
+
+import select
+import asyncio
+from pathlib import Path
+
+import unittest
+
+from simple_veracrypt_container_interface.utilities.mount_table import MountEntry, MountTable, MOUNTINFO_PATH
+from simple_veracrypt_container_interface.utilities.mount_watcher import MountWatcher, MOUNTED, DISMOUNTED
+
+# ****************
+class TestMountWatcher(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.mounts = {}
+        self.mount_table = MountTable(scanner=lambda: dict(self.mounts))
+
+    def mount(self, mount_point: str) -> None:
+        self.mounts[mount_point] = MountEntry(mount_point, "/dev/mapper/veracrypt1", "ext4")
+
+
+    # ****************
+    # Waiting tests
+    def test_wait_mounted_wakes_when_mount_appears(self):
+        async def scenario():
+            async with MountWatcher(self.mount_table, poll_interval=0.01) as watcher:
+                waiter = asyncio.create_task(watcher.wait_mounted("/mnt/a", timeout=5))
+                await asyncio.sleep(0.05)
+                self.assertFalse(waiter.done())
+                self.mount("/mnt/a")
+                return await waiter
+
+        # Act
+        entry = asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(entry.mount_point, "/mnt/a")
+
+
+    def test_wait_dismounted_returns_immediately_when_not_mounted(self):
+        async def scenario():
+            async with MountWatcher(self.mount_table, poll_interval=10) as watcher:
+                await watcher.wait_dismounted("/mnt/a", timeout=1)
+
+        # Act & Assert
+        asyncio.run(scenario())
+
+
+    def test_wait_mounted_times_out(self):
+        async def scenario():
+            async with MountWatcher(self.mount_table, poll_interval=0.01) as watcher:
+                await watcher.wait_mounted("/mnt/a", timeout=0.05)
+
+        # Act & Assert
+        with self.assertRaises(TimeoutError):
+            asyncio.run(scenario())
+
+
+    # ****************
+    # Event tests
+    def test_events_stream_mounts_and_dismounts(self):
+        async def scenario():
+            events = []
+            async with MountWatcher(self.mount_table, poll_interval=0.01) as watcher:
+                self.mount_table.record_mount("/mnt/a", Path("/data/a.hc"))
+                stream = watcher.events()
+                reader = asyncio.create_task(anext(stream))
+                await asyncio.sleep(0)
+                self.mount("/mnt/a")
+                events.append(await reader)
+                del self.mounts["/mnt/a"]
+                events.append(await anext(stream))
+                await stream.aclose()
+            return events
+
+        # Act
+        mounted, dismounted = asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual((mounted.kind, mounted.mount_point, mounted.container_path), (MOUNTED, "/mnt/a", Path("/data/a.hc")))
+        self.assertEqual((dismounted.kind, dismounted.mount_point, dismounted.container_path), (DISMOUNTED, "/mnt/a", Path("/data/a.hc")))
+
+
+    def test_dismount_event_keeps_container_recorded_as_dismounted(self):
+        async def scenario():
+            async with MountWatcher(self.mount_table, poll_interval=10) as watcher:
+                self.mount("/mnt/a")
+                self.mount_table.record_mount("/mnt/a", Path("/data/a.hc"))
+                watcher.rescan()
+                del self.mounts["/mnt/a"]
+                self.mount_table.record_dismount("/mnt/a")
+                return watcher.rescan()
+
+        # Act
+        dismounted, = asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual((dismounted.kind, dismounted.container_path), (DISMOUNTED, Path("/data/a.hc")))
+
+
+    def test_waiter_notifications_are_tracked_until_done(self):
+        async def scenario():
+            async with MountWatcher(self.mount_table, poll_interval=10) as watcher:
+                self.mount("/mnt/a")
+                watcher.rescan()
+                pending = set(watcher._notifications)
+                await watcher.wait_mounted("/mnt/a", timeout=1)
+                await asyncio.sleep(0)
+                return pending, watcher._notifications
+
+        # Act
+        pending, remaining = asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(remaining, set())
+
+
+    @unittest.skipIf(not hasattr(select, "epoll") or not MOUNTINFO_PATH.exists(), "Mount table notifications are Linux only.")
+    def test_kernel_notifications_are_used_for_the_os_mount_table(self):
+        async def scenario():
+            async with MountWatcher(MountTable()) as watcher:
+                return watcher.notifications_enabled
+
+        # Act & Assert
+        self.assertTrue(asyncio.run(scenario()))
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
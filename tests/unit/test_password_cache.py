@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the driver password cache.
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt, scan_fake_mounts
+from simple_veracrypt_container_interface.backends import LinuxTextBackend, WindowsBackend
+from simple_veracrypt_container_interface.password_cache import PasswordCache, PasswordCachePolicy
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# ****************
+@unittest.skipIf(os.name == "nt", "The fake executable launcher relies on a shebang line.")
+class TestPasswordCache(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.state_directory = self.directory / "state"
+        self.environment_patch = mock.patch.dict(os.environ, {STATE_DIRECTORY_VARIABLE: str(self.state_directory)})
+        self.environment_patch.start()
+        self.executable_path = install_fake_veracrypt(self.directory)
+        self.container_path = self.directory / "volume.hc"
+        self.container_path.touch()
+        self.mount_table = MountTable(ttl=0, scanner=lambda: scan_fake_mounts(self.state_directory))
+
+    def tearDown(self):
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+    def make_container(self, policy: PasswordCachePolicy = PasswordCachePolicy()):
+        self.cache = PasswordCache(self.executable_path, WindowsBackend(), policy)
+        return VeracryptContainer(
+            self.executable_path, self.container_path, "T", password="Password",
+            mount_table=self.mount_table, backend=WindowsBackend(), password_cache=self.cache,
+        )
+
+    def cycle(self, container, times: int):
+        async def run():
+            hits = []
+            for _ in range(times):
+                await container.mount(print_output=False, raise_on_error=True)
+                hits.append(container.last_mount_cache_hit)
+                await container.dismount(print_output=False, raise_on_error=True)
+            return hits
+        return asyncio.run(run())
+
+
+    # ****************
+    # Mount tests
+    def test_repeat_mounts_are_opened_from_cache(self):
+        # Arrange
+        container = self.make_container()
+
+        # Act
+        hits = self.cycle(container, 3)
+
+        # Assert
+        self.assertEqual(hits, [False, True, True])
+        self.assertEqual((self.cache.statistics.hits, self.cache.statistics.misses), (2, 1))
+
+
+    def test_mount_retries_with_password_when_cache_was_wiped_elsewhere(self):
+        # Arrange
+        container = self.make_container()
+        self.cycle(container, 1)
+        (self.state_directory / "password_cache.txt").unlink()
+
+        # Act
+        hits = self.cycle(container, 1)
+
+        # Assert
+        self.assertEqual(hits, [False])
+        self.assertTrue(self.cache.is_cached(container))
+
+
+    # ****************
+    # Policy tests
+    def test_wipes_after_last_dismount(self):
+        # Arrange
+        container = self.make_container(PasswordCachePolicy(wipe_on_last_dismount=True))
+
+        # Act
+        hits = self.cycle(container, 2)
+
+        # Assert
+        self.assertEqual(hits, [False, False])
+        self.assertEqual(self.cache.statistics.wipes, 2)
+        self.assertFalse((self.state_directory / "password_cache.txt").exists())
+
+
+    def test_wipes_after_max_mounts(self):
+        # Arrange
+        container = self.make_container(PasswordCachePolicy(max_mounts=2))
+
+        # Act
+        hits = self.cycle(container, 4)
+
+        # Assert
+        self.assertEqual(hits, [False, True, True, False])
+        self.assertEqual(self.cache.statistics.wipes, 1)
+
+
+    def test_failed_wipe_after_mount_leaves_mount_recorded(self):
+        # Arrange
+        container = self.make_container(PasswordCachePolicy(max_mounts=1))
+        self.cycle(container, 1)
+
+        # Act
+        with mock.patch.object(self.cache, "wipe", side_effect=RuntimeError("Wipe failed")) as wipe:
+            asyncio.run(container.mount(print_output=False, raise_on_error=True))
+
+        # Assert
+        wipe.assert_called_once()
+        self.assertTrue(container.last_mount_cache_hit)
+        self.assertEqual(self.mount_table.backing_container(container.mount_path), self.container_path)
+        asyncio.run(container.dismount(print_output=False, raise_on_error=True))
+
+
+    def test_wipes_once_ttl_expires(self):
+        # Arrange
+        container = self.make_container(PasswordCachePolicy(ttl=0.05))
+        self.cycle(container, 1)
+        time.sleep(0.06)
+
+        # Act
+        hits = self.cycle(container, 1)
+
+        # Assert
+        self.assertEqual(hits, [False])
+        self.assertEqual(self.cache.statistics.wipes, 1)
+
+
+    def test_backend_without_cache_is_rejected(self):
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            PasswordCache(self.executable_path, LinuxTextBackend())
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
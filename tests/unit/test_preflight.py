@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the volume header pre-flight.
+"""
+
+import os
+import zlib
+import struct
+import asyncio
+import hashlib
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+
+from simple_veracrypt_container_interface import preflight
+from simple_veracrypt_container_interface.bulk_operations import mount_many
+from simple_veracrypt_container_interface.preflight import HeaderVerifier, apply_keyfiles, iteration_count
+from simple_veracrypt_container_interface.utilities import exceptions
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:
+    Cipher = None
+
+PIM = 1
+
+
+def build_header(secret: bytes, hash_name: str, iterations: int, magic: bytes = b"VERA") -> bytes:
+    """Builds an encrypted AES volume header for a password with the keyfiles applied."""
+    salt = os.urandom(preflight.SALT_SIZE)
+    plain = bytearray(448)
+    plain[:4] = magic
+    plain[192:] = os.urandom(256)
+    struct.pack_into(">I", plain, 8, zlib.crc32(plain[192:]))
+    struct.pack_into(">I", plain, 188, zlib.crc32(plain[:188]))
+    key = hashlib.pbkdf2_hmac(hash_name, secret, salt, iterations, 64)
+    encryptor = Cipher(algorithms.AES(key), modes.XTS(bytes(16))).encryptor()
+    return salt + encryptor.update(bytes(plain)) + encryptor.finalize()
+
+
+# ****************
+class TestKeyDerivationInputs(unittest.TestCase):
+
+    def test_iteration_count_applies_pim(self):
+        # Assert
+        self.assertEqual(iteration_count(None), 500000)
+        self.assertEqual(iteration_count(5), 20000)
+
+
+    def test_keyfile_adds_running_crc_bytes_to_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Arrange
+            keyfile_path = Path(directory) / "keyfile"
+            keyfile_path.write_bytes(b"a")
+
+            # Act
+            mixed = apply_keyfiles(b"\x01", [keyfile_path])
+
+        # Assert
+        self.assertEqual(mixed[:4], bytes([0x18, 0x48, 0x41, 0xBC]))  # ~crc32(b"a") == 0x174841BC, plus the password byte
+        self.assertEqual(mixed[4:], bytes(60))
+
+
+    def test_password_is_unchanged_without_keyfiles(self):
+        # Assert
+        self.assertEqual(apply_keyfiles(b"Password", []), b"Password")
+
+
+# ****************
+@unittest.skipIf(Cipher is None, "Header decryption needs the optional `cryptography` package.")
+class TestHeaderVerifier(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.container_path = self.directory / "volume.hc"
+        self.verifier = HeaderVerifier(workers=2)
+
+    def tearDown(self):
+        self.verifier.close()
+        self.temporary_directory.cleanup()
+
+    def write_volume(self, secret: bytes, hash_name: str = "sha256", path=None):
+        path = path or self.container_path
+        path.write_bytes(build_header(secret, hash_name, iteration_count(PIM)) + bytes(1024))
+        return path
+
+
+    # ****************
+    # Verification tests
+    def test_reports_matching_prf(self):
+        # Arrange
+        self.write_volume(b"Password")
+
+        # Act
+        result = self.verifier.verify(self.container_path, "Password", pim=PIM)
+
+        # Assert
+        self.assertTrue(result.opened)
+        self.assertEqual(result.prf, "sha256")
+        self.assertFalse(result.hidden)
+
+
+    def test_wrong_password_is_unknown_unless_volumes_use_aes(self):
+        # Arrange
+        self.write_volume(b"Password")
+        aes_verifier = HeaderVerifier(workers=1, assume_aes=True)
+
+        # Act
+        result = self.verifier.verify(self.container_path, "Wrong", pim=PIM, hash="sha256")
+        aes_result = aes_verifier.verify(self.container_path, "Wrong", pim=PIM, hash="sha256")
+
+        # Assert
+        self.assertIsNone(result.opened)
+        self.assertIsNone(result.prf)
+        self.assertIs(aes_result.opened, False)
+        aes_verifier.close()
+
+
+    def test_unavailable_prf_leaves_result_unknown_even_for_aes_volumes(self):
+        # Arrange
+        self.write_volume(b"Password", hash_name="sha512")
+        aes_verifier = HeaderVerifier(workers=1, assume_aes=True)
+        hash_available = preflight._hash_available
+
+        # Act
+        with mock.patch.object(preflight, "_hash_available", side_effect=lambda hash_name: hash_name != "sha512" and hash_available(hash_name)):
+            result = aes_verifier.verify(self.container_path, "Password", pim=PIM)
+            only_prf_result = aes_verifier.verify(self.container_path, "Password", pim=PIM, hash="sha512")
+
+        # Assert
+        self.assertIsNone(result.opened)
+        self.assertIsNone(only_prf_result.opened)
+        aes_verifier.close()
+
+
+    def test_opens_with_keyfile_applied(self):
+        # Arrange
+        keyfile_path = self.directory / "keyfile"
+        keyfile_path.write_bytes(os.urandom(300))
+        self.write_volume(apply_keyfiles(b"Password", [keyfile_path]), hash_name="sha512")
+
+        # Act
+        with_keyfile = self.verifier.verify(self.container_path, "Password", keyfile_path, pim=PIM, hash="sha512")
+        without_keyfile = self.verifier.verify(self.container_path, "Password", pim=PIM, hash="sha512")
+
+        # Assert
+        self.assertTrue(with_keyfile.opened)
+        self.assertFalse(without_keyfile.opened)
+
+
+    def test_rejects_unknown_hash(self):
+        # Arrange
+        self.write_volume(b"Password")
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            self.verifier.verify(self.container_path, "Password", hash="md5")
+
+
+    def test_verify_many_checks_containers_in_order(self):
+        # Arrange
+        good = MagicMock(container_path=self.write_volume(b"Password", path=self.directory / "good.hc"), password="Password", keyfile_path=None, pim=PIM, effective_hash="sha256", truecrypt=False)
+        stale = MagicMock(container_path=self.write_volume(b"Password", path=self.directory / "stale.hc"), password="Old", keyfile_path=None, pim=PIM, effective_hash=None, truecrypt=False)
+
+        # Act
+        results = asyncio.run(self.verifier.verify_many([good, stale]))
+
+        # Assert
+        self.assertEqual([result.opened for result in results], [True, None])
+
+
+    def test_pre_mount_hook_hands_matching_prf_to_mount(self):
+        # Arrange
+        container = MagicMock(container_path=self.write_volume(b"Password"), password="Password", keyfile_path=None, pim=PIM, effective_hash=None, truecrypt=False)
+
+        # Act
+        asyncio.run(self.verifier.pre_mount_hook(container))
+
+        # Assert
+        self.assertEqual(container.learned_prf, "sha256")
+
+
+    def test_pre_mount_hook_rejects_wrong_credentials(self):
+        # Arrange
+        container = MagicMock(container_path=self.container_path, password="Password", keyfile_path=None)
+        self.verifier.verify_container = MagicMock(return_value=preflight.PreflightResult(self.container_path, opened=False))
+
+        # Act & Assert
+        with self.assertRaises(exceptions.InvalidCredentialsError):
+            asyncio.run(self.verifier.pre_mount_hook(container))
+
+
+    def test_pre_mount_hook_leaves_unknown_result_to_veracrypt(self):
+        # Arrange
+        container = MagicMock(container_path=self.container_path, password="Password", keyfile_path=None, effective_hash=None, learned_prf=None)
+        self.verifier.verify_container = MagicMock(return_value=preflight.PreflightResult(self.container_path, opened=None))
+
+        # Act
+        asyncio.run(self.verifier.pre_mount_hook(container))
+
+        # Assert
+        self.assertIsNone(container.learned_prf)
+
+
+    def test_mount_many_rejects_before_taking_a_slot(self):
+        # Arrange
+        good = MagicMock(spec=VeracryptContainer, container_path=self.write_volume(b"Password", path=self.directory / "good.hc"), password="Password", keyfile_path=None, pim=PIM, effective_hash=None, truecrypt=False)
+        stale = MagicMock(spec=VeracryptContainer, container_path=self.write_volume(b"Password", path=self.directory / "stale.hc"), password="Old", keyfile_path=None, pim=PIM, effective_hash="sha256", truecrypt=False)
+        missing = MagicMock(spec=VeracryptContainer, container_path=self.directory / "missing.hc", password="Password", keyfile_path=None, pim=PIM, effective_hash="sha256", truecrypt=False)
+        verifier = HeaderVerifier(workers=2, assume_aes=True)
+
+        # Act
+        report = asyncio.run(mount_many([good, stale, missing], concurrency=1, verifier=verifier))
+
+        # Assert
+        self.assertEqual(good.learned_prf, "sha256")
+        good.mount.assert_called_once()
+        stale.mount.assert_not_called()
+        missing.mount.assert_called_once()
+        self.assertIsInstance(report.results[1].error, exceptions.InvalidCredentialsError)
+        self.assertEqual(report.results[1].queued_seconds, 0.0)
+        verifier.close()
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for block-level container replication.
+"""
+
+import os
+import mmap
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock, PropertyMock
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt, scan_fake_mounts
+from simple_veracrypt_container_interface import replication
+from simple_veracrypt_container_interface.backends import LinuxTextBackend
+from simple_veracrypt_container_interface.replication import replicate_file, replicate_container
+from simple_veracrypt_container_interface.utilities import exceptions
+from simple_veracrypt_container_interface.utilities.locks import LockManager
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+BLOCK_SIZE = mmap.PAGESIZE
+
+# ****************
+class TestReplication(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = directory = Path(self.temporary_directory.name)
+        self.source = directory / "volume.hc"
+        self.replica = directory / "replica" / "volume.hc"
+        self.replica.parent.mkdir()
+        self.source.write_bytes(os.urandom(BLOCK_SIZE * 10 + 123))
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def modify_source(self, offset: int, data: bytes) -> None:
+        with open(self.source, "r+b") as file:
+            file.seek(offset)
+            file.write(data)
+
+
+    # ****************
+    # Replication tests
+    def test_first_replication_copies_everything(self):
+        # Act
+        report = replicate_file(self.source, self.replica, block_size=BLOCK_SIZE, workers=3)
+
+        # Assert
+        self.assertEqual(self.replica.read_bytes(), self.source.read_bytes())
+        self.assertEqual((report.blocks_total, report.blocks_changed), (11, 11))
+        self.assertEqual(report.bytes_written, self.source.stat().st_size)
+
+
+    def test_later_replication_writes_only_changed_blocks_using_block_hashes(self):
+        # Arrange
+        replicate_file(self.source, self.replica, block_size=BLOCK_SIZE, workers=3)
+        self.modify_source(BLOCK_SIZE * 4 + 10, b"changed")
+        self.modify_source(BLOCK_SIZE * 10 + 1, b"tail")
+
+        # Act
+        report = replicate_file(self.source, self.replica, block_size=BLOCK_SIZE, workers=3)
+
+        # Assert
+        self.assertEqual(self.replica.read_bytes(), self.source.read_bytes())
+        self.assertTrue(report.used_block_hashes)
+        self.assertEqual(report.blocks_changed, 2)
+        self.assertEqual(report.bytes_written, BLOCK_SIZE + 123)
+
+
+    def test_modified_replica_is_compared_directly(self):
+        # Arrange
+        replicate_file(self.source, self.replica, block_size=BLOCK_SIZE)
+        with open(self.replica, "r+b") as file:
+            file.write(b"damaged replica")
+
+        # Act
+        report = replicate_file(self.source, self.replica, block_size=BLOCK_SIZE)
+
+        # Assert
+        self.assertFalse(report.used_block_hashes)
+        self.assertEqual(report.blocks_changed, 1)
+        self.assertEqual(self.replica.read_bytes(), self.source.read_bytes())
+
+
+    def test_shrunk_source_truncates_replica(self):
+        # Arrange
+        replicate_file(self.source, self.replica, block_size=BLOCK_SIZE)
+        with open(self.source, "r+b") as file:
+            file.truncate(BLOCK_SIZE * 2)
+
+        # Act
+        replicate_file(self.source, self.replica, block_size=BLOCK_SIZE)
+
+        # Assert
+        self.assertEqual(self.replica.read_bytes(), self.source.read_bytes())
+
+
+    def test_replication_without_positional_io_seeks_private_file_objects(self):
+        # Arrange
+        replicate_file(self.source, self.replica, block_size=BLOCK_SIZE, workers=3)
+        self.modify_source(BLOCK_SIZE * 7 + 5, b"changed")
+
+        # Act
+        with mock.patch.object(replication, "_POSITIONAL_IO", False):
+            report = replicate_file(self.source, self.replica, block_size=BLOCK_SIZE, workers=3)
+
+        # Assert
+        self.assertEqual(report.blocks_changed, 1)
+        self.assertEqual(self.replica.read_bytes(), self.source.read_bytes())
+
+
+    # ****************
+    # Container tests
+    def test_mounted_container_is_not_replicated(self):
+        # Arrange
+        executable_path = MagicMock(spec=Path)
+        type(executable_path).stat = PropertyMock(return_value=MagicMock(st_mode=0o700))
+        container = VeracryptContainer(executable_path, self.source, 'Z', mount_table=MagicMock())
+        container.mount_table.is_mounted.return_value = True
+
+        # Act & Assert
+        with self.assertRaises(exceptions.AlreadyMountedError):
+            asyncio.run(replicate_container(container, self.replica))
+
+        container.mount_table.is_mounted.return_value = False
+        report = asyncio.run(replicate_container(container, self.replica, block_size=BLOCK_SIZE))
+        self.assertEqual(report.blocks_changed, 11)
+
+
+# ****************
+@unittest.skipIf(os.name == "nt", "The fake executable launcher relies on a shebang line.")
+class TestContainerReplication(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.state_directory = self.directory / "state"
+        self.environment_patch = mock.patch.dict(os.environ, {STATE_DIRECTORY_VARIABLE: str(self.state_directory)})
+        self.environment_patch.start()
+        self.executable_path = install_fake_veracrypt(self.directory)
+        self.mount_table = MountTable(ttl=0, scanner=lambda: scan_fake_mounts(self.state_directory))
+        self.container_path = self.directory / "volume.hc"
+        self.container_path.write_bytes(os.urandom(BLOCK_SIZE * 4))
+        self.replica = self.directory / "replica.hc"
+
+    def tearDown(self):
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+    def make_container(self, mount_letter: str, lock_manager=None):
+        return VeracryptContainer(
+            self.executable_path, self.container_path, mount_letter, password="Password",
+            mount_table=self.mount_table, backend=LinuxTextBackend(self.directory / "media"), lock_manager=lock_manager,
+        )
+
+
+    # ****************
+    # Guard tests
+    def test_auto_assigned_container_mounted_elsewhere_is_not_replicated(self):
+        # Arrange
+        asyncio.run(self.make_container("auto").mount(print_output=False, raise_on_error=True))
+
+        # Act & Assert
+        with self.assertRaises(exceptions.AlreadyMountedError):
+            asyncio.run(replicate_container(self.make_container("auto"), self.replica, block_size=BLOCK_SIZE))
+
+
+    def test_mount_waits_for_replication_to_finish(self):
+        # Arrange
+        lock_manager = LockManager(self.directory / "locks")
+        container = self.make_container(str(self.directory / "mnt"), lock_manager)
+        events = []
+
+        def slow_replicate_file(*args):
+            time.sleep(0.2)
+            events.append("replicated")
+
+        async def record_mount(container):
+            events.append("mounting")
+
+        container.pre_mount_hooks.append(record_mount)
+
+        async def scenario():
+            replication_task = asyncio.create_task(replicate_container(container, self.replica))
+            await asyncio.sleep(0.05)
+            await container.mount(print_output=False, raise_on_error=True)
+            await replication_task
+            await container.dismount(print_output=False, raise_on_error=True)
+
+        # Act
+        with mock.patch.object(replication, "replicate_file", side_effect=slow_replicate_file):
+            asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(events, ["replicated", "mounting"])
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the SyncVeracryptClient class.
+"""
+
+import asyncio
+import threading
+import concurrent.futures
+from pathlib import Path
+
+import unittest
+from unittest.mock import MagicMock, PropertyMock
+
+from simple_veracrypt_container_interface.sync_client import SyncVeracryptClient, get_default_client
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# ****************
+class TestSyncVeracryptClient(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.client = SyncVeracryptClient()
+        self.loop_threads = set()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def tearDown(self):
+        self.client.close()
+
+    def make_container(self) -> VeracryptContainer:
+        executable_path = MagicMock(spec=Path)
+        type(executable_path).stat = PropertyMock(return_value=MagicMock(st_mode=0o700))
+        container = VeracryptContainer(executable_path, Path('/fake/path'), 'Z', mount_table=MagicMock())
+
+        async def operation(*args, **kwargs):
+            self.loop_threads.add(threading.current_thread().name)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            await asyncio.sleep(0.05)
+            self.in_flight -= 1
+
+        container.mount = MagicMock(side_effect=operation)
+        container.dismount = MagicMock(side_effect=operation)
+        return container
+
+
+    # ****************
+    # Operation tests
+    def test_calls_from_thread_pool_overlap_on_one_loop(self):
+        # Arrange
+        containers = [self.make_container() for _ in range(4)]
+
+        # Act
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda container: self.client.mount(container, print_output=False).result(), containers))
+
+        # Assert
+        self.assertEqual(self.loop_threads, {"veracrypt-event-loop"})
+        self.assertEqual(self.peak_in_flight, 4)
+        containers[0].mount.assert_called_once_with(print_output=False)
+
+
+    def test_mount_many_returns_report(self):
+        # Arrange
+        containers = [self.make_container() for _ in range(3)]
+
+        # Act
+        report = self.client.mount_many(containers, concurrency=2).result()
+
+        # Assert
+        self.assertEqual(len(report.succeeded), 3)
+        self.assertEqual(self.peak_in_flight, 2)
+
+
+    def test_lease_mounts_and_dismounts(self):
+        # Arrange
+        container = self.make_container()
+
+        # Act
+        with self.client.lease(container, linger=0):
+            mounted_inside = container.mount.called
+
+        # Assert
+        self.assertTrue(mounted_inside)
+        container.dismount.assert_called_once()
+
+
+    def test_lease_timeout_abandons_the_mount(self):
+        # Arrange
+        container = self.make_container()
+        mount_started = threading.Event()
+
+        async def slow_mount(*args, **kwargs):
+            mount_started.set()
+            await asyncio.sleep(10)
+
+        container.mount = MagicMock(side_effect=slow_mount)
+
+        # Act & Assert
+        with self.assertRaises(TimeoutError):
+            with self.client.lease(container, linger=0, timeout=0.05):
+                pass
+        self.assertTrue(mount_started.is_set())
+        self.assertEqual(container.lease_count, 0)
+        self.assertFalse(container._lease_lock.locked())
+
+
+    def test_close_joins_thread_before_loop_is_closed(self):
+        # Act
+        self.client.close()
+
+        # Assert
+        self.assertFalse(self.client._thread.is_alive())
+        self.assertTrue(self.client.loop.is_closed())
+        self.assertTrue(self.client.closed)
+
+
+    def test_closed_client_rejects_operations(self):
+        # Arrange
+        self.client.close()
+
+        # Act & Assert
+        with self.assertRaises(RuntimeError):
+            self.client.mount(self.make_container())
+
+
+    def test_default_client_is_shared(self):
+        # Assert
+        self.assertIs(get_default_client(), get_default_client())
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the transfer pipeline.
+"""
+
+import os
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock, PropertyMock
+
+from simple_veracrypt_container_interface import transfer
+from simple_veracrypt_container_interface.backends import LinuxTextBackend
+from simple_veracrypt_container_interface.transfer import copy_tree
+from simple_veracrypt_container_interface.utilities import exceptions
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+
+# ****************
+class TestCopyTree(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        directory = Path(self.temporary_directory.name)
+        self.source = directory / "source"
+        self.destination = directory / "destination"
+        (self.source / "nested" / "deeper").mkdir(parents=True)
+        (self.source / "a.bin").write_bytes(os.urandom(300_000))
+        (self.source / "nested" / "b.txt").write_text("b" * 1000)
+        (self.source / "nested" / "deeper" / "c.txt").write_text("")
+        if hasattr(os, "symlink"):
+            os.symlink("a.bin", self.source / "link")
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+
+    # ****************
+    # Copy tests
+    def test_copies_tree_and_preserves_modification_times(self):
+        # Act
+        report = copy_tree(self.source, self.destination, workers=2, verify=True)
+
+        # Assert
+        self.assertEqual((report.files_copied, report.bytes_copied, report.errors), (3, 301_000, []))
+        self.assertEqual((self.destination / "a.bin").read_bytes(), (self.source / "a.bin").read_bytes())
+        self.assertEqual((self.destination / "nested" / "b.txt").stat().st_mtime_ns, (self.source / "nested" / "b.txt").stat().st_mtime_ns)
+        self.assertTrue((self.destination / "nested" / "deeper" / "c.txt").exists())
+        self.assertGreater(report.bytes_per_second, 0)
+        if hasattr(os, "symlink"):
+            self.assertEqual(os.readlink(self.destination / "link"), "a.bin")
+
+
+    def test_unchanged_files_are_skipped(self):
+        # Arrange
+        copy_tree(self.source, self.destination)
+        (self.source / "nested" / "b.txt").write_text("changed")
+
+        # Act
+        report = copy_tree(self.source, self.destination)
+
+        # Assert
+        self.assertEqual((report.files_copied, report.files_skipped), (1, 2))
+        self.assertEqual((self.destination / "nested" / "b.txt").read_text(), "changed")
+
+
+    def test_empty_directories_are_recreated(self):
+        # Arrange
+        (self.source / "empty" / "nested").mkdir(parents=True)
+
+        # Act
+        copy_tree(self.source, self.destination)
+
+        # Assert
+        self.assertTrue((self.destination / "empty" / "nested").is_dir())
+
+
+    @unittest.skipIf(not hasattr(os, "symlink"), "Symbolic links are not available.")
+    def test_symlink_at_destination_is_replaced_not_followed(self):
+        # Arrange
+        outside = Path(self.temporary_directory.name) / "outside.txt"
+        outside.write_text("untouched")
+        (self.destination / "nested").mkdir(parents=True)
+        os.symlink(outside, self.destination / "nested" / "b.txt")
+        (self.source / "nested" / "b.txt").chmod(0o640)
+
+        # Act
+        report = copy_tree(self.source, self.destination)
+
+        # Assert
+        self.assertEqual(report.errors, [])
+        self.assertEqual(outside.read_text(), "untouched")
+        self.assertFalse((self.destination / "nested" / "b.txt").is_symlink())
+        self.assertEqual((self.destination / "nested" / "b.txt").stat().st_mode & 0o777, 0o640)
+        self.assertEqual([path.name for path in (self.destination / "nested").iterdir() if path.name.endswith(".tmp")], [])
+
+
+    def test_userspace_fallback_when_kernel_copy_is_unsupported(self):
+        # Arrange
+        unsupported = MagicMock(side_effect=OSError(transfer.errno.EXDEV, "Cross-device link"))
+
+        with mock.patch.object(transfer.os, "copy_file_range", unsupported, create=True), \
+            mock.patch.object(transfer.os, "sendfile", unsupported, create=True):
+            # Act
+            report = copy_tree(self.source, self.destination, verify=True)
+
+        # Assert
+        self.assertEqual((report.files_copied, report.errors), (3, []))
+        self.assertEqual((self.destination / "a.bin").read_bytes(), (self.source / "a.bin").read_bytes())
+
+
+    def test_userspace_fallback_when_sendfile_refuses_regular_files(self):
+        # Arrange
+        not_a_socket = MagicMock(side_effect=OSError(transfer.errno.ENOTSOCK, "Socket operation on non-socket"))
+
+        with mock.patch.object(transfer.os, "copy_file_range", None, create=True), \
+            mock.patch.object(transfer.os, "sendfile", not_a_socket, create=True):
+            # Act
+            report = copy_tree(self.source, self.destination)
+
+        # Assert
+        self.assertEqual((report.files_copied, report.errors), (3, []))
+        self.assertEqual((self.destination / "a.bin").read_bytes(), (self.source / "a.bin").read_bytes())
+
+
+    @unittest.skipIf(not hasattr(os, "symlink"), "Symbolic links are not available.")
+    def test_symlink_replaces_existing_link_through_temporary_name(self):
+        # Arrange
+        self.destination.mkdir()
+        os.symlink("elsewhere", self.destination / "link")
+
+        with mock.patch.object(transfer.os, "unlink", side_effect=AssertionError("unlinked before linking")):
+            # Act
+            report = copy_tree(self.source, self.destination)
+
+        # Assert
+        self.assertEqual(report.errors, [])
+        self.assertEqual(os.readlink(self.destination / "link"), "a.bin")
+        self.assertEqual([path.name for path in self.destination.iterdir() if path.name.endswith(".tmp")], [])
+
+
+    @unittest.skipIf(not hasattr(os, "symlink"), "Symbolic links are not available.")
+    def test_symlink_onto_directory_is_reported_without_leftovers(self):
+        # Arrange
+        (self.destination / "link").mkdir(parents=True)
+        (self.destination / "link" / "kept.txt").write_text("kept")
+
+        # Act
+        report = copy_tree(self.source, self.destination)
+
+        # Assert
+        self.assertEqual([relative_path for relative_path, _ in report.errors], [Path("link")])
+        self.assertEqual((self.destination / "link" / "kept.txt").read_text(), "kept")
+        self.assertEqual([path.name for path in self.destination.iterdir() if path.name.endswith(".tmp")], [])
+
+
+    def test_failed_files_are_reported(self):
+        # Arrange
+        with mock.patch.object(transfer, "_checksum", side_effect=["source", "copy"] * 3):
+            # Act
+            report = copy_tree(self.source, self.destination, workers=1, verify=True)
+
+        # Assert
+        self.assertEqual(len(report.errors), 3)
+        self.assertIsInstance(report.errors[0][1], ValueError)
+        self.assertFalse((self.destination / "a.bin").exists())
+
+
+    # ****************
+    # Container tests
+    def test_container_copies_into_its_mount_point_only_when_mounted(self):
+        # Arrange
+        executable_path = MagicMock(spec=Path)
+        type(executable_path).stat = PropertyMock(return_value=MagicMock(st_mode=0o700))
+        container = VeracryptContainer(executable_path, Path("/fake/path"), str(self.destination), mount_table=MagicMock(), backend=LinuxTextBackend())
+        container.mount_table.is_mounted.return_value = False
+
+        # Act & Assert
+        with self.assertRaises(exceptions.AlreadyDismountedError):
+            asyncio.run(container.copy_into(self.source))
+
+        container.mount_table.is_mounted.return_value = True
+        report = asyncio.run(container.copy_into(self.source, "staged"))
+        self.assertEqual(report.files_copied, 3)
+        self.assertTrue((self.destination / "staged" / "a.bin").exists())
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
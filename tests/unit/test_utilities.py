@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the utilities module.
+"""
+
+import sys
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+from unittest.mock import AsyncMock, MagicMock
+
+from simple_veracrypt_container_interface.utilities import utilities
+from simple_veracrypt_container_interface.utilities.exceptions import CommandTimeoutError
+
+# ****************
+def python_command(source: str):
+    return [sys.executable, "-c", source]
+
+
+def is_process_alive(pid: int, grace_period: float = 1.0) -> bool:
+    deadline = time.monotonic() + grace_period  # SIGKILL is delivered asynchronously
+    while time.monotonic() < deadline:
+        try:
+            with open(f"/proc/{pid}/stat") as stat:
+                if stat.read().split(")")[-1].split()[0] == "Z":  # Zombies are already dead
+                    return False
+        except FileNotFoundError:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+# ****************
+class TestRunCommand(unittest.TestCase):
+
+    # ****************
+    # Buffered mode tests
+    def test_run_command_returns_output(self):
+        # Act
+        result = asyncio.run(utilities.run_command(python_command("print('hello')"), print_output=False))
+
+        # Assert
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.strip(), "hello")
+
+
+    def test_run_command_raises_on_failure(self):
+        # Act & Assert
+        with self.assertRaises(RuntimeError):
+            asyncio.run(utilities.run_command(python_command("import sys; sys.exit(3)"), print_output=False))
+
+
+    # ****************
+    # Streaming mode tests
+    def test_run_command_streams_lines_to_callback(self):
+        # Arrange
+        lines = []
+
+        # Act
+        asyncio.run(utilities.run_command(
+            python_command("import sys\nprint('out')\nprint('err', file=sys.stderr)"),
+            print_output=False,
+            on_line=lambda stream_name, line: lines.append((stream_name, line)),
+        ))
+
+        # Assert
+        self.assertCountEqual(lines, [("stdout", "out"), ("stderr", "err")])
+
+
+    def test_run_command_stream_keeps_bounded_tail(self):
+        # Act
+        result = asyncio.run(utilities.run_command(
+            python_command("for i in range(1000): print(i)"),
+            print_output=False,
+            stream=True,
+            max_tail_lines=3,
+        ))
+
+        # Assert
+        self.assertEqual(result.stdout.splitlines(), ["997", "998", "999"])
+
+
+    def test_run_command_stream_reports_stderr_tail_on_failure(self):
+        # Act & Assert
+        with self.assertRaisesRegex(RuntimeError, "bad credentials"):
+            asyncio.run(utilities.run_command(
+                python_command("import sys; print('bad credentials', file=sys.stderr); sys.exit(1)"),
+                print_output=False,
+                stream=True,
+            ))
+
+
+    def test_command_stream_iterates_lines(self):
+        async def collect():
+            command_stream = utilities.CommandStream(python_command("print('a'); print('b')"))
+            lines = [line async for _, line in command_stream]
+            return lines, command_stream.returncode
+
+        # Act
+        lines, returncode = asyncio.run(collect())
+
+        # Assert
+        self.assertEqual(lines, ["a", "b"])
+        self.assertEqual(returncode, 0)
+
+
+# ****************
+@unittest.skipIf(sys.platform == "win32", "Process groups are killed through POSIX signals.")
+class TestRunCommandTimeout(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.pid_path = Path(self.temporary_directory.name) / "child.pid"
+        # Spawns a grandchild that would outlive a kill of only the direct child
+        self.command = python_command(
+            "import subprocess, sys, time\n"
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+            f"open({str(self.pid_path)!r}, 'w').write(str(child.pid))\n"
+            "time.sleep(60)\n"
+        )
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def child_pid_written(self) -> bool:
+        return self.pid_path.exists() and bool(self.pid_path.read_text())
+
+    def wait_for_child_pid(self) -> int:
+        for _ in range(200):
+            if self.child_pid_written():
+                return int(self.pid_path.read_text())
+            time.sleep(0.01)
+        self.fail("Child process did not start.")
+
+
+    # ****************
+    # Timeout tests
+    def test_timeout_kills_process_group(self):
+        # Act
+        with self.assertRaises(CommandTimeoutError):
+            asyncio.run(utilities.run_command(self.command, print_output=False, timeout=1))
+
+        # Assert
+        self.assertFalse(is_process_alive(self.wait_for_child_pid()))
+
+
+    def test_streaming_timeout_kills_process_group(self):
+        # Act
+        with self.assertRaises(CommandTimeoutError):
+            asyncio.run(utilities.run_command(self.command, print_output=False, stream=True, timeout=1))
+
+        # Assert
+        self.assertFalse(is_process_alive(self.wait_for_child_pid()))
+
+
+    def test_cancellation_kills_process_group(self):
+        async def scenario():
+            task = asyncio.create_task(utilities.run_command(self.command, print_output=False))
+            while not self.child_pid_written():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        # Act
+        asyncio.run(scenario())
+
+        # Assert
+        self.assertFalse(is_process_alive(self.wait_for_child_pid()))
+
+
+# ****************
+class TestKillProcessGroupOnWindows(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.process = MagicMock(pid=1234, returncode=None)
+        self.process.wait = AsyncMock(return_value=1)
+        self.platform_patch = mock.patch.object(utilities.sys, "platform", "win32")
+        self.platform_patch.start()
+
+    def tearDown(self):
+        self.platform_patch.stop()
+
+
+    # ****************
+    # Tree kill tests
+    def test_kills_process_tree_with_taskkill(self):
+        # Arrange
+        taskkill = MagicMock()
+        taskkill.wait = AsyncMock(return_value=0)
+
+        # Act
+        with mock.patch("asyncio.create_subprocess_exec", AsyncMock(return_value=taskkill)) as create_subprocess_exec:
+            asyncio.run(utilities.kill_process_group(self.process))
+
+        # Assert
+        self.assertEqual(create_subprocess_exec.call_args.args, ("taskkill", "/T", "/F", "/PID", "1234"))
+        self.process.kill.assert_not_called()
+        self.process.wait.assert_awaited_once()
+
+
+    def test_falls_back_to_killing_the_process_without_taskkill(self):
+        # Act
+        with mock.patch("asyncio.create_subprocess_exec", AsyncMock(side_effect=FileNotFoundError("taskkill"))):
+            asyncio.run(utilities.kill_process_group(self.process))
+
+        # Assert
+        self.process.kill.assert_called_once()
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()
@@ -14,6 +14,7 @@ from unittest import mock
 from unittest.mock import AsyncMock, MagicMock, PropertyMock
 
 from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+from simple_veracrypt_container_interface.utilities.exceptions import AlreadyMountedError
 
 # ****************
 class TestVeracryptSetup(unittest.TestCase):
@@ -198,6 +199,179 @@ class TestVeracryptSetup(unittest.TestCase):
 
 
 
+# ****************
+class TestVeracryptLease(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        VERACRYPT_PATH = MagicMock(spec=Path)
+        type(VERACRYPT_PATH).stat = PropertyMock(return_value=MagicMock(st_mode=0o700))
+        self.veracrypt_container = VeracryptContainer(VERACRYPT_PATH, Path('/fake/path'), 'Z', mount_table=MagicMock())
+
+        self.veracrypt_container.mount = AsyncMock()
+        self.veracrypt_container.dismount = AsyncMock()
+
+
+    # ****************
+    # Lease tests
+    def test_concurrent_leases_share_one_mount(self):
+        async def scenario():
+            async def use():
+                async with self.veracrypt_container.lease(linger=0):
+                    await asyncio.sleep(0.01)
+            await asyncio.gather(use(), use(), use())
+
+        # Act
+        asyncio.run(scenario())
+
+        # Assert
+        self.veracrypt_container.mount.assert_called_once()
+        self.veracrypt_container.dismount.assert_called_once()
+        self.assertEqual(self.veracrypt_container.lease_count, 0)
+
+
+    def test_lease_within_linger_period_reuses_mount(self):
+        async def scenario():
+            async with self.veracrypt_container.lease(linger=10):
+                pass
+            async with self.veracrypt_container.lease(linger=10):
+                pass
+            dismounted_before_expiry = self.veracrypt_container.dismount.called
+            await self.veracrypt_container.expire_lease()
+            return dismounted_before_expiry
+
+        # Act
+        dismounted_before_expiry = asyncio.run(scenario())
+
+        # Assert
+        self.assertFalse(dismounted_before_expiry)
+        self.veracrypt_container.mount.assert_called_once()
+        self.veracrypt_container.dismount.assert_called_once()
+
+
+    def test_linger_period_elapses_into_dismount(self):
+        async def scenario():
+            async with self.veracrypt_container.lease(linger=0.01):
+                pass
+            await asyncio.sleep(0.05)
+
+        # Act
+        asyncio.run(scenario())
+
+        # Assert
+        self.veracrypt_container.dismount.assert_called_once()
+
+
+    def test_lease_released_without_linger_waits_for_expiry(self):
+        async def scenario():
+            async with self.veracrypt_container.lease(linger=None):
+                pass
+            await asyncio.sleep(0.01)
+            dismounted_before_expiry = self.veracrypt_container.dismount.called
+            await self.veracrypt_container.expire_lease()
+            return dismounted_before_expiry
+
+        # Act
+        dismounted_before_expiry = asyncio.run(scenario())
+
+        # Assert
+        self.assertFalse(dismounted_before_expiry)
+        self.veracrypt_container.dismount.assert_called_once()
+
+
+    def test_lease_on_already_mounted_container_does_not_dismount(self):
+        # Arrange
+        self.veracrypt_container.mount.side_effect = AlreadyMountedError()
+
+        # Act
+        async def scenario():
+            async with self.veracrypt_container.lease(linger=0):
+                pass
+        asyncio.run(scenario())
+
+        # Assert
+        self.veracrypt_container.dismount.assert_not_called()
+
+
+# ****************
+class TestVeracryptCoalescing(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        VERACRYPT_PATH = MagicMock(spec=Path)
+        type(VERACRYPT_PATH).stat = PropertyMock(return_value=MagicMock(st_mode=0o700))
+        self.veracrypt_container = VeracryptContainer(VERACRYPT_PATH, Path('/fake/path'), 'Z', mount_table=MagicMock())
+        self.calls = 0
+
+    async def slow_operation(self, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+
+
+    # ****************
+    # Coalescing tests
+    def test_concurrent_mounts_share_one_operation(self):
+        # Arrange
+        with mock.patch.object(VeracryptContainer, '_mount', new=self.slow_operation):
+            async def scenario():
+                await asyncio.gather(*(self.veracrypt_container.mount(raise_on_error=True) for _ in range(3)))
+
+            # Act
+            asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(self.calls, 1)
+
+
+    def test_sequential_mounts_are_not_coalesced(self):
+        # Arrange
+        with mock.patch.object(VeracryptContainer, '_mount', new=self.slow_operation):
+            async def scenario():
+                await self.veracrypt_container.mount()
+                await self.veracrypt_container.mount()
+
+            # Act
+            asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(self.calls, 2)
+
+
+    def test_mounts_of_same_file_at_other_targets_are_not_coalesced(self):
+        # Arrange
+        other_target = VeracryptContainer(self.veracrypt_container.executable_path, Path('/fake/path'), 'Y', mount_table=MagicMock())
+        auto_assigned = [VeracryptContainer(self.veracrypt_container.executable_path, Path('/fake/path'), 'auto', mount_table=MagicMock()) for _ in range(2)]
+
+        with mock.patch.object(VeracryptContainer, '_mount', new=self.slow_operation):
+            async def scenario():
+                await asyncio.gather(*(container.mount(raise_on_error=True) for container in [self.veracrypt_container, other_target] + auto_assigned))
+
+            # Act
+            asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(self.calls, 4)
+
+
+    def test_coalesced_callers_all_see_failure(self):
+        # Arrange
+        async def failing_operation(*args, **kwargs):
+            self.calls += 1
+            await asyncio.sleep(0.02)
+            raise RuntimeError("Command failed")
+
+        with mock.patch.object(VeracryptContainer, '_dismount', new=failing_operation):
+            async def scenario():
+                return await asyncio.gather(*(self.veracrypt_container.dismount(raise_on_error=True) for _ in range(2)), return_exceptions=True)
+
+            # Act
+            results = asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+
 # ****************
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
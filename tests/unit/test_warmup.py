@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+Test cases for the post-mount page-cache warmup.
+"""
+
+import os
+import json
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest import mock
+from unittest.mock import MagicMock
+
+from benchmarks.fake_veracrypt import STATE_DIRECTORY_VARIABLE, install_fake_veracrypt, scan_fake_mounts
+from simple_veracrypt_container_interface.backends import LinuxTextBackend
+from simple_veracrypt_container_interface.utilities.mount_table import MountTable
+from simple_veracrypt_container_interface.veracrypt_container import VeracryptContainer
+from simple_veracrypt_container_interface.warmup import PageCacheWarmer, WarmupStatistics, merge_ranges
+
+# ****************
+class TestMergeRanges(unittest.TestCase):
+
+    def test_merges_overlapping_and_adjacent_ranges(self):
+        # Assert
+        self.assertEqual(merge_ranges([(10, 5), (0, 10), (30, 5)]), [(0, 15), (30, 5)])
+
+
+    def test_range_to_end_of_file_absorbs_later_ranges(self):
+        # Assert
+        self.assertEqual(merge_ranges([(100, 10), (20, 0), (0, 5)]), [(0, 5), (20, 0)])
+
+
+# ****************
+class TestPageCacheWarmer(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.mount_path = self.directory / "mnt"
+        self.mount_path.mkdir()
+        self.container = MagicMock(container_path=self.directory / "volume.hc", mount_path=self.mount_path)
+        self.warmer = PageCacheWarmer(self.directory / "profiles", workers=2)
+
+    def tearDown(self):
+        self.warmer.close()
+        self.temporary_directory.cleanup()
+
+    def write_files(self, count: int, size: int):
+        for index in range(count):
+            (self.mount_path / f"file{index}.bin").write_bytes(os.urandom(size))
+            self.warmer.record(self.container, self.mount_path / f"file{index}.bin")
+        self.warmer.end_session(self.container)
+
+
+    # ****************
+    # Profile tests
+    def test_session_is_saved_as_profile_in_first_access_order(self):
+        # Arrange
+        self.warmer.record(self.container, "b/hot.db", 4096, 4096)
+        self.warmer.record(self.container, self.mount_path / "a.txt")
+        self.warmer.record(self.container, "b/hot.db", 0, 4096)
+
+        # Act
+        self.warmer.end_session(self.container)
+        profile = self.warmer.load_profile(self.container)
+
+        # Assert
+        self.assertEqual(profile.files, {"b/hot.db": [(0, 8192)], "a.txt": [(0, 0)]})
+        self.assertEqual(self.warmer.profile_path(self.container).stat().st_mode & 0o777, 0o600)
+
+
+    def test_empty_session_keeps_previous_profile(self):
+        # Arrange
+        self.warmer.record(self.container, "a.txt")
+        self.warmer.end_session(self.container)
+
+        # Act
+        saved = self.warmer.end_session(self.container)
+
+        # Assert
+        self.assertIsNone(saved)
+        self.assertEqual(list(self.warmer.load_profile(self.container).files), ["a.txt"])
+
+
+    def test_path_outside_mount_point_is_rejected(self):
+        # Act & Assert
+        for path in (self.directory / "elsewhere.txt", "../elsewhere.txt", "a/../../elsewhere.txt", self.mount_path / ".." / "elsewhere.txt"):
+            with self.subTest(path=path), self.assertRaises(ValueError):
+                self.warmer.record(self.container, path)
+
+
+    def test_profile_entries_outside_mount_point_are_dropped_on_load(self):
+        # Arrange
+        self.warmer.profile_directory.mkdir()
+        self.warmer.profile_path(self.container).write_text(json.dumps({"files": {"../../etc/shadow": [[0, 0]], "./a//b.txt": [[0, 10]]}}))
+
+        # Act
+        profile = self.warmer.load_profile(self.container)
+
+        # Assert
+        self.assertEqual(profile.files, {"a/b.txt": [(0, 10)]})
+
+
+    def test_most_read_files_are_warmed_first(self):
+        # Arrange
+        self.warmer.record(self.container, "cold.txt")
+        for _ in range(3):
+            self.warmer.record(self.container, "hot.txt")
+        self.warmer.record(self.container, "warm.txt")
+        self.warmer.record(self.container, "warm.txt")
+
+        # Act
+        self.warmer.end_session(self.container)
+        profile = self.warmer.load_profile(self.container)
+
+        # Assert
+        self.assertEqual([relative_path for relative_path, _ in profile.ranked()], ["hot.txt", "warm.txt", "cold.txt"])
+
+
+    # ****************
+    # Warmup tests
+    def test_warm_prefetches_ranges_of_latest_session(self):
+        # Arrange
+        self.write_files(3, 10000)
+        self.warmer.record(self.container, "file0.bin", 0, 100)
+        self.warmer.end_session(self.container)
+
+        # Act
+        statistics = asyncio.run(self.warmer.warm(self.container))
+
+        # Assert
+        self.assertEqual(statistics.files, 1)
+        self.assertEqual(statistics.bytes_prefetched, 100)
+        self.assertFalse(statistics.cancelled)
+
+
+    def test_warm_stops_at_byte_budget(self):
+        # Arrange
+        self.write_files(4, 10000)
+        self.warmer.max_bytes = 25000
+
+        # Act
+        statistics = asyncio.run(self.warmer.warm(self.container))
+
+        # Assert
+        self.assertEqual(statistics.bytes_prefetched, 25000)
+
+
+    def test_missing_files_are_reported_as_errors(self):
+        # Arrange
+        self.write_files(2, 100)
+        (self.mount_path / "file1.bin").unlink()
+
+        # Act
+        statistics = asyncio.run(self.warmer.warm(self.container))
+
+        # Assert
+        self.assertEqual(statistics.files, 1)
+        self.assertEqual([relative_path for relative_path, _ in statistics.errors], ["file1.bin"])
+
+
+    def test_cancelled_warm_stops_workers_before_returning(self):
+        # Arrange
+        self.write_files(20, 100)
+        calls = []
+
+        def slow_fadvise(*args):
+            calls.append(args)
+            time.sleep(0.02)
+
+        async def scenario():
+            task = asyncio.create_task(self.warmer.warm(self.container, statistics))
+            await asyncio.sleep(0.03)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return len(calls)
+
+        statistics = WarmupStatistics()
+
+        # Act
+        with mock.patch("os.posix_fadvise", side_effect=slow_fadvise, create=True):
+            calls_at_cancel = asyncio.run(scenario())
+            time.sleep(0.05)
+
+        # Assert
+        self.assertTrue(statistics.cancelled)
+        self.assertLess(calls_at_cancel, 20)
+        self.assertEqual(len(calls), calls_at_cancel)
+        self.assertEqual(statistics.bytes_prefetched, 100 * calls_at_cancel)
+
+
+# ****************
+@unittest.skipIf(os.name == "nt", "The fake executable launcher relies on a shebang line.")
+class TestContainerWarmup(unittest.TestCase):
+
+    # ****************
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temporary_directory.name)
+        self.state_directory = self.directory / "state"
+        self.environment_patch = mock.patch.dict(os.environ, {STATE_DIRECTORY_VARIABLE: str(self.state_directory)})
+        self.environment_patch.start()
+        container_path = self.directory / "volume.hc"
+        container_path.touch()
+        self.warmer = PageCacheWarmer(self.directory / "profiles")
+        self.container = VeracryptContainer(
+            install_fake_veracrypt(self.directory), container_path, str(self.directory / "mnt"), password="Password",
+            mount_table=MountTable(ttl=0, scanner=lambda: scan_fake_mounts(self.state_directory)), backend=LinuxTextBackend(), warmer=self.warmer,
+        )
+
+    def tearDown(self):
+        self.warmer.close()
+        self.environment_patch.stop()
+        self.temporary_directory.cleanup()
+
+
+    # ****************
+    # Mount tests
+    def test_next_mount_warms_files_of_previous_session(self):
+        # Arrange
+        async def scenario():
+            await self.container.mount(print_output=False, raise_on_error=True)
+            (self.container.mount_path / "data").mkdir()
+            (self.container.mount_path / "data" / "hot.bin").write_bytes(os.urandom(5000))
+            await self.container.copy_out(self.directory / "copy", "data")
+            await self.container.dismount(print_output=False, raise_on_error=True)
+
+            await self.container.mount(print_output=False, raise_on_error=True)
+            statistics = await self.container.warmup_task
+            await self.container.dismount(print_output=False, raise_on_error=True)
+            return statistics
+
+        # Act
+        statistics = asyncio.run(scenario())
+
+        # Assert
+        self.assertIs(statistics, self.container.last_warmup)
+        self.assertEqual((statistics.files, statistics.bytes_prefetched), (1, 5000))
+        self.assertEqual(list(self.warmer.load_profile(self.container).files), ["data/hot.bin"])
+
+
+    def test_first_mount_has_nothing_to_warm(self):
+        # Arrange
+        async def scenario():
+            await self.container.mount(print_output=False, raise_on_error=True)
+            statistics = await self.container.warmup_task
+            await self.container.dismount(print_output=False, raise_on_error=True)
+            return statistics
+
+        # Act
+        statistics = asyncio.run(scenario())
+
+        # Assert
+        self.assertEqual(statistics.bytes_prefetched, 0)
+        self.assertFalse(self.warmer.profile_path(self.container).exists())
+
+
+# ****************
+if __name__ == '__main__':
+    unittest.main()